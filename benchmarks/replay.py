@@ -0,0 +1,225 @@
+import asyncio
+import copy
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+from google.genai import types
+from requests.adapters import BaseAdapter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+DATE_PLACEHOLDER = re.compile(r"^\$(day|month|year)\+(\d+)$")
+
+
+def load_fixture(name: str) -> Dict[str, Any]:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Latency:
+    """
+    Injected latency: the recorded (or overridden) milliseconds, scaled and jittered.
+    """
+
+    def __init__(self, scale: float = 1.0, jitter: float = 0.0):
+        self.scale = scale
+        self.jitter = jitter
+
+    def seconds(self, milliseconds: float) -> float:
+        return max(0.0, milliseconds * self.scale * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+
+def rebase_body(kind: Optional[str], body: Any) -> Any:
+    """
+    Move the timestamps of a recorded body to the present, so replayed forecasts cover the coming days
+    and replayed rate tables aren't already expired.
+    """
+    if kind is None:
+        return body
+    body = copy.deepcopy(body)
+    now = int(time.time())
+    if kind == "forecast":
+        offset = now - now % 10800 - body['list'][0]['dt']  # Start at the current 3-hour slot
+        for entry in body['list']:
+            entry['dt'] += offset
+            entry['dt_txt'] = datetime.fromtimestamp(entry['dt'], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    elif kind == "exchange_rate":
+        offset = now - body['time_last_update_unix']
+        body['time_last_update_unix'] += offset
+        body['time_next_update_unix'] += offset
+    return body
+
+
+class FixtureAdapter(BaseAdapter):
+    """
+    A requests transport adapter that answers from recorded responses instead of the network.
+    A route matches on host and path prefix, optionally on a path suffix and on query parameters
+    (case-insensitive); the first matching route wins and unmatched requests get a 404.
+    """
+
+    def __init__(self, routes: List[Dict[str, Any]], latency: Latency, latency_ms: Optional[float] = None):
+        super().__init__()
+        self.routes = routes
+        self.latency = latency
+        self.latency_ms = latency_ms  # Overrides every route's recorded latency
+        self.requests = 0
+
+    def match(self, url: str) -> Optional[Dict[str, Any]]:
+        parts = urlsplit(url)
+        query = {key: values[0].lower() for key, values in parse_qs(parts.query).items()}
+        for route in self.routes:
+            if parts.netloc != route['host'] or not parts.path.startswith(route['path']):
+                continue
+            if not parts.path.endswith(route.get('suffix', "")):
+                continue
+            if any(value not in query.get(key, "") for key, value in route.get('match', {}).items()):
+                continue
+            return route
+        return None
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        self.requests += 1
+        route = self.match(request.url)
+        latency_ms = self.latency_ms if self.latency_ms is not None else (route or {}).get('latency_ms', 0)
+        time.sleep(self.latency.seconds(latency_ms))
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = route.get('status', 200) if route else 404
+        body = rebase_body(route.get('rebase'), route['body']) if route else {"error": "No fixture"}
+        response._content = json.dumps(body).encode()
+        response.headers['Content-Type'] = "application/json"
+        response.encoding = "utf-8"
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def install_http_fixtures(latency: Latency, latency_ms: Optional[float] = None) -> FixtureAdapter:
+    """
+    Route the shared HTTP sessions of every recorded upstream through the fixture adapter.
+
+    Returns:
+        FixtureAdapter: The installed adapter, which counts the requests it served.
+    """
+    from src.utils.http import get_session
+
+    routes = load_fixture("http.json")['routes']
+    adapter = FixtureAdapter(routes, latency, latency_ms)
+    for host in {route['host'] for route in routes}:
+        for scheme in ("http", "https"):
+            get_session(f"{scheme}://{host}/").mount(f"{scheme}://{host}/", adapter)
+    return adapter
+
+
+def resolve_placeholders(args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace recorded "$day+N" style arguments with the date N days from now, so date-bound tool calls stay valid.
+    """
+    resolved = {}
+    for name, value in args.items():
+        match = DATE_PLACEHOLDER.match(value) if isinstance(value, str) else None
+        if match:
+            value = getattr(datetime.now() + timedelta(days=int(match.group(2))), match.group(1))
+        resolved[name] = value
+    return resolved
+
+
+class ReplayModels:
+    """
+    Replays recorded Gemini streams. The scenario is picked by the turn's user message and the round by the
+    number of function responses sent back since it, so multi-round tool use replays in order.
+    """
+
+    def __init__(self, fixtures: Dict[str, Any], latency: Latency, ttft_ms: Optional[float] = None,
+                 chunk_interval_ms: Optional[float] = None, verifier_ms: Optional[float] = None):
+        recorded = fixtures['latency']
+        self.scenarios = {scenario['message']: scenario for scenario in fixtures['scenarios']}
+        self.verifier = fixtures['verifier']
+        self.latency = latency
+        self.ttft_ms = ttft_ms if ttft_ms is not None else recorded['ttft_ms']
+        self.chunk_interval_ms = chunk_interval_ms if chunk_interval_ms is not None else recorded['chunk_interval_ms']
+        self.verifier_ms = verifier_ms if verifier_ms is not None else recorded['verifier_ms']
+
+    @staticmethod
+    def _locate(contents: List[Any]) -> Tuple[str, int]:
+        user_msg, round_index = "", 0
+        for content in contents:
+            if isinstance(content, dict) and content.get('role') == "user":
+                user_msg, round_index = content['parts'][-1]['text'], 0
+            elif isinstance(content, types.Content) and any(part.function_response for part in content.parts or []):
+                round_index += 1
+        return user_msg, round_index
+
+    async def generate_content_stream(self, model: str, config: Any, contents: List[Any]) -> AsyncIterator[Any]:
+        user_msg, round_index = self._locate(contents)
+        scenario = self.scenarios.get(user_msg) or next(iter(self.scenarios.values()))
+        chunks = scenario['rounds'][min(round_index, len(scenario['rounds']) - 1)]
+
+        async def stream() -> AsyncIterator[types.GenerateContentResponse]:
+            await asyncio.sleep(self.latency.seconds(self.ttft_ms))
+            for index, chunk in enumerate(chunks):
+                if index:
+                    await asyncio.sleep(self.latency.seconds(self.chunk_interval_ms))
+                response = types.GenerateContentResponse.model_validate(chunk)
+                for part in response.candidates[0].content.parts:
+                    if part.function_call:
+                        part.function_call.args = resolve_placeholders(part.function_call.args or {})
+                yield response
+
+        return stream()
+
+    async def generate_content(self, model: str, config: Any, contents: Any) -> types.GenerateContentResponse:
+        await asyncio.sleep(self.latency.seconds(self.verifier_ms))
+        return types.GenerateContentResponse.model_validate({
+            'candidates': [{'content': {'role': "model", 'parts': [{'text': self.verifier['text']}]}}],
+            'usageMetadata': self.verifier['usageMetadata'],
+        })
+
+
+class ReplayCaches:
+    """
+    Accepts cached context creation, so the "gemini" context cache backend can be benchmarked offline too.
+    """
+
+    def __init__(self):
+        self.created = 0
+
+    async def create(self, model: str, config: Any) -> SimpleNamespace:
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/replay-{self.created}")
+
+    async def delete(self, name: str) -> None:
+        pass
+
+
+def create_replay_client(latency: Latency, **latency_overrides: Optional[float]) -> SimpleNamespace:
+    """
+    Build a stand-in for genai.Client that replays the recorded Gemini responses through its aio interface.
+
+    Args:
+        latency (Latency): The injected latency.
+        **latency_overrides: ttft_ms, chunk_interval_ms and verifier_ms, replacing the recorded values.
+
+    Returns:
+        SimpleNamespace: An object with the client's aio.models and aio.caches.
+    """
+    models = ReplayModels(load_fixture("gemini.json"), latency, **latency_overrides)
+    return SimpleNamespace(aio=SimpleNamespace(models=models, caches=ReplayCaches()))
+
+
+def scenario_messages() -> List[str]:
+    """
+    Returns:
+        List[str]: The user message of every recorded scenario.
+    """
+    return [scenario['message'] for scenario in load_fixture("gemini.json")['scenarios']]
@@ -0,0 +1,221 @@
+"""
+Offline benchmark of the travel agent.
+
+Replays recorded OpenTripMap, OpenWeather, ExchangeRate-API and Gemini responses from benchmarks/fixtures
+with injected latency, drives chat_with_agent at a given concurrency, and reports throughput,
+time-to-first-chunk and end-to-end latency distributions, plus the per-span breakdown of the tracer.
+
+Usage:
+    python -m benchmarks.run_benchmark --turns 40 --concurrency 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# The agent reads its API keys at import time; the replayed upstreams don't check them
+for _key in ("GOOGLE_API_KEY", "OPEN_TRIP_MAP_API_KEY", "OPENWEATHER_API_KEY", "EXCHANGERATE_API_KEY"):
+    os.environ.setdefault(_key, "offline-benchmark")
+
+from benchmarks.replay import Latency, create_replay_client, install_http_fixtures, scenario_messages  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """
+    Returns:
+        dict: The mean, p50, p95, p99 and max of the values, in seconds.
+    """
+    return {
+        'mean': round(sum(values) / len(values), 4) if values else 0.0,
+        'p50': round(percentile(values, 0.5), 4),
+        'p95': round(percentile(values, 0.95), 4),
+        'p99': round(percentile(values, 0.99), 4),
+        'max': round(max(values), 4) if values else 0.0,
+    }
+
+
+def run_turn(chat_with_agent: Any, message: str, session_id: str) -> Dict[str, Any]:
+    """
+    Drive one first turn through the synchronous agent and time it.
+
+    Returns:
+        dict: The turn's 'ttfc' (time to the first chunk with text) and 'e2e' latency, or its 'error'.
+    """
+    started = time.perf_counter()
+    ttfc = None
+    try:
+        for chatbot in chat_with_agent([[message, None]], session_id):
+            if ttfc is None and chatbot[-1][1]:
+                ttfc = time.perf_counter() - started
+    except Exception:
+        return {'message': message, 'error': traceback.format_exc(limit=3)}
+    return {'message': message, 'ttfc': ttfc, 'e2e': time.perf_counter() - started}
+
+
+def run_benchmark(turns: int, concurrency: int, warmup: int = 0, verification_mode: Optional[str] = None,
+                  latency_scale: float = 1.0, jitter: float = 0.0, http_latency_ms: Optional[float] = None,
+                  ttft_ms: Optional[float] = None, chunk_interval_ms: Optional[float] = None,
+                  verifier_ms: Optional[float] = None, prefetch: Optional[bool] = None,
+                  routing: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Run the benchmark against the replayed upstreams.
+
+    Args:
+        turns (int): Measured turns, cycling through the recorded scenarios.
+        concurrency (int): Turns in flight at once.
+        warmup (int): Turns run before measuring, e.g. to benchmark with warm tool caches.
+        verification_mode (Optional[str]): Overrides the configured verification mode.
+        latency_scale (float): Multiplies every injected latency, 0 for pure CPU cost.
+        jitter (float): Relative random variation of each injected latency, e.g. 0.2 for ±20%.
+        http_latency_ms (Optional[float]): Replaces the recorded latency of every HTTP upstream.
+        ttft_ms (Optional[float]): Replaces the recorded Gemini time to first token.
+        chunk_interval_ms (Optional[float]): Replaces the recorded interval between Gemini chunks.
+        verifier_ms (Optional[float]): Replaces the recorded verifier latency.
+        prefetch (Optional[bool]): Turns the speculative prefetch on or off, as configured by default.
+        routing (Optional[bool]): Turns model routing on or off, as configured by default.
+
+    Returns:
+        dict: The benchmark report.
+    """
+    from src import travel_assistant
+    from src.speculative_prefetch import SpeculativePrefetcher
+    from src.utils.attractions_index import attractions_index
+    from src.utils.currency_codes import currency_codes
+    from src.utils.geocoding import geocoder
+    from src.utils.tracing import tracer
+
+    # Keep the run isolated from the developer's on-disk caches
+    cache_dir = tempfile.mkdtemp(prefix="travel-benchmark-")
+    geocoder.db_path = os.path.join(cache_dir, "geocode.sqlite")
+    currency_codes.cache_path = os.path.join(cache_dir, "currency_codes.json")
+    attractions_index.path = os.path.join(cache_dir, "attractions_index.json")
+
+    latency = Latency(latency_scale, jitter)
+    http_adapter = install_http_fixtures(latency, http_latency_ms)
+    manager = travel_assistant.conv_manager
+    manager.client = create_replay_client(latency, ttft_ms=ttft_ms, chunk_interval_ms=chunk_interval_ms,
+                                          verifier_ms=verifier_ms)
+    if hasattr(manager.context_cache, 'client'):
+        manager.context_cache.client = manager.client  # Cached contexts are created on the replay client too
+    if verification_mode is not None:
+        manager.verification_mode = verification_mode
+    if prefetch is not None:
+        manager.prefetcher = SpeculativePrefetcher() if prefetch else None
+    if routing is not None:
+        manager.router.enabled = routing
+
+    messages = scenario_messages()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda i: run_turn(travel_assistant.chat_with_agent, messages[i % len(messages)],
+                                             f"warmup-{i}"), range(warmup)))
+        tracer.reset()
+        if manager.prefetcher is not None:
+            manager.prefetcher.counts.clear()
+        manager.router.counts.clear()
+        manager.router.tokens.clear()
+        http_requests_before = http_adapter.requests
+
+        started = time.perf_counter()
+        results = list(executor.map(lambda i: run_turn(travel_assistant.chat_with_agent, messages[i % len(messages)],
+                                                       f"bench-{i}"), range(turns)))
+        elapsed = time.perf_counter() - started
+
+    completed = [result for result in results if 'e2e' in result]
+    errors = [result for result in results if 'error' in result]
+    return {
+        'config': {
+            'turns': turns, 'concurrency': concurrency, 'warmup': warmup,
+            'verification_mode': manager.verification_mode, 'latency_scale': latency_scale, 'jitter': jitter,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_turns_per_second': round(len(completed) / elapsed, 3) if elapsed else 0.0,
+        'completed': len(completed),
+        'errors': len(errors),
+        'error_samples': [error['error'] for error in errors[:3]],
+        'ttfc_seconds': distribution([result['ttfc'] for result in completed if result['ttfc'] is not None]),
+        'e2e_seconds': distribution([result['e2e'] for result in completed]),
+        'upstream_http_requests': http_adapter.requests - http_requests_before,
+        'spans': tracer.summary(),
+        'tokens': {f"{model}/{kind}": count for (model, kind), count in sorted(tracer.token_counts.items())},
+        'verification': dict(manager.verification_policy.stats),
+        'prefetch': manager.prefetcher.stats() if manager.prefetcher is not None else None,
+        'routes': manager.router.stats(),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report['config']
+    print(f"Turns: {report['completed']} completed, {report['errors']} failed, "
+          f"concurrency {config['concurrency']}, verification {config['verification_mode']}")
+    print(f"Elapsed: {report['elapsed_seconds']}s, throughput: {report['throughput_turns_per_second']} turns/s, "
+          f"upstream HTTP requests: {report['upstream_http_requests']}")
+    print()
+    print(f"{'':28}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for label, key in (("time to first chunk (s)", 'ttfc_seconds'), ("end to end (s)", 'e2e_seconds')):
+        row = report[key]
+        print(f"{label:28}" + "".join(f"{row[stat]:>9.3f}" for stat in ('mean', 'p50', 'p95', 'p99', 'max')))
+    print()
+    print(f"{'span':40}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, row in report['spans'].items():
+        print(f"{name:40}{row['count']:>7}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}")
+    if report['prefetch'] is not None:
+        print("\nPrefetch: " + ", ".join(
+            f"{resource} {report['prefetch'][f'{resource}_used']}/{report['prefetch'][f'{resource}_prefetched']} used, "
+            f"recall {report['prefetch'][f'{resource}_recall']:.0%}" for resource in ("geocode", "forecast", "rates")))
+    if report['routes']:
+        print("Routes: " + ", ".join(f"{route} {row['turns']} turns, mean {row['mean_seconds']:.3f}s, ${row['cost_usd']:.4f}"
+                                     for route, row in sorted(report['routes'].items())))
+    for error in report['error_samples']:
+        print(f"\nError sample:\n{error}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the travel agent offline against recorded upstreams.")
+    parser.add_argument("--turns", type=int, default=40, help="Measured turns")
+    parser.add_argument("--concurrency", type=int, default=8, help="Turns in flight at once")
+    parser.add_argument("--warmup", type=int, default=0, help="Unmeasured turns run first, to warm the tool caches")
+    parser.add_argument("--verification-mode", help="Overrides VERIFICATION_MODE")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplies every injected latency")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative variation of injected latencies")
+    parser.add_argument("--http-latency-ms", type=float, help="Latency of every HTTP upstream")
+    parser.add_argument("--ttft-ms", type=float, help="Gemini time to first token")
+    parser.add_argument("--chunk-interval-ms", type=float, help="Interval between Gemini chunks")
+    parser.add_argument("--verifier-ms", type=float, help="Verifier latency")
+    parser.add_argument("--no-prefetch", dest="prefetch", action="store_false", default=None,
+                        help="Disable the speculative prefetch, to measure its effect")
+    parser.add_argument("--no-routing", dest="routing", action="store_false", default=None,
+                        help="Answer every turn on the general route, to measure the effect of model routing")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--max-p95-e2e", type=float, help="Exit with an error if the end-to-end p95 exceeds this")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.turns, args.concurrency, args.warmup, args.verification_mode, args.latency_scale,
+                           args.jitter, args.http_latency_ms, args.ttft_ms, args.chunk_interval_ms, args.verifier_ms, args.prefetch,
+                           args.routing)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if report['errors']:
+        return 1
+    if args.max_p95_e2e is not None and report['e2e_seconds']['p95'] > args.max_p95_e2e:
+        print(f"\nRegression: end-to-end p95 {report['e2e_seconds']['p95']}s exceeds {args.max_p95_e2e}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Batch mode: runs many travel queries through the agent, e.g. for regression and quality evaluation.
+
+Queries are read from a JSONL file, one object per line with a "query", an optional "id" (the line number
+by default) and an optional "history" of earlier [user, assistant] exchanges. Every turn goes through
+achat_with_agent, with verification as configured, and its record is appended to the output JSONL as soon
+as it finishes: the response, the verifier's verdict, the tool calls, latency and token cost.
+Tool results are shared by the whole batch, so identical tool calls run once. Rerunning with the same output
+file resumes: queries that already have a successful record are skipped.
+
+Usage:
+    python -m src.batch queries.jsonl results.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.constants import BATCH_CONCURRENCY, BATCH_TOOL_CACHE_SIZE, SESSION_TOOL_CACHE_TTL_SECONDS
+from src.travel_assistant import achat_with_agent
+from src.utils.cache import LRUCache
+from src.utils.tracing import tracer, token_cost, tokens_by_model
+
+
+def read_queries(path: str) -> List[Dict[str, Any]]:
+    """
+    Args:
+        path (str): A JSONL file of queries.
+
+    Returns:
+        list: The queries, each with an 'id'.
+    """
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                query = json.loads(line)
+                query.setdefault('id', line_number)
+                queries.append(query)
+    return queries
+
+
+def read_records(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the records an earlier run wrote, keeping the last record of each query.
+
+    Args:
+        path (str): The output JSONL file.
+
+    Returns:
+        dict: The records by query id (as a string).
+    """
+    records = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short by an interruption
+                records[str(record['id'])] = record
+    return records
+
+
+async def run_query(query: Dict[str, Any], tool_cache: LRUCache) -> Dict[str, Any]:
+    """
+    Run one query through the agent.
+
+    Args:
+        query (dict): The query, with 'id', 'query' and an optional 'history'.
+        tool_cache (LRUCache): The tool results shared by the batch.
+
+    Returns:
+        dict: The query's record.
+    """
+    trace_id = uuid.uuid4().hex
+    chatbot = [list(exchange) for exchange in query.get('history', [])] + [[query['query'], None]]
+    report: Dict[str, Any] = {}
+    record: Dict[str, Any] = {'id': query['id'], 'query': query['query']}
+    token_counts = tracer.watch_tokens(trace_id)
+    started = time.perf_counter()
+    try:
+        async for chatbot in achat_with_agent(chatbot, trace_id=trace_id, report=report, tool_cache=tool_cache):
+            if 'first_chunk_seconds' not in record and chatbot[-1][1]:
+                record['first_chunk_seconds'] = round(time.perf_counter() - started, 4)
+        record['response'] = chatbot[-1][1]
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        tracer.unwatch_tokens(trace_id)
+
+    record['e2e_seconds'] = round(time.perf_counter() - started, 4)
+    record['verification'] = report.get('verification')
+    record['verification_skipped'] = report.get('verification_skipped')
+    record['correction'] = report.get('correction')
+    record['tool_calls'] = [{'name': call['name'], 'args': call['args'], 'cached': call['cached'],
+                             'duration': call['duration'],
+                             'error': call['result'].get('error') if isinstance(call['result'], dict) else None}
+                            for call in report.get('tool_calls', [])]
+    tokens = tokens_by_model(token_counts)
+    record['route'] = report.get('route')
+    record['tokens'] = tokens
+    record['cost_usd'] = round(token_cost(tokens), 6)
+    record['trace_id'] = trace_id
+    return record
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate the records of a batch.
+
+    Args:
+        records (Iterable[dict]): The last record of every query.
+
+    Returns:
+        dict: Counts of succeeded, failed, verified and flagged queries and of correction outcomes, latency
+            percentiles, tool call dedup, the total tokens and cost, and the queries, median latency and cost
+            of each model route.
+    """
+    records = list(records)
+    succeeded = [record for record in records if 'error' not in record]
+    tokens: Dict[str, Dict[str, int]] = {}
+    for record in succeeded:
+        for model, counts in record['tokens'].items():
+            model_tokens = tokens.setdefault(model, {})
+            for kind, count in counts.items():
+                model_tokens[kind] = model_tokens.get(kind, 0) + count
+    tool_calls = [call for record in succeeded for call in record['tool_calls']]
+    routes: Dict[str, List[Dict[str, Any]]] = {}
+    for record in succeeded:
+        routes.setdefault(record.get('route') or "none", []).append(record)
+    return {
+        'queries': len(records),
+        'succeeded': len(succeeded),
+        'failed': len(records) - len(succeeded),
+        'verified': sum(1 for record in succeeded if record['verification'] is not None),
+        'flagged': sum(1 for record in succeeded
+                       if record.get('correction') or (record['verification'] or {}).get('needs_correction')),
+        'corrections': dict(Counter(record['correction']['outcome'] for record in succeeded
+                                    if record.get('correction'))),
+        'latency_seconds': {
+            name: {f"p{round(q * 100)}": percentile([record[key] for record in succeeded if key in record], q)
+                   for q in (0.5, 0.95, 0.99)}
+            for name, key in (('first_chunk', 'first_chunk_seconds'), ('e2e', 'e2e_seconds'))
+        },
+        'tool_calls': len(tool_calls),
+        'tool_calls_deduplicated': sum(1 for call in tool_calls if call['cached']),
+        'tokens': tokens,
+        'cost_usd': round(sum(record['cost_usd'] for record in succeeded), 6),
+        'routes': {
+            route: {
+                'queries': len(route_records),
+                'p50_e2e_seconds': percentile([record['e2e_seconds'] for record in route_records], 0.5),
+                'cost_usd': round(sum(record['cost_usd'] for record in route_records), 6),
+            }
+            for route, route_records in sorted(routes.items())
+        },
+    }
+
+
+async def arun_batch(queries: List[Dict[str, Any]], output_path: str, concurrency: int = BATCH_CONCURRENCY,
+                     resume: bool = True) -> Dict[str, Any]:
+    """
+    Run a batch of queries through the agent with bounded concurrency, appending each record to the output
+    file as soon as its query finishes.
+
+    Args:
+        queries (list): The queries, each with an 'id' and a 'query'.
+        output_path (str): The JSONL file the records are appended to.
+        concurrency (int): Queries run at once.
+        resume (bool): Skip the queries that already have a successful record in the output file.
+
+    Returns:
+        dict: The summary of every query's last record, including those of earlier runs.
+    """
+    done = read_records(output_path) if resume else {}
+    pending = [query for query in queries if str(query['id']) not in done or 'error' in done[str(query['id'])]]
+    tool_cache = LRUCache(maxsize=BATCH_TOOL_CACHE_SIZE, ttl=SESSION_TOOL_CACHE_TTL_SECONDS)
+    semaphore = asyncio.Semaphore(concurrency)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+        async def run(query: Dict[str, Any]) -> None:
+            async with semaphore:
+                record = await run_query(query, tool_cache)
+            output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            output.flush()
+            done[str(query['id'])] = record
+
+        await asyncio.gather(*(run(query) for query in pending))
+
+    ids = {str(query['id']) for query in queries}
+    return summarize(record for query_id, record in done.items() if query_id in ids)
+
+
+def run_batch(queries: List[Dict[str, Any]], output_path: str, concurrency: int = BATCH_CONCURRENCY,
+              resume: bool = True) -> Dict[str, Any]:
+    """
+    Synchronous version of arun_batch, for callers that are not running an event loop.
+    """
+    return asyncio.run(arun_batch(queries, output_path, concurrency, resume))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of travel queries through the agent.")
+    parser.add_argument("queries", help="JSONL file of {\"id\", \"query\", \"history\"} objects")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Queries run at once")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    parser.add_argument("--report", help="Also write the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(read_queries(args.queries), args.output, args.concurrency, resume=not args.no_resume)
+    print(json.dumps(summary, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
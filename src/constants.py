@@ -1,6 +1,143 @@
 TRAVELER_MODEL = "gemini-2.5-flash"
 VERIFIER_MODEL = "gemini-2.5-pro"
+HISTORY_TOKEN_BUDGET = 8000  # Tokens of earlier conversation sent with each turn and to the verifier
+SESSION_STORE_SIZE = 10000  # Sessions whose state (history, tool results, stats) is kept in memory
+SESSION_TTL_SECONDS = 2 * 60 * 60  # Idle time after which a session's state is dropped
+SESSION_MEMORY_CAP_BYTES = 256 * 1024 * 1024  # Estimated size of all sessions' state, least recently used go first
+SESSION_TOOL_CACHE_SIZE = 32  # Tool results reused between the turns of a session
+SESSION_TOOL_CACHE_TTL_SECONDS = 15 * 60
+CHARS_PER_TOKEN = 4  # For the local token estimate
+MAX_TOOL_ROUNDS = 10  # Model requests per turn, including the ones answering function calls
+STREAM_FRAME_INTERVAL_SECONDS = 0.1  # Streamed text is sent to the UI at most this often, 0 sends every chunk
+STREAM_FRAME_MIN_CHARS = 400  # New text that is sent right away, without waiting for the frame interval
+CONTEXT_CACHE_BACKEND = "gemini"  # "gemini" caches the static prompt prefix, "local" sends it inline
+CONTEXT_CACHE_TTL_SECONDS = 60 * 60
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 5 * 60  # Renew a cached context this long before it expires
+CONTEXT_CACHE_DELETE_DELAY_SECONDS = 5 * 60  # An outdated context stays this long for the turns still using it
+# off: never verify, sampled: verify a VERIFICATION_SAMPLE_RATE share of responses, always: verify after every response,
+# async_after_display: verify in the background without holding the turn, pipelined: verify paragraphs while streaming
+VERIFICATION_MODES = ("off", "sampled", "always", "async_after_display", "pipelined")
+VERIFICATION_MODE = "always"
+VERIFICATION_SAMPLE_RATE = 0.2
+DOWNGRADED_VERIFIER_MODEL = TRAVELER_MODEL  # Verifies long responses that carry no factual signals
+VERDICT_CACHE_SIZE = 2048
+VERDICT_CACHE_TTL_SECONDS = 24 * 60 * 60
+VERDICT_CONTEXT_EXCHANGES = 2  # Earlier exchanges included in the verdict cache key
+LOW_RISK_MAX_CHARS = 400  # Responses up to this length with no factual signals skip verification
+CORRECTION_MAX_ROUNDS = 2  # Edit-and-reverify rounds for a flagged response, before it is left as corrected
+CORRECTION_MAX_EDITS = 8  # Edits applied per round, the rest of a larger rewrite is ignored
+CORRECTION_TOOL_RESULT_TOKENS = 1500  # Tokens of the turn's tool results shown to the corrector
 NOT_FOUND_ERROR_INSTRUCTION = "Try to answer without it. If you cant, ask the user to provide more information in his question."
+CACHE_DIR = ".cache"
+GEOCODE_DB_PATH = f"{CACHE_DIR}/geocode.sqlite"
+GEOCODE_CACHE_SIZE = 1024
+CURRENCY_CODES_CACHE_PATH = f"{CACHE_DIR}/currency_codes.json"
+CURRENCY_CODES_REFRESH_SECONDS = 24 * 60 * 60
+OPENTRIPMAP_DETAIL_WORKERS = 8  # Max concurrent /places/xid lookups per attractions call
+OPENTRIPMAP_DETAIL_TIMEOUT = 5  # Seconds, per detail request
+ATTRACTIONS_MIN_RATE = 3  # OpenTripMap rating of the attractions returned
+ATTRACTION_DESCRIPTION_TOKENS = 80  # Wikipedia extracts are cut to about this many tokens in tool results
+# Local attractions index, filled by `python -m src.prefetch_attractions` for the destinations below
+ATTRACTIONS_INDEX_PATH = f"{CACHE_DIR}/attractions_index.json"
+ATTRACTIONS_INDEX_CELL_DEGREES = 0.05  # Grid cell size, about 5.5 km of latitude
+ATTRACTIONS_PREFETCH_RADIUS = 20000  # Meters around each destination
+ATTRACTIONS_PREFETCH_PER_KIND = 20  # Places prefetched per kind and destination, with their details
+ATTRACTIONS_PREFETCH_DESTINATIONS = (
+    "Paris, France", "London, United Kingdom", "Rome, Italy", "Barcelona, Spain", "Amsterdam, Netherlands",
+    "Berlin, Germany", "Istanbul, Turkey", "New York, United States", "Tokyo, Japan", "Tel Aviv, Israel",
+)
+TOOL_EXECUTOR_WORKERS = 32  # Threads running tool calls, shared by all concurrent turns
+
+# Opt-in cache of answers to first-turn questions. An answer expires after the TTL of the most time-sensitive
+# tool it used; near-identical questions match above a trigram cosine similarity, if their content words match
+RESPONSE_CACHE_ENABLED = False
+RESPONSE_CACHE_SIZE = 2048
+RESPONSE_CACHE_TTL_SECONDS = 6 * 60 * 60  # Answers that used no tool, or only ones without a TTL below
+RESPONSE_CACHE_TOOL_TTLS = {
+    "get_destination_weather_forecast": 60 * 60,
+    "get_currency_exchange": 15 * 60,
+}
+RESPONSE_CACHE_SIMILARITY = 0.6  # Only preselects candidates, the content words decide
+RESPONSE_CACHE_WORD_SIMILARITY = 0.85  # Content words this similar are taken as the same word, e.g. typos
+
+# Speculative prefetch: warm the geocoding, forecast and rate caches from the user's message while the model thinks
+SPECULATIVE_PREFETCH_ENABLED = True
+SPECULATIVE_PREFETCH_MAX_DESTINATIONS = 3
+
+# Model routing: each turn is classified locally and answered with its route's model, thinking budget and output cap
+# (None keeps the model's default; Gemini 2.5 counts thinking tokens in the output cap). The verifier tier is
+# "skip", "cascade" (the downgraded verifier, escalating to VERIFIER_MODEL only to confirm a flag) or "full"
+MODEL_ROUTING_ENABLED = True
+MODEL_ROUTES = {
+    "small_talk": {"model": TRAVELER_MODEL, "thinking_budget": 0, "max_output_tokens": 512, "verifier": "skip"},
+    "lookup": {"model": TRAVELER_MODEL, "thinking_budget": 0, "max_output_tokens": 2048, "verifier": "cascade"},
+    "packing_list": {"model": TRAVELER_MODEL, "thinking_budget": 1024, "max_output_tokens": 4096,
+                     "verifier": "cascade"},
+    "itinerary": {"model": TRAVELER_MODEL, "thinking_budget": 4096, "max_output_tokens": 12288, "verifier": "full"},
+    "general": {"model": TRAVELER_MODEL, "thinking_budget": None, "max_output_tokens": None, "verifier": "full"},
+}
+LOOKUP_MAX_CHARS = 200  # Longer messages ask for more than a single fact
+SMALL_TALK_MAX_WORDS = 8
+
+# Batch evaluation: turns run at once, and tool results shared by the whole batch
+BATCH_CONCURRENCY = 8
+BATCH_TOOL_CACHE_SIZE = 4096
+# List prices in USD per million tokens, for the batch cost report. Prompt tokens include the cached ones,
+# which are billed at the cached price instead; thinking tokens are billed as output
+MODEL_PRICES_PER_MILLION_TOKENS = {
+    TRAVELER_MODEL: {"prompt": 0.30, "cached": 0.075, "candidates": 2.50, "thoughts": 2.50},
+    VERIFIER_MODEL: {"prompt": 1.25, "cached": 0.31, "candidates": 10.00, "thoughts": 10.00},
+}
+
+# Cache tier shared by the app workers: memory (this process only), sqlite (the workers of one host) or redis
+SHARED_CACHE_BACKEND = "memory"
+SHARED_CACHE_PATH = f"{CACHE_DIR}/shared_cache.sqlite"
+SHARED_CACHE_URL = "redis://localhost:6379/0"
+SHARED_CACHE_SIZE = 8192  # Entries of the memory backend
+SHARED_CACHE_KEY_PREFIX = "travel:"
+# Multi-worker deployment (`python -m src.serve`): workers listen on the ports after the entry point's
+WORKER_STICKY_COOKIE = "travel_worker"
+WORKER_RESTART_DELAY_SECONDS = 1
+
+# Admission control: turns run at once, turns allowed to wait, and the queue depth at which verification is skipped
+MAX_CONCURRENT_TURNS = 32
+MAX_QUEUED_TURNS = 200
+LOAD_SHED_QUEUE_DEPTH = 16
+# Per-upstream concurrency and token-bucket rate limits, matched to each API key's quota
+UPSTREAM_LIMITS = {
+    TRAVELER_MODEL: {"concurrency": 32, "rate_per_second": 1000 / 60, "burst": 20},
+    VERIFIER_MODEL: {"concurrency": 8, "rate_per_second": 150 / 60, "burst": 5},
+    "opentripmap": {"concurrency": 8, "rate_per_second": 10, "burst": 10},
+    "openweather": {"concurrency": 8, "rate_per_second": 60 / 60, "burst": 10},
+    "exchangerate": {"concurrency": 4, "rate_per_second": 1, "burst": 5},
+}
+UPSTREAM_MAX_WAIT_SECONDS = 5  # Longest wait for a rate token, a request that would wait longer fails as busy
+
+# Outbound HTTP: (connect, read) timeouts in seconds per upstream API
+HTTP_TIMEOUTS = {
+    "default": (3.05, 10),
+    "opentripmap": (3.05, 10),
+    "openweather": (3.05, 8),
+    "exchangerate": (3.05, 8),
+}
+HTTP_POOL_SIZE = 16  # Keep-alive connections per host
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_BASE = 0.3  # Seconds, doubled on every retry before jitter
+CIRCUIT_BREAKER_THRESHOLD = 5  # Consecutive failed requests before an upstream is short-circuited
+CIRCUIT_BREAKER_RESET_SECONDS = 30
+
+EXCHANGE_RATE_BASE = "USD"  # Every currency pair is derived from this base's rate table
+EXCHANGE_RATE_STALE_RETRY_SECONDS = 600  # Re-check interval when the upstream is late publishing a new table
+
+FORECAST_DAYS = 5  # How far ahead the OpenWeather forecast reaches
+FORECAST_CACHE_SIZE = 512
+FORECAST_CACHE_TTL_SECONDS = 3 * 60 * 60  # OpenWeather refreshes the 5-day/3-hour forecast every 3 hours
+
+# Latency tracing: histogram bucket upper bounds in seconds, and recent samples kept per span for quantiles
+TRACE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TRACE_RESERVOIR_SIZE = 1024
+TRACE_QUANTILES = (0.5, 0.95, 0.99)
+TRACE_EXPORT_QUEUE_SIZE = 10000  # Spans waiting for the trace file writer, newer ones are dropped when full
 ALLOWED_KINDS = {
     "restaurants", "cafes", "pubs", "bars", "malls",
     "natural", "beaches", "waterfalls", "nature_reserves", "volcanoes", "caves", "mountain_peaks",
@@ -0,0 +1,169 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from src.constants import HISTORY_TOKEN_BUDGET, CHARS_PER_TOKEN, VERDICT_CONTEXT_EXCHANGES
+from src.utils.utils import truncate_to_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate, close enough to Gemini's tokenizer for budgeting.
+
+    Args:
+        text (str): The text to estimate.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Message(NamedTuple):
+    exchange: int  # 1-based index of the exchange the message belongs to
+    role: str  # "user" or "model"
+    text: str
+    tokens: int
+    content: Dict[str, Any]  # The message in Gemini format, built once
+
+
+class ConversationHistory:
+    """
+    The conversation history of a single session, kept in Gemini format.
+    Completed exchanges are appended incrementally as they show up in the Gradio chatbot, and the history
+    keeps only the most recent whole exchanges that fit in a token budget, so each turn does work proportional
+    to the new messages rather than to the whole conversation, and the window never opens with an answer
+    whose question was dropped. An exchange larger than the whole budget is truncated to fit.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.messages: Deque[Message] = deque()
+        self.window_tokens = 0
+        self.synced_exchanges = 0  # Number of chatbot exchanges already appended
+        self.last_exchange: Optional[Tuple[str, str]] = None
+        self.recent_exchanges: Deque[Tuple[str, str]] = deque(maxlen=VERDICT_CONTEXT_EXCHANGES)
+
+    def reset(self) -> None:
+        self.messages.clear()
+        self.window_tokens = 0
+        self.synced_exchanges = 0
+        self.last_exchange = None
+        self.recent_exchanges.clear()
+
+    def _append_message(self, exchange: int, role: str, text: str, max_tokens: int) -> int:
+        if estimate_tokens(text) > max_tokens:
+            text = truncate_to_tokens(text, max(max_tokens - 1, 1))  # Leave room for the estimate's rounding
+        tokens = estimate_tokens(text)
+        self.messages.append(Message(exchange, role, text, tokens, {"role": role, "parts": [{"text": text}]}))
+        self.window_tokens += tokens
+        return tokens
+
+    def _trim(self) -> None:
+        """
+        Drop the oldest exchanges, whole, until the window fits in the budget, always keeping the newest one.
+        """
+        while self.window_tokens > self.token_budget and self.messages[0].exchange != self.messages[-1].exchange:
+            oldest = self.messages[0].exchange
+            while self.messages[0].exchange == oldest:
+                self.window_tokens -= self.messages.popleft().tokens
+
+    def append_exchange(self, user_msg: Optional[str], assistant_msg: Optional[str]) -> None:
+        """
+        Append a completed exchange.
+
+        Args:
+            user_msg (Optional[str]): The user's message.
+            assistant_msg (Optional[str]): The assistant's response.
+        """
+        self.synced_exchanges += 1
+        # A question gets at most half of the budget, its answer whatever the question left
+        user_tokens = 0
+        if user_msg:
+            max_tokens = self.token_budget // 2 if assistant_msg else self.token_budget
+            user_tokens = self._append_message(self.synced_exchanges, "user", user_msg, max_tokens)
+        if assistant_msg:  # Only add if assistant_msg is not None or empty
+            self._append_message(self.synced_exchanges, "model", assistant_msg, self.token_budget - user_tokens)
+        if self.messages:
+            self._trim()
+        self.last_exchange = (user_msg, assistant_msg)
+        if user_msg and assistant_msg:
+            self.recent_exchanges.append((user_msg, assistant_msg))
+
+    def sync(self, chatbot: List[List[str]]) -> "ConversationHistory":
+        """
+        Bring the history up to date with a Gradio chatbot, excluding its current incomplete exchange.
+        Only exchanges that weren't seen before are appended; if the chatbot no longer continues this
+        history (e.g. it was cleared), the history is rebuilt.
+
+        Args:
+            chatbot (List[List[str]]): The current chat history.
+
+        Returns:
+            ConversationHistory: self.
+        """
+        completed = chatbot[:-1]
+        if len(completed) < self.synced_exchanges or (
+                self.synced_exchanges and tuple(completed[self.synced_exchanges - 1]) != self.last_exchange):
+            self.reset()
+
+        for user_msg, assistant_msg in completed[self.synced_exchanges:]:
+            self.append_exchange(user_msg, assistant_msg)
+        return self
+
+    def to_contents(self, user_msg: Optional[str], request_context: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Build the Gemini contents for a new turn.
+
+        Args:
+            user_msg (Optional[str]): The current user message.
+            request_context (Optional[str]): Per-request instructions sent along with the user message,
+                e.g. the current date, kept out of the cacheable system prompt.
+
+        Returns:
+            List: A list of dictionaries representing the conversation history in Gemini format.
+        """
+        contents = [message.content for message in self.messages]
+        if user_msg:
+            parts = [{"text": request_context}] if request_context else []
+            contents.append({"role": "user", "parts": parts + [{"text": user_msg}]})
+        return contents
+
+    def conversation_for_policy(self, user_msg: str, response: str) -> List[Tuple[str, str]]:
+        """
+        Returns:
+            List[Tuple[str, str]]: The most recent completed exchanges followed by the exchange being verified.
+        """
+        return list(self.recent_exchanges) + [(user_msg, response)]
+
+    def verification_context(self, user_msg: Optional[str], response: Optional[str]) -> str:
+        """
+        Build the verifier's context from the same token-budgeted window, highlighting the exchange to verify.
+
+        Args:
+            user_msg (Optional[str]): The user message of the exchange to verify.
+            response (Optional[str]): The response to verify.
+
+        Returns:
+            str: The verification context.
+        """
+        parts = ["FULL CONVERSATION FOR CONTEXT:\n\n"]
+        exchange = None
+        for message in self.messages:
+            if exchange is not None and message.exchange != exchange:
+                parts.append("\n")
+            exchange = message.exchange
+            speaker = "User" if message.role == "user" else "Assistant"
+            parts.append(f"{speaker} {message.exchange}: {message.text}\n")
+        if exchange is not None:
+            parts.append("\n")
+
+        # Highlight the last exchange that needs verification
+        parts.append("=" * 50 + "\n")
+        parts.append("LAST EXCHANGE TO VERIFY:\n")
+        parts.append("=" * 50 + "\n")
+        if user_msg:
+            parts.append(f"User: {user_msg}\n")
+        if response:
+            parts.append(f"Assistant: {response}\n")
+        parts.append("=" * 50 + "\n")
+        return "".join(parts)
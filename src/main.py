@@ -1,8 +1,21 @@
-from typing import Tuple, List
+from typing import Tuple, List, AsyncGenerator
 
 import gradio as gr
-
-from src.travel_assistant import chat_with_agent
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from src.constants import STREAM_FRAME_INTERVAL_SECONDS, STREAM_FRAME_MIN_CHARS
+from src.travel_assistant import achat_with_agent, conv_manager
+from src.utils.scheduler import turn_scheduler
+from src.utils.shared_cache import shared_cache
+from src.utils.streaming import coalesce_frames
+from src.utils.tracing import tracer
+from src.utils.utils import get_env_variable
+
+# Streamed text is coalesced into frames, so each response isn't re-sent through Gradio once per model chunk
+frame_interval = float(get_env_variable("STREAM_FRAME_INTERVAL_SECONDS", default=STREAM_FRAME_INTERVAL_SECONDS))
+frame_min_chars = int(get_env_variable("STREAM_FRAME_MIN_CHARS", default=STREAM_FRAME_MIN_CHARS))
 
 with gr.Blocks(
         title="Travel Agent Chat",
@@ -69,6 +82,24 @@ with gr.Blocks(
         return "", chatbot + [[message, None]]
 
 
+    async def respond(chatbot: List[List[str]], request: gr.Request) -> AsyncGenerator[List[List[str]], None]:
+        """
+        Streams the agent's response in coalesced frames, keeping the conversation history of the user's session
+        between turns. A Gradio Chatbot output always takes the whole history, which Gradio diffs against the
+        previous frame so only the appended text reaches the browser; fewer frames is what saves the server work.
+
+        Args:
+            chatbot (List[List[str]]): The current chat history.
+            request (gr.Request): The Gradio request, injected by Gradio.
+
+        Yields:
+            List[List[str]]: Updated chatbot history with responses from the agent.
+        """
+        async for chatbot in coalesce_frames(achat_with_agent(chatbot, session_id=request.session_hash),
+                                             frame_interval, frame_min_chars):
+            yield chatbot
+
+
     # Connect the events
     msg.submit(
         submit_message,
@@ -76,7 +107,7 @@ with gr.Blocks(
         [msg, chatbot],
         queue=False
     ).then(
-        chat_with_agent,
+        respond,
         [chatbot],
         [chatbot]
     )
@@ -87,7 +118,7 @@ with gr.Blocks(
         [msg, chatbot],
         queue=False
     ).then(
-        chat_with_agent,
+        respond,
         [chatbot],
         [chatbot]
     )
@@ -105,12 +136,79 @@ with gr.Blocks(
         label="Try these examples:"
     )
 
+
+def metrics() -> PlainTextResponse:
+    """
+    Serves the latency histograms, p50/p95/p99 quantiles, token counters, session store, admission,
+    response cache, speculative prefetch, shared cache and model route metrics for Prometheus to scrape.
+    With several workers, each serves its own metrics on its own port.
+    """
+    sessions = conv_manager.sessions.stats()
+    turns = turn_scheduler.stats()
+    session_metrics = (
+        "# TYPE travel_sessions gauge\n"
+        f"travel_sessions {sessions['size']}\n"
+        "# TYPE travel_session_bytes gauge\n"
+        f"travel_session_bytes {sessions['bytes']}\n"
+        "# TYPE travel_session_evictions_total counter\n"
+        f"travel_session_evictions_total {sessions['evictions']}\n"
+    )
+    admission_metrics = (
+        "# TYPE travel_turns_in_flight gauge\n"
+        f"travel_turns_in_flight {turns['in_flight']}\n"
+        "# TYPE travel_turns_queued gauge\n"
+        f"travel_turns_queued {turns['queued']}\n"
+        "# TYPE travel_turns_rejected_total counter\n"
+        f"travel_turns_rejected_total {turns['rejected']}\n"
+    )
+    response_cache_metrics = ""
+    if conv_manager.response_cache is not None:
+        lookups = conv_manager.response_cache.stats
+        response_cache_metrics = (
+            "# TYPE travel_response_cache_lookups_total counter\n"
+            + "".join(f'travel_response_cache_lookups_total{{result="{result}"}} {lookups[result]}\n'
+                      for result in ("exact_hits", "similar_hits", "misses"))
+        )
+    prefetch_metrics = ""
+    if conv_manager.prefetcher is not None:
+        counts = conv_manager.prefetcher.counts
+        prefetch_metrics = "# TYPE travel_prefetch_total counter\n" + "".join(
+            f'travel_prefetch_total{{resource="{resource}",outcome="{outcome}"}} {counts[f"{resource}_{outcome}"]}\n'
+            for resource in ("geocode", "forecast", "rates") for outcome in ("prefetched", "used", "missed"))
+    shared_cache_metrics = "# TYPE travel_shared_cache_total counter\n" + "".join(
+        f'travel_shared_cache_total{{namespace="{namespace}",result="{result}"}} {count}\n'
+        for (namespace, result), count in sorted(shared_cache.counts.items()))
+    route_counts = conv_manager.router.counts
+    route_metrics = (
+        "# TYPE travel_route_turns_total counter\n"
+        + "".join(f'travel_route_turns_total{{route="{route}"}} {counts["turns"]}\n'
+                  for route, counts in sorted(route_counts.items()))
+        + "# TYPE travel_route_cost_usd_total counter\n"
+        + "".join(f'travel_route_cost_usd_total{{route="{route}"}} {counts["cost_usd"]:.6f}\n'
+                  for route, counts in sorted(route_counts.items()))
+    )
+    return PlainTextResponse(tracer.render_prometheus() + session_metrics + admission_metrics + response_cache_metrics
+                             + prefetch_metrics + shared_cache_metrics + route_metrics,
+                             media_type="text/plain; version=0.0.4")
+
+
+def create_app() -> FastAPI:
+    """
+    Creates the server app: the Gradio UI at the root, with the metrics endpoint next to it.
+
+    Returns:
+        FastAPI: The app to serve.
+    """
+    demo.queue(max_size=20)  # Enable queuing for streaming
+    app = FastAPI()
+    app.add_api_route("/metrics", metrics, methods=["GET"])
+    return gr.mount_gradio_app(app, demo, path="/")
+
+
 # Launch the app
 if __name__ == "__main__":
-    demo.queue(max_size=20)  # Enable queuing for streaming
-    demo.launch(
-        server_name="127.0.0.1",
-        server_port=7860,  # Default Gradio port
-        share=False,
-        debug=True
+    uvicorn.run(
+        create_app(),
+        host="127.0.0.1",
+        port=7860,  # Default Gradio port
     )
@@ -0,0 +1,141 @@
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, NamedTuple, Optional
+
+from google.genai import types
+
+from src.constants import MODEL_ROUTES, ALLOWED_KINDS, LOOKUP_MAX_CHARS, SMALL_TALK_MAX_WORDS
+from src.speculative_prefetch import Hints, extract_hints, WORD_PATTERN, WEATHER_WORDS
+from src.utils.tracing import tracer, token_cost, tokens_by_model
+
+VERIFIER_TIERS = ("skip", "cascade", "full")
+
+PACKING_PATTERN = re.compile(
+    r"\b(?:pack|packing|luggage|suitcase|carry[- ]on|what (?:should|do) (?:i|we) (?:bring|take|wear)"
+    r"|what to (?:bring|take|wear))\b", re.IGNORECASE)
+ITINERARY_PATTERN = re.compile(
+    r"\b(?:itinerar(?:y|ies)|day[- ]by[- ]day|schedule|plan (?:my|our|a|the) (?:trip|holiday|vacation|visit|stay)"
+    r"|\d+[- ]?(?:days?|nights?|weeks?)\b|(?:one|two|three|four|five|six|seven|ten|a) (?:days?|nights?|weeks?) in"
+    r"|weekend in)", re.IGNORECASE)
+SMALL_TALK_WORDS = {"hi", "hello", "hey", "thanks", "thank", "you", "cheers", "bye", "goodbye", "good", "morning",
+                    "afternoon", "evening", "night", "great", "nice", "awesome", "perfect", "cool", "how", "are",
+                    "there", "so", "much", "a", "lot", "again", "that", "helps", "helped", "very", "for", "the", "help",
+                    "have", "day", "see", "later"}
+ATTRACTION_WORDS = {"attraction", "sight", "sightseeing", "landmark", "visit", "see"} | {
+    word.rstrip("s") for kind in ALLOWED_KINDS for word in kind.split("_") if len(word) > 3}
+
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    thinking_budget: Optional[int]  # None keeps the model's default
+    max_output_tokens: Optional[int]
+    verifier: str  # One of VERIFIER_TIERS
+
+    def config_kwargs(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: The GenerateContentConfig fields of the route.
+        """
+        kwargs: Dict[str, Any] = {}
+        if self.thinking_budget is not None:
+            kwargs['thinking_config'] = types.ThinkingConfig(thinking_budget=self.thinking_budget)
+        if self.max_output_tokens is not None:
+            kwargs['max_output_tokens'] = self.max_output_tokens
+        return kwargs
+
+
+def classify(message: str, hints: Optional[Hints] = None) -> str:
+    """
+    Classify a user message with cheap local rules, erring towards the general route.
+
+    Args:
+        message (str): The user's message.
+        hints (Hints, optional): The message's destinations, dates and currencies, extracted if not given.
+
+    Returns:
+        str: "packing_list", "itinerary", "small_talk", "lookup" or "general".
+    """
+    if PACKING_PATTERN.search(message):
+        return "packing_list"
+    if ITINERARY_PATTERN.search(message):
+        return "itinerary"
+
+    words = [word.casefold() for word in WORD_PATTERN.findall(message)]
+    if words and len(words) <= SMALL_TALK_MAX_WORDS and all(word in SMALL_TALK_WORDS for word in words):
+        return "small_talk"
+
+    hints = hints or extract_hints(message)
+    if len(message) <= LOOKUP_MAX_CHARS and len(hints.destinations) <= 1:
+        stems = {word.rstrip("s") for word in words}
+        if hints.rates or (hints.destinations and stems & (WEATHER_WORDS | ATTRACTION_WORDS)):
+            return "lookup"
+    return "general"
+
+
+class ModelRouter:
+    """
+    Picks the generation model, thinking budget, output cap and verifier tier of each turn from its class,
+    so greetings and single-fact lookups are answered fast and the stronger verifier is kept for the turns
+    that need it. Latency, tokens and cost are accounted per route.
+    """
+
+    def __init__(self, enabled: bool = True, routes: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.enabled = enabled
+        self.routes = {name: Route(name, **route) for name, route in (routes or MODEL_ROUTES).items()}
+        for route in self.routes.values():
+            if route.verifier not in VERIFIER_TIERS:
+                raise ValueError(f"Unknown verifier tier '{route.verifier}' of route '{route.name}'. "
+                                 f"Must be one of: {VERIFIER_TIERS}.")
+        self.counts: Dict[str, Counter] = defaultdict(Counter)  # route -> turns, seconds, cost_usd
+        self.tokens: Dict[str, Counter] = defaultdict(Counter)  # route -> (model, kind) -> tokens
+
+    def route(self, message: Optional[str], hints: Optional[Hints] = None) -> Route:
+        """
+        Args:
+            message (Optional[str]): The user's message.
+            hints (Hints, optional): The message's hints, if the speculative prefetch already extracted them.
+
+        Returns:
+            Route: The message's route, the general one when routing is disabled.
+        """
+        if not self.enabled or not message:
+            return self.routes["general"]
+        return self.routes[classify(message, hints)]
+
+    def record(self, route: Route, seconds: float, first_chunk_seconds: Optional[float],
+               tokens: Dict[tuple, int], trace_id: Optional[str] = None) -> None:
+        """
+        Account a finished turn to its route.
+
+        Args:
+            route (Route): The turn's route.
+            seconds (float): The turn's end-to-end latency.
+            first_chunk_seconds (Optional[float]): The time until the turn's first chunk was shown.
+            tokens (dict): The turn's token counts by (model, kind).
+            trace_id (Optional[str]): The trace of the turn.
+        """
+        tracer.record(f"route.{route.name}", seconds, trace_id)
+        counts = self.counts[route.name]
+        counts.update(turns=1, seconds=seconds, cost_usd=token_cost(tokens_by_model(tokens)))
+        if first_chunk_seconds is not None:
+            counts.update(first_chunk_turns=1, first_chunk_seconds=first_chunk_seconds)
+        self.tokens[route.name].update(tokens)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            dict: Per route, the turns, mean latency and time to first chunk, tokens and cost.
+        """
+        stats = {}
+        for name, counts in self.counts.items():
+            turns = counts['turns']
+            stats[name] = {
+                'turns': turns,
+                'mean_seconds': round(counts['seconds'] / turns, 4) if turns else 0.0,
+                'mean_first_chunk_seconds': round(counts['first_chunk_seconds'] / counts['first_chunk_turns'], 4)
+                if counts['first_chunk_turns'] else 0.0,
+                'tokens': tokens_by_model(self.tokens[name]),
+                'cost_usd': round(counts['cost_usd'], 6),
+            }
+        return stats
@@ -0,0 +1,130 @@
+"""
+Prefetch job of the local attractions index.
+
+Bulk-loads the top-rated OpenTripMap attractions of every allowed kind, with their details, around each
+destination into the index that get_local_attractions_opentripmap answers from. Run it periodically,
+e.g. daily; a running server picks up the rewritten index within a minute.
+
+Usage:
+    python -m src.prefetch_attractions
+    python -m src.prefetch_attractions "Lisbon, Portugal" "Prague, Czechia" --kinds museums castles
+"""
+import argparse
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.constants import ALLOWED_KINDS, ATTRACTIONS_MIN_RATE, ATTRACTIONS_PREFETCH_DESTINATIONS, \
+    ATTRACTIONS_PREFETCH_RADIUS, ATTRACTIONS_PREFETCH_PER_KIND
+from src.travel_tools import OPEN_TRIP_MAP_API_KEY, _get_all_attraction_details
+from src.utils.attractions_index import AttractionsIndex, attractions_index
+from src.utils.geocoding import geocoder
+from src.utils.http import http_get, parse_json
+
+
+def prefetch_destination(destination: str, kinds: Iterable[str], radius: int = ATTRACTIONS_PREFETCH_RADIUS,
+                         per_kind: int = ATTRACTIONS_PREFETCH_PER_KIND
+                         ) -> Optional[Tuple[Dict[str, Any], Dict[str, bool], List[Dict[str, Any]]]]:
+    """
+    Fetch the top-rated places of each kind around a destination, and the details of every place once.
+
+    Args:
+        destination (str): The destination city/country (e.g., "Paris, France").
+        kinds (Iterable[str]): The OpenTripMap kinds to prefetch.
+        radius (int): Meters around the destination.
+        per_kind (int): Places fetched per kind.
+
+    Returns:
+        Optional[tuple]: The destination's location, the kinds mapped to True if all their places fit in
+            `per_kind`, and the places; None if the destination was not found.
+    """
+    location = geocoder.geocode(destination)
+    if location is None:
+        return None
+
+    complete = {}
+    found: Dict[str, Dict[str, Any]] = {}
+    for kind in kinds:
+        places = parse_json(http_get("opentripmap", "https://api.opentripmap.com/0.1/en/places/radius", params={
+            'kinds': kind,
+            'radius': radius,
+            'lon': location['lon'],
+            'lat': location['lat'],
+            'limit': per_kind,
+            'rate': ATTRACTIONS_MIN_RATE,
+            'format': 'json',
+            'apikey': OPEN_TRIP_MAP_API_KEY
+        }))
+        complete[kind] = len(places) < per_kind
+        for place in places:
+            found.setdefault(place['xid'], place)
+
+    places = list(found.values())
+    details = _get_all_attraction_details(places)
+    return location, complete, [{
+        'xid': place['xid'],
+        'name': detail.name or place.get('name'),
+        'lat': place['point']['lat'],
+        'lon': place['point']['lon'],
+        'rate': place.get('rate', ATTRACTIONS_MIN_RATE),
+        'kinds': place.get('kinds', ''),
+        'description': detail.description,
+        'url': detail.url,
+    } for place, detail in zip(places, details)]
+
+
+def prefetch(destinations: Iterable[str], kinds: Iterable[str], index: AttractionsIndex = attractions_index,
+             radius: int = ATTRACTIONS_PREFETCH_RADIUS, per_kind: int = ATTRACTIONS_PREFETCH_PER_KIND) -> Dict[str, Any]:
+    """
+    Prefetch the destinations into the index and save it. The index is saved after every destination,
+    so an interrupted job keeps what it already fetched.
+
+    Args:
+        destinations (Iterable[str]): The destinations to prefetch.
+        kinds (Iterable[str]): The OpenTripMap kinds to prefetch.
+        index (AttractionsIndex): The index to add them to.
+        radius (int): Meters around each destination.
+        per_kind (int): Places fetched per kind and destination.
+
+    Returns:
+        dict: The number of places prefetched per destination, and the destinations that failed.
+    """
+    kinds = sorted(kinds)
+    index.load()
+    summary = {'places': {}, 'failed': {}}
+    for destination in destinations:
+        try:
+            result = prefetch_destination(destination, kinds, radius, per_kind)
+        except Exception as e:
+            summary['failed'][destination] = str(e)
+            continue
+        if result is None:
+            summary['failed'][destination] = "Destination not found"
+            continue
+        location, complete, places = result
+        index.add_area(destination, location['lat'], location['lon'], radius, complete, places)
+        index.save()
+        summary['places'][destination] = len(places)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prefetch OpenTripMap attractions into the local index.")
+    parser.add_argument("destinations", nargs="*", default=list(ATTRACTIONS_PREFETCH_DESTINATIONS),
+                        help="Destinations to prefetch, ATTRACTIONS_PREFETCH_DESTINATIONS by default")
+    parser.add_argument("--kinds", nargs="+", default=sorted(ALLOWED_KINDS), choices=sorted(ALLOWED_KINDS),
+                        metavar="KIND", help="Kinds to prefetch, all allowed kinds by default")
+    parser.add_argument("--radius", type=int, default=ATTRACTIONS_PREFETCH_RADIUS, help="Meters around each destination")
+    parser.add_argument("--per-kind", type=int, default=ATTRACTIONS_PREFETCH_PER_KIND,
+                        help="Places fetched per kind and destination")
+    args = parser.parse_args(argv)
+
+    summary = prefetch(args.destinations, args.kinds, radius=args.radius, per_kind=args.per_kind)
+    for destination, count in summary['places'].items():
+        print(f"{destination}: {count} places")
+    for destination, error in summary['failed'].items():
+        print(f"{destination}: failed ({error})")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
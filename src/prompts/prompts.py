@@ -1,21 +1,26 @@
 from datetime import datetime
 
-from src.constants import NOT_FOUND_ERROR_INSTRUCTION, PACKING_LIST_EXAMPLE
-from src.utils.utils import get_all_currency_codes
+from src.constants import PACKING_LIST_EXAMPLE
+from src.utils.currency_codes import currency_codes
 
-system_prompt_metadata = f"""
-Today is {datetime.now()}, and this is the relative time for the user questions. 
-Currency codes: {get_all_currency_codes()}
+# Static metadata, part of the cached prompt prefix
+system_prompt_metadata_template = """
+Currency codes: {currency_codes}
 """
 
-travel_system_prompt = f"""
+# Per-request metadata, sent with the user message so the prefix stays cacheable
+request_metadata_template = """
+Today is {now}, and this is the relative time for the user questions. 
+"""
+
+travel_system_prompt_template = f"""
 ### Task Instructions:
 - You are a Travel Assistant tasked with answering user questions effectively and naturally.
 - You have access to multiple tools to assist in providing answers. However, if a tool is not relevant or available, you are expected to provide the answer using your own knowledge.
 - **Do not inform the user** about the tools, your limitations, or any inabilities.
 - Your goal is to ensure that each answer is helpful, accurate, and presented in a natural way
 
-{system_prompt_metadata}
+{{system_prompt_metadata}}
 
 Examples:
 
@@ -81,7 +86,7 @@ Tomorrow, Saturday, August 9, 2025, in London, the weather will be partly cloudy
 
 """
 
-verifier_system_prompt = f"""
+verifier_system_prompt_template = """
 You are a verifier for detecting confused responses or hallucinations in conversations with the LLM. Your task is to review the most recent LLM response and analyze the conversation's context. If the response seems confused or contains hallucinated information, you will flag it and provide suggestions for correction.
 
 {system_prompt_metadata}
@@ -100,9 +105,7 @@ You are a verifier for detecting confused responses or hallucinations in convers
 }}
 """
 
-corrected_traveler_system_prompt = """
-{travel_system_prompt}
-
+correction_request_template = """
 **IMPORTANT CORRECTION NEEDED**
 A verifier had checked your previous answer to the user question and gave you the following feedback:
 {feedback}
@@ -110,3 +113,89 @@ A verifier had checked your previous answer to the user question and gave you th
 Please provide a corrected response that addresses the issues mentioned above.
 Be extra careful about accuracy and relevance.
 """
+
+corrector_system_prompt_template = """
+You are an editor correcting a travel assistant's response that a verifier flagged. Instead of rewriting the response, you return the smallest edits that fix the flagged parts, so the rest of the response stays exactly as the user already read it.
+
+{system_prompt_metadata}
+
+### Task Instructions:
+- Read the verifier's feedback, the tool results the assistant had, and the response.
+- Fix only what the feedback flags. Base corrected facts, numbers and dates on the tool results; if the tool results don't support a statement, remove or soften it rather than inventing a replacement.
+- Each edit replaces one excerpt of the response: `find` must be copied verbatim from the response, long enough to occur only once, and `replace` is the corrected text (empty to delete it).
+- Keep the response's language, tone and Markdown formatting.
+- Return an empty list of edits if the response can't be fixed by local edits, e.g. because it answers the wrong question.
+
+### Output Format:
+{{
+  "edits": [
+    {{"find": "<exact excerpt of the response>", "replace": "<corrected text>"}}
+  ]
+}}
+"""
+
+correction_edits_request_template = """
+### Verifier feedback:
+{feedback}
+
+### Tool results gathered for this answer:
+{tool_results}
+
+### Response to correct:
+{response}
+"""
+
+
+_static_prompts = {}  # template name -> (currency code list it was rendered with, rendered prompt)
+
+
+def _render_static_prompt(name: str, template: str) -> str:
+    """
+    Render a static system prompt, re-rendering it only when the currency code list changes.
+
+    Args:
+        name (str): The prompt's name.
+        template (str): The prompt template, with a {system_prompt_metadata} placeholder.
+
+    Returns:
+        str: The rendered prompt.
+    """
+    codes = currency_codes.get()["supported_codes"]
+    rendered_codes, prompt = _static_prompts.get(name, (None, None))
+    if rendered_codes is not codes:
+        metadata = system_prompt_metadata_template.format(currency_codes={"supported_codes": codes})
+        prompt = template.format(system_prompt_metadata=metadata)
+        _static_prompts[name] = (codes, prompt)
+    return prompt
+
+
+def get_request_metadata() -> str:
+    """
+    Returns:
+        str: The per-request prompt metadata, i.e. the current time.
+    """
+    return request_metadata_template.format(now=datetime.now())
+
+
+def get_travel_system_prompt() -> str:
+    """
+    Returns:
+        str: The static traveler system prompt, which is the same for every request.
+    """
+    return _render_static_prompt("travel", travel_system_prompt_template)
+
+
+def get_verifier_system_prompt() -> str:
+    """
+    Returns:
+        str: The static verifier system prompt, which is the same for every request.
+    """
+    return _render_static_prompt("verifier", verifier_system_prompt_template)
+
+
+def get_corrector_system_prompt() -> str:
+    """
+    Returns:
+        str: The static corrector system prompt, which is the same for every request.
+    """
+    return _render_static_prompt("corrector", corrector_system_prompt_template)
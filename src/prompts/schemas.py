@@ -12,3 +12,28 @@ VERIFICATION_SCHEMA = {
     },
     "required": ["needs_correction", "feedback"]
 }
+
+CORRECTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "edits": {
+            "type": "array",
+            "description": "The replacements that fix the flagged parts of the response, in the order they appear",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "find": {
+                        "type": "string",
+                        "description": "An exact, verbatim excerpt of the response to replace"
+                    },
+                    "replace": {
+                        "type": "string",
+                        "description": "The corrected text, empty to delete the excerpt"
+                    }
+                },
+                "required": ["find", "replace"]
+            }
+        }
+    },
+    "required": ["edits"]
+}
@@ -0,0 +1,171 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Set
+
+from src.constants import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_TOOL_TTLS, \
+    RESPONSE_CACHE_SIMILARITY, RESPONSE_CACHE_WORD_SIMILARITY
+
+WORD_PATTERN = re.compile(r"\w+")
+# Words that don't change what a travel question asks for
+STOPWORDS = frozenset("""
+a an the and or of to in on at for from by with near around about into is are was were be been am do does did
+can could would should will shall may might must i me my we our you your it its this that these those there here
+what which who whom whose how when where why please tell give show recommend recommended suggest some any most
+best top good great famous popular list create make find need want like know let us go going trip travel visit
+""".split())
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a question for exact matching: Unicode-normalized, case-folded, punctuation removed.
+    """
+    return " ".join(WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold()))
+
+
+def content_words(normalized: str) -> FrozenSet[str]:
+    """
+    The words of a normalized question that carry its meaning, with a plural "s" stripped.
+    """
+    return frozenset(word[:-1] if len(word) > 3 and word.endswith("s") else word
+                     for word in normalized.split() if word not in STOPWORDS)
+
+
+def trigrams(normalized: str) -> Counter:
+    padded = f" {normalized} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def same_content(words: FrozenSet[str], other: FrozenSet[str]) -> bool:
+    """
+    True if every content word of each question has a close match (e.g. a typo) among the other's.
+    Numbers must match exactly, so "3 days" never matches "5 days".
+    """
+    if len(words) != len(other):
+        return False
+
+    def close(word: str, candidates: FrozenSet[str]) -> bool:
+        if word in candidates:
+            return True
+        if word.isdigit():
+            return False
+        return any(not candidate.isdigit() and SequenceMatcher(None, word, candidate).ratio() >= RESPONSE_CACHE_WORD_SIMILARITY
+                   for candidate in candidates)
+
+    return all(close(word, other) for word in words) and all(close(word, words) for word in other)
+
+
+class CachedAnswer(NamedTuple):
+    query: str
+    response: str
+    words: FrozenSet[str]
+    grams: Counter
+    norm: float  # Length of the trigram vector
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Caches the answers to stateless first-turn questions. A question is looked up by its normalized text,
+    then through a trigram index for near-identical phrasings, which are accepted only if they ask about
+    the same things (same content words, up to typos). An answer lives for a TTL that depends on the most
+    time-sensitive tool it used.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.maxsize = maxsize
+        self.similarity = similarity
+        self.entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()  # Normalized question -> answer
+        self.index: Dict[str, Set[str]] = defaultdict(set)  # Trigram -> normalized questions containing it
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ttl_for(tool_calls: Optional[List[Dict[str, Any]]]) -> float:
+        """
+        Returns:
+            float: The TTL of an answer, the shortest of the TTLs of the tools it used.
+        """
+        return min([RESPONSE_CACHE_TOOL_TTLS.get(call['name'], RESPONSE_CACHE_TTL_SECONDS) for call in tool_calls or []]
+                   + [RESPONSE_CACHE_TTL_SECONDS])
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        for gram in entry.grams:
+            keys = self.index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[gram]
+
+    def get(self, query: str) -> Optional[str]:
+        """
+        Look up the answer to a question.
+
+        Args:
+            query (str): The user's first message.
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry.response
+
+            grams = trigrams(key)
+            norm = math.sqrt(sum(count * count for count in grams.values()))
+            overlaps = Counter()
+            for gram, count in grams.items():
+                for candidate in self.index.get(gram, ()):
+                    overlaps[candidate] += min(count, self.entries[candidate].grams[gram])
+
+            words = content_words(key)
+            for candidate, overlap in overlaps.most_common(5):
+                entry = self.entries[candidate]
+                if overlap / (norm * entry.norm) < self.similarity:
+                    break
+                if entry.expires_at > now and same_content(words, entry.words):
+                    self.entries.move_to_end(candidate)
+                    self.stats["similar_hits"] += 1
+                    return entry.response
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, query: str, response: str, tool_calls: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Cache the answer to a question.
+
+        Args:
+            query (str): The user's first message.
+            response (str): The final, unflagged answer.
+            tool_calls (list, optional): The tool calls made while answering, which set the answer's TTL.
+        """
+        key = normalize_query(query)
+        if not key:
+            return
+        grams = trigrams(key)
+        entry = CachedAnswer(query, response, content_words(key), grams,
+                             math.sqrt(sum(count * count for count in grams.values())),
+                             time.time() + self.ttl_for(tool_calls))
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            for gram in grams:
+                self.index[gram].add(key)
+            while len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+            self.stats["stores"] += 1
@@ -0,0 +1,75 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.constants import CORRECTION_MAX_EDITS, CORRECTION_TOOL_RESULT_TOKENS
+from src.utils.utils import truncate_to_tokens
+
+
+def _locate(text: str, find: str, start: int) -> Optional[Tuple[int, int]]:
+    """
+    Find an excerpt in the text, preferring its first occurrence from the start position, and ignoring
+    differences in whitespace if it isn't found verbatim (the model often reflows lines and list markers).
+
+    Returns:
+        Optional[Tuple[int, int]]: The excerpt's span, or None if it doesn't occur in the text.
+    """
+    index = text.find(find, start)
+    if index < 0:
+        index = text.find(find)
+    if index >= 0:
+        return index, index + len(find)
+    pattern = re.compile(r"\s+".join(re.escape(word) for word in find.split()))
+    match = pattern.search(text, start) or pattern.search(text)
+    return match.span() if match else None
+
+
+def apply_edits(text: str, edits: List[Dict[str, Any]], max_edits: int = CORRECTION_MAX_EDITS) -> Tuple[str, int]:
+    """
+    Apply a corrector's find/replace edits to a response. Edits whose excerpt doesn't occur in the response,
+    or that change nothing, are skipped.
+
+    Args:
+        text (str): The response.
+        edits (list): The edits, dicts with the 'find' excerpt and its 'replace' text, in response order.
+        max_edits (int): The most edits applied, a longer list is a rewrite in disguise.
+
+    Returns:
+        Tuple[str, int]: The edited response and the number of edits applied.
+    """
+    applied, position = 0, 0
+    for edit in edits[:max_edits]:
+        find, replace = edit.get('find') or "", edit.get('replace') or ""
+        if not find.strip() or find == replace:
+            continue
+        span = _locate(text, find, position)
+        if span is None:
+            continue
+        text = text[:span[0]] + replace + text[span[1]:]
+        position = span[0] + len(replace)
+        applied += 1
+    return text, applied
+
+
+def format_tool_results(tool_calls: Optional[List[Dict[str, Any]]],
+                        max_tokens: int = CORRECTION_TOOL_RESULT_TOKENS) -> str:
+    """
+    Render the tool results gathered during a turn for the corrector, so it checks the response against the
+    data the answer was based on without calling any upstream API again.
+
+    Args:
+        tool_calls (list, optional): The turn's tool call log, with the results of cached calls too.
+        max_tokens (int): The budget of all results together, split evenly between the calls.
+
+    Returns:
+        str: One line per call, or a note that no tool was used.
+    """
+    if not tool_calls:
+        return "No tools were used for this answer."
+    per_call = max(max_tokens // len(tool_calls), 1)
+    lines = []
+    for call in tool_calls:
+        args = ", ".join(f"{name}={value!r}" for name, value in call['args'].items())
+        result = json.dumps(call['result'], ensure_ascii=False, separators=(",", ":"), default=str)
+        lines.append(f"- {call['name']}({args}): {truncate_to_tokens(result, per_call)}")
+    return "\n".join(lines)
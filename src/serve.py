@@ -0,0 +1,213 @@
+"""
+Multi-worker deployment: runs several app workers, each a process with its own event loop, Gemini client and
+session store, behind one entry point, so a host's cores are all put to use.
+
+The entry point is a small streaming reverse proxy that pins each browser to one worker with a cookie,
+because a Gradio session's queue requests and event stream must reach the worker that holds its state.
+Workers share tool results, geocodes, exchange rates, forecasts and verdicts through the shared cache tier
+(SQLite by default here, or SHARED_CACHE_BACKEND=redis across hosts), and split the upstream quotas evenly.
+Behind a load balancer that does its own sticky routing, start the workers alone with --no-proxy and point
+the load balancer at their ports.
+
+Usage:
+    python -m src.serve --workers 4
+    SHARED_CACHE_BACKEND=redis SHARED_CACHE_URL=redis://cache:6379/0 python -m src.serve --host 0.0.0.0
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.constants import SHARED_CACHE_BACKEND, WORKER_STICKY_COOKIE, WORKER_RESTART_DELAY_SECONDS, UPSTREAM_LIMITS
+from src.utils.utils import get_env_variable
+
+HOP_BY_HOP_HEADERS = {b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"te",
+                      b"trailer", b"transfer-encoding", b"upgrade", b"content-length"}
+PROXY_METHODS = ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+
+class WorkerPool:
+    """
+    Starts the app workers on consecutive ports and restarts any that exit.
+    """
+
+    def __init__(self, workers: int, host: str, first_port: int):
+        self.workers = workers
+        self.host = host
+        self.ports = [first_port + index for index in range(workers)]
+        self.processes: List[Optional[subprocess.Popen]] = [None] * workers
+        self.restarts = 0
+
+    def _env(self, index: int) -> Dict[str, str]:
+        env = dict(os.environ, TRAVEL_WORKERS=str(self.workers), TRAVEL_WORKER_INDEX=str(index))
+        if get_env_variable("SHARED_CACHE_BACKEND", default=SHARED_CACHE_BACKEND) == "memory":
+            env["SHARED_CACHE_BACKEND"] = "sqlite"  # A memory cache isn't shared between processes
+        return env
+
+    def _start(self, index: int) -> None:
+        self.processes[index] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:create_app", "--factory",
+             "--host", self.host, "--port", str(self.ports[index])],
+            env=self._env(index))
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._start(index)
+
+    def check(self) -> None:
+        """
+        Restart the workers that have exited.
+        """
+        for index, process in enumerate(self.processes):
+            if process is not None and process.poll() is not None:
+                print(f"Worker {index} exited with code {process.returncode}, restarting", file=sys.stderr)
+                self.restarts += 1
+                self._start(index)
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    @property
+    def urls(self) -> List[str]:
+        return [f"http://{self.host}:{port}" for port in self.ports]
+
+
+class StickyProxy:
+    """
+    Forwards every request to the worker named by the browser's sticky cookie, streaming the response back
+    (Gradio streams events over server-sent events). Browsers without the cookie, or whose worker is down,
+    are assigned a worker round-robin; a session moved to another worker is rebuilt there from its chatbot.
+    """
+
+    def __init__(self, upstreams: List[str]):
+        self.upstreams = upstreams
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5),
+                                        limits=httpx.Limits(max_connections=None, max_keepalive_connections=64))
+        self.counts = Counter()  # requests per worker, reassigned, unavailable
+        self._round_robin = itertools.count()
+
+    def _pick(self, cookie: Optional[str]) -> int:
+        if cookie is not None and cookie.isdigit() and int(cookie) < len(self.upstreams):
+            return int(cookie)
+        return next(self._round_robin) % len(self.upstreams)
+
+    async def forward(self, request: Request) -> Response:
+        cookie = request.cookies.get(WORKER_STICKY_COOKIE)
+        index = self._pick(cookie)
+        headers = [(name, value) for name, value in request.headers.raw if name.lower() not in HOP_BY_HOP_HEADERS]
+        headers.append((b"x-forwarded-for", (request.client.host if request.client else "").encode()))
+        body = await request.body()
+        raw_path = request.scope.get("raw_path") or request.url.path.encode()
+        if request.scope.get("query_string"):
+            raw_path += b"?" + request.scope["query_string"]
+
+        upstream = None
+        for _ in range(len(self.upstreams)):
+            url = httpx.URL(self.upstreams[index]).copy_with(raw_path=raw_path)
+            try:
+                upstream = await self.client.send(
+                    self.client.build_request(request.method, url, headers=headers, content=body), stream=True)
+                break
+            except httpx.ConnectError:
+                # The worker is down or restarting, move the browser to the next one
+                self.counts["reassigned"] += 1
+                index = (index + 1) % len(self.upstreams)
+        if upstream is None:
+            self.counts["unavailable"] += 1
+            return PlainTextResponse("No worker is available, try again shortly.", status_code=502)
+
+        self.counts[f"worker_{index}"] += 1
+        response = StreamingResponse(upstream.aiter_raw(), status_code=upstream.status_code,
+                                     background=BackgroundTask(upstream.aclose))
+        response.raw_headers.extend((name, value) for name, value in upstream.headers.raw
+                                    if name.lower() not in HOP_BY_HOP_HEADERS)
+        if cookie != str(index):
+            response.set_cookie(WORKER_STICKY_COOKIE, str(index), httponly=True, samesite="lax")
+        return response
+
+
+def create_proxy_app(pool: WorkerPool) -> Starlette:
+    """
+    Args:
+        pool (WorkerPool): The workers to proxy to, started and supervised along with the app.
+
+    Returns:
+        Starlette: The entry point app.
+    """
+    proxy = StickyProxy(pool.urls)
+
+    async def supervise() -> None:
+        while True:
+            await asyncio.sleep(WORKER_RESTART_DELAY_SECONDS)
+            pool.check()
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        pool.start()
+        supervisor = asyncio.create_task(supervise())
+        try:
+            yield
+        finally:
+            supervisor.cancel()
+            await proxy.client.aclose()
+            pool.stop()
+
+    return Starlette(routes=[Route("/{path:path}", proxy.forward, methods=PROXY_METHODS)], lifespan=lifespan)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run several app workers behind one sticky entry point.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="App worker processes")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface the entry point listens on")
+    parser.add_argument("--port", type=int, default=7860, help="Entry point port, workers use the next ports")
+    parser.add_argument("--no-proxy", action="store_true",
+                        help="Only start the workers, for a load balancer with sticky sessions in front")
+    args = parser.parse_args(argv)
+
+    over_quota = [name for name, limits in UPSTREAM_LIMITS.items() if args.workers > limits['concurrency']]
+    if over_quota:
+        # Every worker keeps one slot, so together they may run more requests than the quota allows
+        print(f"Warning: {args.workers} workers exceed the concurrency quota of {', '.join(over_quota)}; "
+              f"each worker still gets one slot", file=sys.stderr)
+
+    pool = WorkerPool(args.workers, "127.0.0.1" if not args.no_proxy else args.host, args.port + 1)
+    if not args.no_proxy:
+        uvicorn.run(create_proxy_app(pool), host=args.host, port=args.port)
+        return 0
+
+    pool.start()
+    try:
+        while True:
+            time.sleep(WORKER_RESTART_DELAY_SECONDS)
+            pool.check()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from src.constants import HISTORY_TOKEN_BUDGET, CHARS_PER_TOKEN, SESSION_STORE_SIZE, SESSION_TTL_SECONDS, \
+    SESSION_MEMORY_CAP_BYTES, SESSION_TOOL_CACHE_SIZE, SESSION_TOOL_CACHE_TTL_SECONDS
+from src.conversation_history import ConversationHistory
+from src.utils.cache import LRUCache
+
+SESSION_BASE_BYTES = 2048  # Rough fixed cost of an empty session's objects
+PURGE_INTERVAL_SECONDS = 60
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Cheap estimate of the memory a JSON-like value holds, from the length of its JSON encoding.
+    """
+    return len(json.dumps(value, default=str))
+
+
+class Session:
+    """
+    The server-side state of a Gradio session: its incremental conversation history,
+    the tool results its turns can reuse, and its usage stats.
+    """
+
+    def __init__(self, session_id: Optional[str], history_token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.session_id = session_id
+        self.history = ConversationHistory(history_token_budget)
+        self.tool_results = LRUCache(maxsize=SESSION_TOOL_CACHE_SIZE, ttl=SESSION_TOOL_CACHE_TTL_SECONDS,
+                                     sizeof=estimate_size)
+        self.stats = Counter()  # turns, tool_calls, tool_cache_hits
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+    def approx_bytes(self) -> int:
+        """
+        Returns:
+            int: The estimated memory held by the session.
+        """
+        return SESSION_BASE_BYTES + self.history.window_tokens * CHARS_PER_TOKEN + self.tool_results.bytes
+
+
+class SessionStore:
+    """
+    Keeps the Session of every active Gradio session id. Sessions are dropped after being idle for a TTL,
+    and the least recently used ones are evicted to stay under a session count and an estimated memory cap,
+    so thousands of idle sessions stay cheap. An evicted session is rebuilt from the chatbot on its next turn.
+    """
+
+    def __init__(self, maxsize: int = SESSION_STORE_SIZE, ttl: float = SESSION_TTL_SECONDS,
+                 max_bytes: int = SESSION_MEMORY_CAP_BYTES, history_token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.sessions = LRUCache(maxsize=maxsize, ttl=ttl, maxbytes=max_bytes, sizeof=Session.approx_bytes)
+        self.history_token_budget = history_token_budget
+        self.created = 0
+        self._last_purge = time.time()
+
+    def get(self, session_id: Optional[str]) -> Session:
+        """
+        Return the state of a session, creating it on its first turn or after it was evicted.
+        Without a session id, an unstored session is returned.
+
+        Args:
+            session_id (Optional[str]): The id of the Gradio session.
+
+        Returns:
+            Session: The session's state.
+        """
+        now = time.time()
+        if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            self.sessions.purge_expired()
+
+        session = self.sessions.get(session_id) if session_id is not None else None
+        if session is None:
+            session = Session(session_id, self.history_token_budget)
+            self.created += 1
+            if session_id is not None:
+                self.sessions.set(session_id, session)
+        session.last_seen = now
+        return session
+
+    def save(self, session: Session) -> None:
+        """
+        Re-store a session after a turn, refreshing its idle TTL and its memory estimate.
+        """
+        if session.session_id is not None:
+            self.sessions.set(session.session_id, session)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: The number of stored sessions, their estimated memory and the eviction counters.
+        """
+        return {**self.sessions.stats(), 'created': self.created}
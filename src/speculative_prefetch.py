@@ -0,0 +1,271 @@
+import asyncio
+import functools
+import json
+import os
+import re
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.constants import SPECULATIVE_PREFETCH_MAX_DESTINATIONS, FORECAST_DAYS
+from src.travel_tools import tool_executor, _run_in_trace
+from src.utils.currency_codes import currency_codes
+from src.utils.exchange_rates import exchange_rates
+from src.utils.forecasts import forecasts
+from src.utils.geocoding import geocoder, normalize_destination
+from src.utils.tracing import tracer
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "utils", "gazetteer.json")
+RESOURCES = ("geocode", "forecast", "rates")
+
+MONTHS = {name: number for number, names in enumerate((
+    ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+    ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"), ("october", "oct"), ("november", "nov"),
+    ("december", "dec")), 1) for name in names}
+MONTH = r"(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+DAY_MONTH_PATTERN = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?(?:\s+of)?\s+" + MONTH + r"\b", re.IGNORECASE)
+MONTH_DAY_PATTERN = re.compile(r"\b" + MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?\b", re.IGNORECASE)
+# A month alone only counts after a preposition, so "May I..." isn't taken for a date
+MONTH_ONLY_PATTERN = re.compile(r"\b(?:in|during|for|this|next|early|late|mid)[\s-]+" + MONTH + r"\b", re.IGNORECASE)
+NEAR_TERM_PATTERN = re.compile(r"\b(today|tonight|tomorrow|this weekend|this week|next few days|right now)\b",
+                               re.IGNORECASE)
+WEATHER_WORDS = {"weather", "forecast", "rain", "raining", "rainy", "temperature", "temperatures", "sunny", "snow",
+                 "cold", "hot", "warm", "umbrella", "pack", "packing", "wear"}
+CURRENCY_WORDS = {"currency", "currencies", "exchange", "convert", "conversion", "budget", "cost", "costs", "price"}
+CURRENCY_SYMBOLS = {"€": "EUR", "$": "USD", "£": "GBP", "¥": "JPY", "₪": "ILS", "₹": "INR"}
+# The currency usually meant by a name several currencies share
+COMMON_CURRENCY_NAMES = {"dollar": "USD", "euro": "EUR", "pound": "GBP", "yen": "JPY", "franc": "CHF", "peso": "MXN",
+                         "rupee": "INR", "shekel": "ILS", "yuan": "CNY"}
+AMBIGUOUS_CITIES = {"nice", "split", "male", "palma", "santiago", "washington", "valencia"}
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+
+
+class Hints(NamedTuple):
+    destinations: List[Tuple[str, str]]  # (city, country)
+    forecast: bool  # The forecast of the destinations is likely needed
+    currencies: List[str]
+    rates: bool  # The exchange rates are likely needed
+
+
+@functools.lru_cache(maxsize=1)
+def _gazetteer() -> Dict[Tuple[str, ...], Tuple[str, str]]:
+    """
+    Returns:
+        dict: The bundled gazetteer's cities, by their case-folded words.
+    """
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        return {tuple(city.casefold().split()): (city, country) for city, country in json.load(f)["cities"]}
+
+
+@functools.lru_cache(maxsize=4)
+def _currency_names(version: str) -> Dict[str, str]:
+    """
+    Returns:
+        dict: Currency codes by the last word of their name (e.g. "euro", "yen", "shekel") and by their code.
+    """
+    names = {}
+    for code, name in currency_codes.get()["supported_codes"]:
+        names[code] = code
+        names.setdefault(name.split()[-1].casefold(), code)
+    names.update(COMMON_CURRENCY_NAMES)
+    return names
+
+
+def find_destinations(message: str, limit: int = SPECULATIVE_PREFETCH_MAX_DESTINATIONS) -> List[Tuple[str, str]]:
+    """
+    Find the gazetteer's cities named in a message, longest names first (so "New York" isn't read as "York").
+    Unless the message is all lowercase, a name must be capitalized. Names that are also common words
+    (e.g. Nice, Split) must be capitalized in the middle of a sentence, so "Nice weather" isn't taken for Nice.
+
+    Args:
+        message (str): The user's message.
+        limit (int): Maximum number of destinations returned.
+
+    Returns:
+        list: The (city, country) pairs, in the order they appear.
+    """
+    gazetteer = _gazetteer()
+    matches = list(WORD_PATTERN.finditer(message))
+    words = [match.group() for match in matches]
+    lowercase = message == message.lower()
+    found = []
+    i = 0
+    while i < len(words) and len(found) < limit:
+        for size in (3, 2, 1):
+            candidate = words[i:i + size]
+            match = gazetteer.get(tuple(word.casefold() for word in candidate)) if len(candidate) == size else None
+            if match is None or match in found:
+                continue
+            if match[0].casefold() in AMBIGUOUS_CITIES:
+                before = message[:matches[i].start()].rstrip()
+                accepted = candidate[0][0].isupper() and bool(before) and before[-1] not in ".!?"
+            else:
+                accepted = lowercase or candidate[0][0].isupper()
+            if accepted:
+                found.append(match)
+                i += size
+                break
+        else:
+            i += 1
+    return found
+
+
+def find_dates(message: str, today: date) -> Tuple[List[date], bool, bool]:
+    """
+    Find the dates a message talks about.
+
+    Args:
+        message (str): The user's message.
+        today (date): The date the message is sent.
+
+    Returns:
+        tuple: The explicit dates (in the coming year when no year is given), whether a month is named without
+            a day, and whether the message talks about the next few days ("tomorrow", "this weekend", ...).
+    """
+    found = []
+
+    def add(year: int, month: int, day: int) -> None:
+        try:
+            found.append(date(year, month, day))
+        except ValueError:
+            pass
+
+    def add_in_coming_year(month: int, day: int) -> None:
+        try:
+            candidate = date(today.year, month, day)
+        except ValueError:
+            return
+        add(today.year + 1 if candidate < today else today.year, month, day)
+
+    for year, month, day in ISO_DATE_PATTERN.findall(message):
+        add(int(year), int(month), int(day))
+    for day, month in DAY_MONTH_PATTERN.findall(message):
+        add_in_coming_year(MONTHS[month.casefold()], int(day))
+    for month, day in MONTH_DAY_PATTERN.findall(message):
+        add_in_coming_year(MONTHS[month.casefold()], int(day))
+    return found, bool(MONTH_ONLY_PATTERN.search(message)), bool(NEAR_TERM_PATTERN.search(message))
+
+
+def extract_hints(message: str, today: Optional[date] = None) -> Hints:
+    """
+    Guess, with cheap local parsing, what the tools will need to answer a message: the destinations
+    (from the bundled gazetteer), whether their forecast is in range and relevant, and whether currencies are
+    involved (codes and names from the currency code list, symbols, or words like "exchange").
+
+    Args:
+        message (str): The user's message.
+        today (date, optional): The date the message is sent, today by default.
+
+    Returns:
+        Hints: The predicted needs.
+    """
+    today = today or date.today()
+    destinations = find_destinations(message)
+
+    dates, month_named, near_term = find_dates(message, today)
+    words = {word.casefold() for word in WORD_PATTERN.findall(message)}
+    if near_term or any(today <= day <= today + timedelta(days=FORECAST_DAYS) for day in dates):
+        forecast = True
+    elif dates or month_named:
+        forecast = False  # Beyond the forecast's range
+    else:
+        forecast = bool(words & WEATHER_WORDS)
+
+    names = _currency_names(currency_codes.version)
+    currencies = [code for code in re.findall(r"\b[A-Z]{3}\b", message) if code in names]
+    currencies += [names[word.rstrip("s")] for word in words
+                   if word.rstrip("s") in names and (len(word) > 3 or word in COMMON_CURRENCY_NAMES)]
+    currencies += [code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in message]
+    currencies = list(dict.fromkeys(currencies))
+    return Hints(destinations, forecast and bool(destinations), currencies, bool(currencies or words & CURRENCY_WORDS))
+
+
+class SpeculativePrefetcher:
+    """
+    Starts the upstream requests a turn's tools are likely to make while the model is still reading the prompt:
+    geocoding the destinations named in the user's message, downloading their forecast when it's in range,
+    and refreshing the exchange rate table. The tools then find the data in their caches, or wait for the
+    prefetch already in flight. After the turn, the prediction is compared with the tool calls actually made,
+    counting per resource what was prefetched, what of it was used, and what was needed but missed.
+    """
+
+    def __init__(self):
+        self.counts = Counter()  # turns, and <resource>_<prefetched|used|missed>
+
+    @staticmethod
+    def _warm_destination(city: str, country: str, forecast: bool) -> None:
+        try:
+            with tracer.span("prefetch.destination", city=city, forecast=forecast):
+                location = geocoder.geocode(f"{city}, {country}")
+                if location is None:
+                    return
+                geocoder.alias(city, location)  # The model may name the city alone
+                if forecast:
+                    forecasts.get(location['lat'], location['lon'])
+        except Exception:
+            pass  # The tool will make, and report, the request itself
+
+    @staticmethod
+    def _warm_rates() -> None:
+        try:
+            with tracer.span("prefetch.rates"):
+                exchange_rates.get_table()
+        except Exception:
+            pass
+
+    def start(self, message: str, trace_id: Optional[str] = None) -> Hints:
+        """
+        Start prefetching for a message in the background, on the tool executor.
+
+        Args:
+            message (str): The user's message.
+            trace_id (Optional[str]): The trace of the turn.
+
+        Returns:
+            Hints: The prediction, to pass to record() after the turn.
+        """
+        hints = extract_hints(message)
+        loop = asyncio.get_running_loop()
+        for city, country in hints.destinations:
+            loop.run_in_executor(tool_executor, functools.partial(
+                _run_in_trace, trace_id, self._warm_destination, city, country, hints.forecast))
+        if hints.rates:
+            loop.run_in_executor(tool_executor, functools.partial(_run_in_trace, trace_id, self._warm_rates))
+        self.counts.update(turns=1, geocode_prefetched=len(hints.destinations),
+                           forecast_prefetched=len(hints.destinations) if hints.forecast else 0,
+                           rates_prefetched=int(hints.rates))
+        return hints
+
+    def record(self, hints: Hints, tool_calls: List[Dict[str, Any]]) -> None:
+        """
+        Count which prefetched resources the turn's tool calls used, and which they needed but weren't prefetched.
+
+        Args:
+            hints (Hints): The prediction returned by start().
+            tool_calls (list): The tool calls made during the turn.
+        """
+        cities = {normalize_destination(city) for city, _ in hints.destinations}
+        needs = set()
+        for call in tool_calls:
+            if call['name'] in ("get_local_attractions_opentripmap", "get_destination_weather_forecast"):
+                city = normalize_destination(str(call['args'].get('destination', ''))).split(",")[0]
+                needs.add(("geocode", city, city in cities))
+                if call['name'] == "get_destination_weather_forecast":
+                    needs.add(("forecast", city, hints.forecast and city in cities))
+            elif call['name'] == "get_currency_exchange":
+                needs.add(("rates", "", hints.rates))
+        self.counts.update(f"{resource}_{'used' if predicted else 'missed'}" for resource, _, predicted in needs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: The counters and, per resource, the share of prefetches that were used (precision)
+                and the share of needs that were prefetched (recall).
+        """
+        stats: Dict[str, Any] = dict(self.counts)
+        for resource in RESOURCES:
+            prefetched, used, missed = (self.counts[f"{resource}_{outcome}"] for outcome in ("prefetched", "used", "missed"))
+            stats[f"{resource}_precision"] = round(used / prefetched, 4) if prefetched else 0.0
+            stats[f"{resource}_recall"] = round(used / (used + missed), 4) if used + missed else 0.0
+        return stats
@@ -1,139 +1,523 @@
+import asyncio
 import json
-from typing import List, Dict, Generator, Tuple
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from typing import List, Dict, Generator, AsyncGenerator, Optional, Any
 
 from google.genai import types
 
-from src.constants import VERIFIER_MODEL, TRAVELER_MODEL
-from src.prompts.prompts import corrected_traveler_system_prompt, travel_system_prompt, verifier_system_prompt
-from src.prompts.schemas import VERIFICATION_SCHEMA
-from src.travel_tools import get_destination_weather_forecast, get_currency_exchange, get_local_attractions_opentripmap
-from src.utils.utils import get_genai_client, generate_streaming_response
+from src.constants import VERIFIER_MODEL, TRAVELER_MODEL, VERIFICATION_MODE, VERIFICATION_MODES, \
+    VERIFICATION_SAMPLE_RATE, HISTORY_TOKEN_BUDGET, CONTEXT_CACHE_BACKEND, RESPONSE_CACHE_ENABLED, \
+    SPECULATIVE_PREFETCH_ENABLED, MODEL_ROUTING_ENABLED, CORRECTION_MAX_ROUNDS
+from src.conversation_history import ConversationHistory
+from src.prompts.prompts import correction_request_template, correction_edits_request_template, \
+    get_travel_system_prompt, get_verifier_system_prompt, get_corrector_system_prompt, get_request_metadata
+from src.model_router import ModelRouter, Route
+from src.prompts.schemas import VERIFICATION_SCHEMA, CORRECTION_SCHEMA
+from src.response_cache import ResponseCache
+from src.response_correction import apply_edits, format_tool_results
+from src.session_store import Session, SessionStore
+from src.speculative_prefetch import SpeculativePrefetcher
+from src.travel_tools import get_async_travel_tools
+from src.utils.cache import LRUCache
+from src.verification_policy import VerificationPolicy
+from src.utils.context_cache import create_context_cache
+from src.utils.scheduler import turn_scheduler, async_upstream_slot, SchedulerBusyError
+from src.utils.tracing import tracer
+from src.utils.utils import get_genai_client, agenerate_streaming_response, iterate_async_generator, get_env_variable, \
+    get_env_flag
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "I'm handling a lot of requests right now. Please try again in a moment."
+CACHEABLE_SKIP_REASONS = ("low_risk", "route")  # Verification skips that still vouch for the answer
 
 
 class ConversationManager:
-    def __init__(self, max_history=10):
-        self.max_history = max_history  # Limit conversation history to prevent token overflow
+    def __init__(self, history_token_budget: int = HISTORY_TOKEN_BUDGET, verification_mode: str = VERIFICATION_MODE,
+                 verification_sample_rate: float = VERIFICATION_SAMPLE_RATE,
+                 context_cache_backend: str = CONTEXT_CACHE_BACKEND,
+                 response_cache_enabled: bool = RESPONSE_CACHE_ENABLED,
+                 speculative_prefetch: bool = SPECULATIVE_PREFETCH_ENABLED,
+                 model_routing: bool = MODEL_ROUTING_ENABLED,
+                 correction_max_rounds: int = CORRECTION_MAX_ROUNDS):
+        if verification_mode not in VERIFICATION_MODES:
+            raise ValueError(f"Unknown verification mode '{verification_mode}'. Must be one of: {VERIFICATION_MODES}.")
+        self.history_token_budget = history_token_budget  # Limit conversation history to prevent token overflow
+        self.sessions = SessionStore(history_token_budget=history_token_budget)  # Per-session state by session id
+        self.verification_mode = verification_mode
+        self.verification_sample_rate = verification_sample_rate
+        self.verification_stats = Counter()  # How often each verification path fired
+        self.verification_policy = VerificationPolicy()
+        self._background_verifications = set()  # Keep references so the tasks aren't garbage collected
         self.client = get_genai_client()
+        self.context_cache = create_context_cache(self.client, context_cache_backend)  # Static prompt prefix
+        self.response_cache = ResponseCache() if response_cache_enabled else None  # Answers to first-turn questions
+        self.prefetcher = SpeculativePrefetcher() if speculative_prefetch else None  # Warms the tools' caches
+        self.router = ModelRouter(model_routing)  # Model, thinking budget and verifier tier of each turn
+        self.correction_max_rounds = correction_max_rounds  # Edit rounds for a flagged response, 0 regenerates it
 
-    def build_conversation_history(self, chatbot: List[List[str]]) -> List:
+    def get_session(self, chatbot: List[List[str]], session_id: Optional[str] = None) -> Session:
         """
-        Convert the Gradio chatbot format to the Gemini conversation format.
+        Return the session's state, with its conversation history synced with the Gradio chatbot.
+        Without a session id, a new session is built from the chatbot.
 
         Args:
             chatbot (List[List[str]]): The current chat history.
+            session_id (Optional[str]): The id of the Gradio session.
 
         Returns:
-            List: A list of dictionaries representing the conversation history in Gemini format.
+            Session: The session, whose history holds every completed exchange in the chatbot.
         """
-        conversation = []
+        session = self.sessions.get(session_id)
+        session.history.sync(chatbot)
+        return session
 
-        # Get recent conversation history (limit to max_history exchanges)
-        recent_chatbot = chatbot[-self.max_history:] if len(chatbot) > self.max_history else chatbot
+    def cacheable_query(self, chatbot: List[List[str]]) -> Optional[str]:
+        """
+        Return the question of a stateless turn, whose answer can be served from and stored in the response cache.
+
+        Args:
+            chatbot (List[List[str]]): The current chat history.
+
+        Returns:
+            Optional[str]: The user's message if the response cache is enabled and this is the conversation's
+                first turn, otherwise None.
+        """
+        if self.response_cache is None or len(chatbot) != 1 or not chatbot[0][0]:
+            return None
+        return chatbot[0][0]
 
-        for user_msg, assistant_msg in recent_chatbot[:-1]:  # Exclude current incomplete exchange
-            if user_msg:
-                conversation.append({
-                    "role": "user",
-                    "parts": [{"text": user_msg}]
-                })
-            if assistant_msg:  # Only add if assistant_msg is not None or empty
-                conversation.append({
-                    "role": "model",
-                    "parts": [{"text": assistant_msg}]
-                })
+    @staticmethod
+    def answer_verified(report: Dict[str, Any]) -> bool:
+        """
+        Args:
+            report (dict): The turn's report, with its verification outcome.
 
-        # Add the current user message
-        if chatbot and chatbot[-1][0]:
-            conversation.append({
-                "role": "user",
-                "parts": [{"text": chatbot[-1][0]}]
-            })
+        Returns:
+            bool: True if the verifier passed the answer, or the verification policy deemed it safe to skip;
+                False if it was flagged, the verifier failed, or verification was sampled out, shed or deferred.
+        """
+        verification = report.get('verification')
+        if verification is not None:
+            return not verification["needs_correction"] and not verification.get('verification_failed')
+        return report.get('verification_skipped') in CACHEABLE_SKIP_REASONS
 
-        return conversation
+    def should_verify(self) -> bool:
+        """
+        Decide, according to the verification mode, whether the current response is verified.
 
-    def verify(self, chatbot: List[List[str]], conversation_history: List) -> Generator[List[List[str]], None, None]:
+        Returns:
+            bool: True if the response should be verified.
+        """
+        if self.verification_mode == "off":
+            self.verification_stats["skipped_off"] += 1
+            return False
+        if self.verification_mode == "sampled" and random.random() >= self.verification_sample_rate:
+            self.verification_stats["skipped_sampled"] += 1
+            return False
+        return True
+
+    async def verify(self, chatbot: List[List[str]], history: ConversationHistory,
+                     verification: Optional[Dict[str, Any]] = None,
+                     tool_calls: Optional[List[Dict[str, Any]]] = None, trace_id: Optional[str] = None,
+                     report: Optional[Dict[str, Any]] = None, route: Optional[Route] = None,
+                     tool_cache: Optional[LRUCache] = None) -> AsyncGenerator[List[List[str]], None]:
         """
-        Verify the last response in the conversation for accuracy using the Gemini 2.5 Pro model.
+        Verify the last response in the conversation for accuracy, at the verifier tier of the turn's route,
+        and correct it if it is flagged.
 
         Args:
             chatbot (List[List[str]]): The current chat history.
-            conversation_history (List): The entire conversation history to use as context.
+            history (ConversationHistory): The conversation history to use as context.
+            verification (dict, optional): A verdict that was already reached, e.g. while streaming.
+            tool_calls (list, optional): The tool calls made while answering, used to assess the response's risk
+                and to correct it.
+            trace_id (Optional[str]): The trace of the turn being verified.
+            report (dict, optional): Filled with the 'verification' verdict, or the reason 'verification_skipped',
+                and the 'correction' outcome.
+            route (Route, optional): The turn's route, the general one by default.
+            tool_cache (LRUCache, optional): The turn's tool results, reused if the response has to be regenerated.
 
         Yields:
             List[List[str]]: Updated chatbot history with corrections if necessary.
         """
-        if chatbot:
-            # Get current conversation for verification (no UI indication)
-            conversation_for_verification = []
-            for user_msg, bot_msg in chatbot:
-                if user_msg and bot_msg:
-                    conversation_for_verification.append((user_msg, bot_msg))
+        report = {} if report is None else report
+        route = route or self.router.routes["general"]
+        if not chatbot:
+            return
+
+        if verification is None:
+            if turn_scheduler.overloaded():
+                # Shed load: answer without verification while turns are queueing up
+                self.verification_stats["skipped_overloaded"] += 1
+                report['verification_skipped'] = "overloaded"
+                return
+            if not self.should_verify():
+                report['verification_skipped'] = self.verification_mode
+                return
+
+            # Get current exchange for verification (no UI indication)
+            user_msg, response = chatbot[-1]
+            if not user_msg or not response:
+                report['verification_skipped'] = "empty"
+                return
+            decision = self.verification_policy.decide(history.conversation_for_policy(user_msg, response), tool_calls,
+                                                       tier=route.verifier)
+            if decision['action'] == "skip":
+                report['verification_skipped'] = decision['reason']
+                return
+
+            if decision['action'] == "cached":
+                verification = decision['verification']
+            elif self.verification_mode == "async_after_display":
+                # The answer stays as displayed, the verdict is only recorded
+                task = asyncio.create_task(self.record_verification(history, user_msg, response, decision,
+                                                                    trace_id, self.cacheable_query(chatbot),
+                                                                    tool_calls))
+                self._background_verifications.add(task)
+                task.add_done_callback(self._background_verifications.discard)
+                report['verification_skipped'] = "background"
+                return
+            else:
+                # Verify silently in background
+                verification = await self.run_verifier(history, user_msg, response, decision, trace_id)
+                self.verification_policy.store(decision['key'], verification)
+                self.verification_stats["verified"] += 1
+        elif not verification.get('partial'):
+            # A verdict reached while streaming covers the whole response, unless it cut the response short
+            user_msg, response = chatbot[-1]
+            if user_msg and response:
+                self.verification_policy.store(
+                    self.verification_policy.cache_key(history.conversation_for_policy(user_msg, response)),
+                    verification)
+
+        report['verification'] = verification
+        if verification["needs_correction"]:
+            self.verification_stats["corrected"] += 1
+            async for chatbot in self.correct(chatbot, history, verification, tool_calls, trace_id, report, route,
+                                              tool_cache):
+                yield chatbot
+
+    async def correct(self, chatbot: List[List[str]], history: ConversationHistory, verification: Dict[str, Any],
+                      tool_calls: Optional[List[Dict[str, Any]]] = None, trace_id: Optional[str] = None,
+                      report: Optional[Dict[str, Any]] = None, route: Optional[Route] = None,
+                      tool_cache: Optional[LRUCache] = None) -> AsyncGenerator[List[List[str]], None]:
+        """
+        Correct a flagged response in place: the model is asked for edits to the flagged parts only, based on the
+        tool results already gathered in the turn, and every round's edits are verified again, for at most
+        correction_max_rounds rounds. A response the edits don't fix, or one that pipelined verification cut short,
+        is regenerated and the regenerated response is verified once.
 
-            # Verify silently in background
-            verification = self.verify_response(conversation_for_verification)
+        Args:
+            chatbot (List[List[str]]): The current chat history.
+            history (ConversationHistory): The conversation history to use as context.
+            verification (dict): The verdict that flagged the response.
+            tool_calls (list, optional): The tool calls made while answering.
+            trace_id (Optional[str]): The trace of the turn being corrected.
+            report (dict, optional): Filled with the final 'verification' verdict and the 'correction' outcome
+                ("verified", "regenerated" or "unresolved"), its rounds and the edits applied.
+            route (Route, optional): The turn's route, whose model and verifier tier the correction uses.
+            tool_cache (LRUCache, optional): The turn's tool results, reused if the response is regenerated.
 
+        Yields:
+            List[List[str]]: Updated chatbot history with the corrected response.
+        """
+        report = {} if report is None else report
+        route = route or self.router.routes["general"]
+        correction = report['correction'] = {'outcome': "unresolved", 'rounds': 0, 'edits': 0}
+        user_msg = chatbot[-1][0]
+        feedback = verification['feedback']
+        while not verification.get('partial') and correction['rounds'] < self.correction_max_rounds:
+            response = chatbot[-1][1]
+            edits = await self.request_edits(history, user_msg, response, feedback, tool_calls, trace_id, route.model)
+            corrected, applied = apply_edits(response, edits)
+            if not applied:
+                break
+            correction['rounds'] += 1
+            correction['edits'] += applied
+            self.verification_stats["correction_rounds"] += 1
+            chatbot[-1] = [user_msg, corrected]
+            yield chatbot
+
+            verification = await self.reverify(history, user_msg, corrected, tool_calls, trace_id, route)
+            if not verification["needs_correction"]:
+                correction['outcome'] = "verified"
+                break
+            feedback = verification['feedback']
+
+        if correction['outcome'] != "verified":
+            # The edits didn't fix the response, regenerate it from the turn's tool results and check it once
+            self.verification_stats["regenerated"] += 1
+            async for chatbot in self.regenerate(chatbot, history, feedback, tool_calls, trace_id, route, tool_cache):
+                yield chatbot
+            verification = await self.reverify(history, user_msg, chatbot[-1][1] or "", tool_calls, trace_id, route)
+            correction['outcome'] = "unresolved" if verification["needs_correction"] else "regenerated"
             if verification["needs_correction"]:
-                # Replace with error message and start regeneration
-                error_message = "I apologize, but my response contained inaccurate information. Let me provide you with a corrected answer..."
-                chatbot[-1] = [chatbot[-1][0], error_message]
+                self.verification_stats["unresolved"] += 1
+                logger.warning("Regenerated response still flagged by the verifier: %s", verification["feedback"])
+        report['verification'] = verification
+
+    async def reverify(self, history: ConversationHistory, user_msg: str, response: str,
+                       tool_calls: Optional[List[Dict[str, Any]]] = None, trace_id: Optional[str] = None,
+                       route: Optional[Route] = None) -> Dict[str, Any]:
+        """
+        Verify a corrected response through the verification policy.
+
+        Args:
+            history (ConversationHistory): The conversation history to use as context.
+            user_msg (str): The user message of the exchange to verify.
+            response (str): The corrected response.
+            tool_calls (list, optional): The tool calls made while answering.
+            trace_id (Optional[str]): The trace of the turn being corrected.
+            route (Route, optional): The turn's route, whose verifier tier is used.
+
+        Returns:
+            dict: The verdict, passing if the policy decides the corrected response needs no verification.
+        """
+        route = route or self.router.routes["general"]
+        decision = self.verification_policy.decide(history.conversation_for_policy(user_msg, response), tool_calls,
+                                                   tier=route.verifier)
+        if decision['action'] == "skip":
+            return {"needs_correction": False, "feedback": ""}
+        if decision['action'] == "cached":
+            return decision['verification']
+        verification = await self.run_verifier(history, user_msg, response, decision, trace_id)
+        self.verification_policy.store(decision['key'], verification)
+        self.verification_stats["reverified"] += 1
+        return verification
+
+    async def request_edits(self, history: ConversationHistory, user_msg: str, response: str, feedback: str,
+                            tool_calls: Optional[List[Dict[str, Any]]] = None, trace_id: Optional[str] = None,
+                            model: str = TRAVELER_MODEL) -> List[Dict[str, str]]:
+        """
+        Ask the model for find/replace edits fixing the flagged parts of a response. The model gets no tools:
+        the turn's tool results are part of the request.
+
+        Args:
+            history (ConversationHistory): The conversation history to use as context.
+            user_msg (str): The user message of the exchange to correct.
+            response (str): The flagged response.
+            feedback (str): The verifier's explanation of what was wrong.
+            tool_calls (list, optional): The tool calls made while answering, with their results.
+            trace_id (Optional[str]): The trace of the turn being corrected.
+            model (str): The corrector model, the turn's generation model.
+
+        Returns:
+            List[Dict[str, str]]: The edits, empty if the model found none or the request failed.
+        """
+        try:
+            context = get_request_metadata() + history.verification_context(user_msg, None)
+            context += correction_edits_request_template.format(feedback=feedback,
+                                                                tool_results=format_tool_results(tool_calls),
+                                                                response=response)
+            correction_config = await self.context_cache.get_config(
+                model, get_corrector_system_prompt(), prompt_name="corrector",
+                response_mime_type="application/json",
+                response_schema=CORRECTION_SCHEMA
+            )
+            async with async_upstream_slot(model):
+                with tracer.span("correct", trace_id, model=model):
+                    correction_response = await self.client.aio.models.generate_content(
+                        model=model,
+                        config=correction_config,
+                        contents=context
+                    )
+            tracer.add_tokens(model, correction_response.usage_metadata, trace_id)
+            return json.loads(correction_response.text).get("edits") or []
+        except Exception as e:
+            logger.warning("Correction edits request failed: %s", e)
+            return []
+
+    async def run_verifier(self, history: ConversationHistory, user_msg: str, response: str,
+                           decision: Dict[str, Any], trace_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Verify a response with the verifier the policy decided on. When the decision cascades, a flag raised
+        by the cheaper verifier only stands if the stronger one confirms it.
+
+        Args:
+            history (ConversationHistory): The conversation history to use as context.
+            user_msg (str): The user message of the exchange to verify.
+            response (str): The response to verify.
+            decision (dict): The verification policy's decision for the response.
+            trace_id (Optional[str]): The trace of the turn being verified.
+
+        Returns:
+            dict: The verdict.
+        """
+        verification = await self.verify_response(history, user_msg, response, model=decision['model'],
+                                                  trace_id=trace_id)
+        if decision.get('escalate_to') and verification["needs_correction"]:
+            self.verification_stats["escalated"] += 1
+            verification = await self.verify_response(history, user_msg, response, model=decision['escalate_to'],
+                                                      trace_id=trace_id)
+        return verification
+
+    async def regenerate(self, chatbot: List[List[str]], history: ConversationHistory, feedback: str,
+                         tool_calls: Optional[List[Dict[str, Any]]] = None, trace_id: Optional[str] = None,
+                         route: Optional[Route] = None,
+                         tool_cache: Optional[LRUCache] = None) -> AsyncGenerator[List[List[str]], None]:
+        """
+        Replace the last response with one regenerated using the verifier's feedback.
+
+        Args:
+            chatbot (List[List[str]]): The current chat history.
+            history (ConversationHistory): The conversation history to use as context.
+            feedback (str): The verifier's explanation of what was wrong.
+            tool_calls (list, optional): Records the tool calls made while regenerating.
+            trace_id (Optional[str]): The trace of the turn being corrected.
+            route (Route, optional): The turn's route, whose model and limits the regeneration uses.
+            tool_cache (LRUCache, optional): The turn's tool results, so the regeneration repeats no upstream call.
+
+        Yields:
+            List[List[str]]: Updated chatbot history with the corrected response.
+        """
+        # Replace with error message and start regeneration
+        error_message = "I apologize, but my response contained inaccurate information. Let me provide you with a corrected answer..."
+        chatbot[-1] = [chatbot[-1][0], error_message]
+        yield chatbot
+
+        # Regenerate with feedback (silently), reusing the cached prompt prefix
+        route = route or self.router.routes["general"]
+        with tracer.span("regenerate", trace_id):
+            tools = get_async_travel_tools(tool_calls, trace_id, tool_cache)
+            regenerate_config = await self.context_cache.get_config(route.model, get_travel_system_prompt(), tools,
+                                                                    prompt_name="travel", **route.config_kwargs())
+            request_context = get_request_metadata() + correction_request_template.format(feedback=feedback)
+            async for chatbot in agenerate_streaming_response(self.client, chatbot, route.model, regenerate_config,
+                                                              history.to_contents(chatbot[-1][0], request_context),
+                                                              tools, trace_id):
                 yield chatbot
 
-                # Regenerate with feedback (silently)
-                formatted_corrected_traveler_system_prompt = corrected_traveler_system_prompt.format(
-                    travel_system_prompt=travel_system_prompt, feedback=verification['feedback'])
-                regenerate_config = types.GenerateContentConfig(
-                    system_instruction=formatted_corrected_traveler_system_prompt,
-                    tools=[get_local_attractions_opentripmap, get_destination_weather_forecast, get_currency_exchange]
-                )
-                for chatbot in generate_streaming_response(self.client, chatbot, TRAVELER_MODEL, regenerate_config,
-                                                           conversation_history):
-                    yield chatbot
+    async def record_verification(self, history: ConversationHistory, user_msg: str, response: str,
+                                  decision: Dict[str, Any], trace_id: Optional[str] = None,
+                                  query: Optional[str] = None,
+                                  tool_calls: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Verify a response that was already displayed and record the verdict, used by the async_after_display mode.
+        A first-turn answer is stored in the response cache once the verifier passed it.
+
+        Args:
+            history (ConversationHistory): The conversation history to use as context.
+            user_msg (str): The user message of the exchange to verify.
+            response (str): The response to verify.
+            decision (dict): The verification policy's decision for the response.
+            trace_id (Optional[str]): The trace of the turn being verified.
+            query (Optional[str]): The question, if it was a first turn whose answer may be cached.
+            tool_calls (list, optional): The tool calls made while answering, which set the cached answer's TTL.
+        """
+        verification = await self.run_verifier(history, user_msg, response, decision, trace_id)
+        self.verification_policy.store(decision['key'], verification)
+        self.verification_stats["background_verified"] += 1
+        if verification["needs_correction"]:
+            self.verification_stats["background_flagged"] += 1
+            logger.warning("Displayed response flagged by the verifier: %s", verification["feedback"])
+        elif query is not None and self.response_cache is not None and self.answer_verified(
+                {'verification': verification}):
+            self.response_cache.set(query, response, tool_calls)
+
+    async def stream_with_pipelined_verification(self, chatbot: List[List[str]], config: types.GenerateContentConfig,
+                                                 contents: List, tools: List, history: ConversationHistory,
+                                                 verdict: Dict[str, Any], trace_id: Optional[str] = None,
+                                                 model: str = TRAVELER_MODEL) -> AsyncGenerator[List[List[str]], None]:
+        """
+        Stream the response while verifying its completed paragraphs concurrently.
+        At most one verification is in flight; when it finishes, the next one covers every paragraph completed
+        since. Generation is cancelled as soon as the verifier flags a completed part of the response.
+
+        Args:
+            chatbot (List[List[str]]): The current chat history.
+            config (GenerateContentConfig): The generation config.
+            contents (List): The conversation in Gemini format.
+            tools (List): The async tools the model may call.
+            history (ConversationHistory): The conversation history to use as the verifier's context.
+            verdict (dict): Filled with the verification result once the response is fully verified or flagged,
+                and left empty if the tail of the response still needs a final verification. A response
+                flagged before it was complete is marked 'partial'.
+            trace_id (Optional[str]): The trace of the turn being streamed.
+            model (str): The generation model.
+
+        Yields:
+            List[List[str]]: Updated chatbot history with the streamed response.
+        """
+        user_msg = chatbot[-1][0]
+        verified_upto = 0
+        task: Optional[asyncio.Task] = None
 
-    def verify_response(self, conversation_history: List[Tuple[str, str]]) -> Dict[str, str]:
+        stream = agenerate_streaming_response(self.client, chatbot, model, config, contents, tools, trace_id)
+        try:
+            async for chatbot in stream:
+                yield chatbot
+                if task is not None and task.done():
+                    result = task.result()
+                    task = None
+                    self.verification_stats["pipelined_chunks"] += 1
+                    if result["needs_correction"]:
+                        self.verification_stats["pipelined_early_stop"] += 1
+                        verdict.update(result, partial=True)  # Cut short, so the response can't be edited
+                        return
+
+                response = chatbot[-1][1] or ""
+                boundary = response.rfind("\n\n")  # End of the last completed paragraph
+                if task is None and boundary > verified_upto:
+                    verified_upto = boundary
+                    task = asyncio.create_task(self.verify_response(history, user_msg, response[:boundary],
+                                                                    partial=True, trace_id=trace_id))
+        except BaseException:
+            # The turn was abandoned, drop the in-flight verification with it
+            if task is not None:
+                task.cancel()
+            raise
+        finally:
+            await stream.aclose()
+
+        if task is not None:
+            result = await task
+            self.verification_stats["pipelined_chunks"] += 1
+            if result["needs_correction"] or verified_upto >= len((chatbot[-1][1] or "").rstrip()):
+                verdict.update(result)
+
+    async def verify_response(self, history: ConversationHistory, user_msg: str, response: str,
+                              partial: bool = False, model: str = VERIFIER_MODEL,
+                              trace_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Verify ONLY the last response in the conversation using Gemini 2.5 Pro.
 
         Args:
-            conversation_history (List): The entire conversation history.
+            history (ConversationHistory): The conversation history to use as context.
+            user_msg (str): The user message of the exchange to verify.
+            response (str): The response to verify.
+            partial (bool): True if the response is still being generated and only its completed part is given.
+            model (str): The verifier model, Gemini 2.5 Pro unless the verification policy downgraded it.
+            trace_id (Optional[str]): The trace of the turn being verified.
 
         Returns:
             dict: A dictionary containing feedback and whether a correction is needed.
         """
         try:
-            # Build context for verification - full conversation for context
-            context = "FULL CONVERSATION FOR CONTEXT:\n\n"
-            for i, (user_msg, bot_msg) in enumerate(conversation_history[:-1]):  # All except last
-                if user_msg:
-                    context += f"User {i + 1}: {user_msg}\n"
-                if bot_msg:
-                    context += f"Assistant {i + 1}: {bot_msg}\n"
-                context += "\n"
-
-            # Highlight the last exchange that needs verification
-            if conversation_history:
-                last_user, last_bot = conversation_history[-1]
-                context += "=" * 50 + "\n"
-                context += "LAST EXCHANGE TO VERIFY:\n"
-                context += "=" * 50 + "\n"
-                if last_user:
-                    context += f"User: {last_user}\n"
-                if last_bot:
-                    context += f"Assistant: {last_bot}\n"
-                context += "=" * 50 + "\n"
-
+            # Build context for verification from the same budgeted history used for generation
+            context = get_request_metadata() + history.verification_context(user_msg, response)
             context += "\nPlease analyze ONLY the last assistant response above for accuracy and appropriateness, using the full conversation as context."
-            verification_config = types.GenerateContentConfig(
-                system_instruction=verifier_system_prompt,
+            if partial:
+                context += "\nThe last assistant response is still being written. Judge only the text shown and do not flag it for being incomplete."
+            verification_config = await self.context_cache.get_config(
+                model, get_verifier_system_prompt(), prompt_name="verifier",
                 response_mime_type="application/json",
                 response_schema=VERIFICATION_SCHEMA
             )
 
             # Get verification from Gemini 2.5 Pro
-            verification_response = self.client.models.generate_content(
-                model=VERIFIER_MODEL,
-                config=verification_config,
-                contents=context
-            )
+            async with async_upstream_slot(model):
+                with tracer.span("verifier", trace_id, model=model, partial=partial):
+                    verification_response = await self.client.aio.models.generate_content(
+                        model=model,
+                        config=verification_config,
+                        contents=context
+                    )
+            tracer.add_tokens(model, verification_response.usage_metadata, trace_id)
             # Parse the JSON response
             verification_result = json.loads(verification_response.text)
             return verification_result
@@ -142,33 +526,152 @@ class ConversationManager:
             # Return safe default on error
             return {
                 "needs_correction": False,
-                "feedback": f"Verification failed: {str(e)}"
+                "feedback": f"Verification failed: {str(e)}",
+                "verification_failed": True
             }
 
 
-conv_manager = ConversationManager()
+conv_manager = ConversationManager(
+    verification_mode=get_env_variable("VERIFICATION_MODE", default=VERIFICATION_MODE),
+    verification_sample_rate=float(get_env_variable("VERIFICATION_SAMPLE_RATE", default=VERIFICATION_SAMPLE_RATE)),
+    context_cache_backend=get_env_variable("CONTEXT_CACHE_BACKEND", default=CONTEXT_CACHE_BACKEND),
+    response_cache_enabled=get_env_flag("RESPONSE_CACHE", default=RESPONSE_CACHE_ENABLED),
+    speculative_prefetch=get_env_flag("SPECULATIVE_PREFETCH", default=SPECULATIVE_PREFETCH_ENABLED),
+    model_routing=get_env_flag("MODEL_ROUTING", default=MODEL_ROUTING_ENABLED),
+    correction_max_rounds=int(get_env_variable("CORRECTION_MAX_ROUNDS", default=CORRECTION_MAX_ROUNDS)),
+)
+tracer.export_path = get_env_variable("TRACE_EXPORT_PATH", default=None)  # Optional JSONL trace of every span
 
 
-def chat_with_agent(chatbot: List[List[str]]) -> Generator[List[List[str]], None, None]:
+async def achat_with_agent(chatbot: List[List[str]], session_id: Optional[str] = None,
+                           trace_id: Optional[str] = None, report: Optional[Dict[str, Any]] = None,
+                           tool_cache: Optional[LRUCache] = None) -> AsyncGenerator[List[List[str]], None]:
     """
     Stream the response from Gemini API with proper handling of function calls and thoughts.
+    Everything, from the Gemini stream to the tools and the verifier, runs on the event loop,
+    so Gradio can consume this generator directly without pinning a worker thread.
+    A first-turn question answered recently is served from the response cache, when it is enabled;
+    any other turn first waits for admission by the turn scheduler.
 
     Args:
         chatbot (List[List[str]]): The current chat history.
+        session_id (Optional[str]): The id of the Gradio session, used to keep its history between turns.
+        trace_id (Optional[str]): The trace of the turn, a new one by default.
+        report (dict, optional): Filled with the turn's 'tool_calls' and its verification outcome,
+            e.g. for batch evaluation.
+        tool_cache (LRUCache, optional): Tool results to share instead of the session's, e.g. across a batch.
 
     Yields:
         List[List[str]]: Updated chatbot history with responses from the agent.
     """
-    # Build conversation history
-    conversation_history = conv_manager.build_conversation_history(chatbot)
-    config = types.GenerateContentConfig(
-        system_instruction=travel_system_prompt,
-        tools=[get_local_attractions_opentripmap, get_destination_weather_forecast, get_currency_exchange]
-    )
-
-    for chatbot in generate_streaming_response(conv_manager.client, chatbot, TRAVELER_MODEL, config,
-                                               conversation_history):
-        yield chatbot
+    trace_id = trace_id or uuid.uuid4().hex
+    report = {} if report is None else report
+    query = conv_manager.cacheable_query(chatbot)
+    if query is not None:
+        started = time.perf_counter()
+        response = conv_manager.response_cache.get(query)
+        if response is not None:
+            tracer.record("chat.cache_hit", time.perf_counter() - started, trace_id, session_id=session_id)
+            chatbot[-1] = [query, response]
+            report.update(tool_calls=[], verification_skipped="response_cache")
+            yield chatbot
+            return
+
+    try:
+        async with turn_scheduler.turn(session_id):
+            async for chatbot in _run_turn(chatbot, session_id, trace_id, report, tool_cache):
+                yield chatbot
+    except SchedulerBusyError:
+        if chatbot:
+            chatbot[-1] = [chatbot[-1][0], BUSY_MESSAGE]
+            yield chatbot
 
-    for chatbot in conv_manager.verify(chatbot, conversation_history):
-        yield chatbot
+
+async def _run_turn(chatbot: List[List[str]], session_id: Optional[str], trace_id: str, report: Dict[str, Any],
+                    tool_cache: Optional[LRUCache] = None) -> AsyncGenerator[List[List[str]], None]:
+    """
+    Run an admitted turn: stream the response, then verify it. The turn is traced end to end,
+    with the time until the user sees the first chunk. The tools' upstream requests the user's message
+    hints at are prefetched while the model reads the prompt. The turn's route picks its model, thinking budget,
+    output cap and verifier tier, and the turn's latency, tokens and cost are accounted to it. A flagged response
+    is corrected with the turn's tool results. A first-turn answer the verifier passed unchanged, or the verification
+    policy deemed safe to skip, is stored in the response cache.
+
+    Args:
+        chatbot (List[List[str]]): The current chat history.
+        session_id (Optional[str]): The id of the Gradio session.
+        trace_id (str): The trace of the turn.
+        report (dict): Filled with the turn's route, tool calls and verification outcome.
+        tool_cache (LRUCache, optional): Tool results to use instead of the session's.
+
+    Yields:
+        List[List[str]]: Updated chatbot history with responses from the agent.
+    """
+    started = time.perf_counter()
+    token_counts = tracer.watch_tokens(trace_id)  # The turn's tokens, accounted to its route
+    try:
+        with tracer.span("chat.turn", trace_id, session_id=session_id) as span:
+            prefetch = None
+            if conv_manager.prefetcher is not None and chatbot and chatbot[-1][0]:
+                prefetch = conv_manager.prefetcher.start(chatbot[-1][0], trace_id)
+            route = conv_manager.router.route(chatbot[-1][0] if chatbot else None, prefetch)
+            span['route'] = report['route'] = route.name
+
+            # Build conversation history
+            session = conv_manager.get_session(chatbot, session_id)
+            history = session.history
+            conversation_history = history.to_contents(chatbot[-1][0] if chatbot else None, get_request_metadata())
+            tool_calls = report['tool_calls'] = []
+            tool_cache = tool_cache if tool_cache is not None else session.tool_results
+            tools = get_async_travel_tools(tool_calls, trace_id, tool_cache)
+            config = await conv_manager.context_cache.get_config(route.model, get_travel_system_prompt(), tools,
+                                                                 prompt_name="travel", **route.config_kwargs())
+
+            verdict = {}
+            pipelined = conv_manager.verification_mode == "pipelined" and route.verifier != "skip"
+            if pipelined and not turn_scheduler.overloaded():
+                stream = conv_manager.stream_with_pipelined_verification(chatbot, config, conversation_history, tools,
+                                                                         history, verdict, trace_id, route.model)
+            else:
+                stream = agenerate_streaming_response(conv_manager.client, chatbot, route.model, config,
+                                                      conversation_history, tools, trace_id)
+            async for chatbot in stream:
+                if 'first_chunk' not in span:
+                    span['first_chunk'] = round(time.perf_counter() - started, 6)
+                    tracer.record("chat.first_chunk", span['first_chunk'], trace_id)
+                yield chatbot
+
+            streamed = chatbot[-1][1] if chatbot else None
+            async for chatbot in conv_manager.verify(chatbot, history, verification=verdict or None,
+                                                     tool_calls=tool_calls, trace_id=trace_id, report=report,
+                                                     route=route, tool_cache=tool_cache):
+                yield chatbot
+
+            span['tool_calls'] = len(tool_calls)
+            conv_manager.router.record(route, time.perf_counter() - started, span.get('first_chunk'), token_counts,
+                                       trace_id)
+            if prefetch is not None:
+                conv_manager.prefetcher.record(prefetch, tool_calls)
+            query = conv_manager.cacheable_query(chatbot)
+            if query is not None and streamed and chatbot[-1][1] == streamed and conv_manager.answer_verified(report):
+                conv_manager.response_cache.set(query, streamed, tool_calls)
+            session.stats.update(turns=1, tool_calls=len(tool_calls),
+                                 tool_cache_hits=sum(1 for call in tool_calls if call['cached']))
+            conv_manager.sessions.save(session)
+    finally:
+        tracer.unwatch_tokens(trace_id)
+
+
+def chat_with_agent(chatbot: List[List[str]],
+                    session_id: Optional[str] = None) -> Generator[List[List[str]], None, None]:
+    """
+    Synchronous version of achat_with_agent, for callers that are not running an event loop.
+
+    Args:
+        chatbot (List[List[str]]): The current chat history.
+        session_id (Optional[str]): The id of the Gradio session, used to keep its history between turns.
+
+    Yields:
+        List[List[str]]: Updated chatbot history with responses from the agent.
+    """
+    yield from iterate_async_generator(achat_with_agent(chatbot, session_id))
@@ -1,14 +1,84 @@
-from datetime import datetime, timedelta
-from typing import Dict, Any
+import asyncio
+import functools
+import json
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, time
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Tuple, NamedTuple
+
+from src.constants import NOT_FOUND_ERROR_INSTRUCTION, ALLOWED_KINDS, OPENTRIPMAP_DETAIL_WORKERS, \
+    OPENTRIPMAP_DETAIL_TIMEOUT, TOOL_EXECUTOR_WORKERS, ATTRACTIONS_MIN_RATE, ATTRACTION_DESCRIPTION_TOKENS, \
+    SESSION_TOOL_CACHE_TTL_SECONDS
+from src.utils.attractions_index import attractions_index
+from src.utils.cache import LRUCache
+from src.utils.exchange_rates import exchange_rates
+from src.utils.forecasts import forecasts
+from src.utils.geocoding import geocoder
+from src.utils.http import http_get, parse_json
+from src.utils.shared_cache import shared_cache
+from src.utils.tracing import tracer, set_current_trace
+from src.utils.utils import get_env_variable, truncate_to_tokens
 
-import requests
+OPEN_TRIP_MAP_API_KEY = get_env_variable('OPEN_TRIP_MAP_API_KEY')
 
-from src.constants import NOT_FOUND_ERROR_INSTRUCTION, ALLOWED_KINDS
-from src.utils.utils import get_env_variable
+# Bounded pool the async tools run their blocking HTTP chains on
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="travel-tool")
+# Cached tool calls being run, by (event loop, result cache, call), so identical concurrent calls run once
+_in_flight: Dict[Tuple[int, int, Tuple[str, str]], asyncio.Future] = {}
 
-OPENWEATHER_API_KEY = get_env_variable('OPENWEATHER_API_KEY')
-OPEN_TRIP_MAP_API_KEY = get_env_variable('OPEN_TRIP_MAP_API_KEY')
-EXCHANGERATE_API_KEY = get_env_variable('EXCHANGERATE_API_KEY')
+
+class Attraction(NamedTuple):
+    """
+    The fields the tool returns from an OpenTripMap detail document, which is dropped right after parsing.
+    """
+    name: Optional[str]
+    kind: Optional[str]
+    description: str  # Truncated to ATTRACTION_DESCRIPTION_TOKENS
+    url: str
+
+
+def _get_attraction_details(place: Dict[str, Any]) -> Attraction:
+    """
+    Fetch the OpenTripMap details of a single place, falling back to the radius-search data on failure.
+
+    Args:
+        place (dict): A place returned by the OpenTripMap radius search.
+
+    Returns:
+        Attraction: The attraction's name, kind, truncated description and url.
+    """
+    xid = place.get('xid')
+    try:
+        detail_url = f"https://api.opentripmap.com/0.1/en/places/xid/{xid}"
+        detail = parse_json(http_get("opentripmap", detail_url, params={'apikey': OPEN_TRIP_MAP_API_KEY},
+                                     timeout=OPENTRIPMAP_DETAIL_TIMEOUT))
+    except Exception:
+        # Partial result: keep what the radius search already told us
+        detail = {'name': place.get('name'), 'kinds': place.get('kinds')}
+
+    return Attraction(
+        name=detail.get('name'),
+        kind=detail.get('kinds'),
+        description=truncate_to_tokens(detail.get('wikipedia_extracts', {}).get('text', ''),
+                                       ATTRACTION_DESCRIPTION_TOKENS),
+        url=detail.get('wikipedia', ''),
+    )
+
+
+def _get_all_attraction_details(places: List[Dict[str, Any]]) -> List[Attraction]:
+    """
+    Fetch the details of all places concurrently, keeping the radius-search ordering.
+
+    Args:
+        places (list): The places returned by the OpenTripMap radius search.
+
+    Returns:
+        list: The detailed attractions, in the same order as places.
+    """
+    if not places:
+        return []
+    with ThreadPoolExecutor(max_workers=min(OPENTRIPMAP_DETAIL_WORKERS, len(places))) as executor:
+        return list(executor.map(_get_attraction_details, places))
 
 
 def get_local_attractions_opentripmap(destination: str, kind: str, radius: int = 10000, limit: int = 5) -> Dict[str, Any]:
@@ -34,44 +104,37 @@ def get_local_attractions_opentripmap(destination: str, kind: str, radius: int =
             "error": f"Invalid 'kind': {kind}. Must be one of: {', '.join(ALLOWED_KINDS)}. {NOT_FOUND_ERROR_INSTRUCTION}"}
     try:
         # Step 1: Get coordinates of the destination
-        geocode_url = f"https://api.opentripmap.com/0.1/en/places/geoname"
-        geocode_params = {'name': destination, 'apikey': OPEN_TRIP_MAP_API_KEY}
-        geo_res = requests.get(geocode_url, params=geocode_params).json()
-
-        if 'lat' not in geo_res or 'lon' not in geo_res:
+        location = geocoder.geocode(destination)
+        if location is None:
             return {"error": f"Destination '{destination}' not found. {NOT_FOUND_ERROR_INSTRUCTION}"}
 
-        lat, lon = geo_res['lat'], geo_res['lon']
+        lat, lon = location['lat'], location['lon']
+
+        # Step 2: Answer from the prefetched index when it covers the search
+        indexed = attractions_index.query(lat, lon, kind, radius, limit)
+        if indexed is not None:
+            return {
+                'attractions': indexed,
+            }
 
-        # Step 2: Get attractions near location
-        places_url = f"https://api.opentripmap.com/0.1/en/places/radius"
+        # Step 3: Get attractions near location
+        places_url = "https://api.opentripmap.com/0.1/en/places/radius"
         places_params = {
             'kinds': kind,
             'radius': radius,
             'lon': lon,
             'lat': lat,
             'limit': limit,
-            'rate': 3,  # Higher rating
+            'rate': ATTRACTIONS_MIN_RATE,  # Higher rating
             'format': 'json',
             'apikey': OPEN_TRIP_MAP_API_KEY
         }
-        places = requests.get(places_url, params=places_params).json()
-
-        # Step 3: Get detailed info for each place
-        detailed_attractions = []
-        for place in places:
-            xid = place.get('xid')
-            detail_url = f"https://api.opentripmap.com/0.1/en/places/xid/{xid}"
-            detail = requests.get(detail_url, params={'apikey': OPEN_TRIP_MAP_API_KEY}).json()
-
-            detailed_attractions.append({
-                'name': detail.get('name'),
-                'kind': detail.get('kinds'),
-                'description': detail.get('wikipedia_extracts', {}).get('text', ''),
-                'url': detail.get('wikipedia', ''),
-            })
+        places = parse_json(http_get("opentripmap", places_url, params=places_params))
+
+        # Step 4: Get detailed info for each place, concurrently
+        detailed_attractions = _get_all_attraction_details(places)
         return {
-            'attractions': detailed_attractions,
+            'attractions': [attraction._asdict() for attraction in detailed_attractions],
         }
 
     except Exception as e:
@@ -104,57 +167,25 @@ def get_destination_weather_forecast(destination: str, day: int, month: int, yea
 
     try:
         # Get coordinates for the destination
-        geocoding_url = f"http://api.openweathermap.org/geo/1.0/direct"
-        geocoding_params = {
-            'q': destination,
-            'limit': 1,
-            'appid': OPENWEATHER_API_KEY
-        }
-
-        geo_response = requests.get(geocoding_url, params=geocoding_params)
-        geo_data = geo_response.json()
-
-        if not geo_data:
+        location = geocoder.geocode(destination)
+        if location is None:
             return {
                 "error": f"Location '{destination}' not found, assume the weather is based on your knowledge about the location."}
 
-        lat, lon = geo_data[0]['lat'], geo_data[0]['lon']
+        lat, lon = location['lat'], location['lon']
 
-        # Get weather forecast
-        weather_url = f"http://api.openweathermap.org/data/2.5/forecast"
-        weather_params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': OPENWEATHER_API_KEY,
-            'units': 'metric'
-        }
-
-        weather_response = requests.get(weather_url, params=weather_params)
-        weather_data = weather_response.json()
-
-        relevant_forecasts = []
-        for forecast in weather_data['list']:
-            forecast_datetime = datetime.fromtimestamp(forecast['dt'])
-            if travel_datetime.date() <= forecast_datetime.date() <= (travel_datetime + timedelta(days=5)).date():
-                relevant_forecasts.append({
-                    'date': forecast_datetime.strftime('%Y-%m-%d %H:%M'),
-                    'temperature': {
-                        'temp': forecast['main']['temp'],
-                        'feels_like': forecast['main']['feels_like'],
-                        'min': forecast['main']['temp_min'],
-                        'max': forecast['main']['temp_max']
-                    },
-                    'weather': forecast['weather'][0]['description'],
-                    'humidity': forecast['main']['humidity'],
-                    'wind_speed': forecast['wind']['speed']
-                })
+        # Get weather forecast (cached per coordinate) and slice the requested window locally
+        forecast = forecasts.get(lat, lon)
+        window_start = datetime.combine(travel_datetime.date(), time.min)
+        window_end = datetime.combine((travel_datetime + timedelta(days=5)).date(), time.max)
+        relevant_forecasts = forecast.window(window_start, window_end)
 
         return {
             'destination': destination,
             'forecasts': relevant_forecasts,
             'city_info': {
-                'name': geo_data[0]['name'],
-                'country': geo_data[0]['country'],
+                'name': location['name'],
+                'country': location['country'],
                 'coordinates': {'lat': lat, 'lon': lon}
             }
         }
@@ -172,29 +203,115 @@ def get_currency_exchange(from_currency: str, to_currency: str, amount: float) -
         amount: Amount to convert (default: 1.0)
 
     Returns:
-        A dictionary containing exchange rate and converted amount.
+        A dictionary containing exchange rate, converted amount and the age of the cached rates.
     """
     try:
-        # Using exchangerate-api.com (free tier available)
-        url = f"https://v6.exchangerate-api.com/v6/{EXCHANGERATE_API_KEY}/latest/{from_currency}"
+        return exchange_rates.convert(from_currency.upper(), to_currency.upper(), amount)
 
-        response = requests.get(url)
-        data = response.json()
+    except Exception as e:
+        return {"error": f"Currency exchange error: {str(e)}. {NOT_FOUND_ERROR_INSTRUCTION}."}
 
-        if to_currency not in data['conversion_rates']:
-            return {"error": f"Currency '{to_currency}' not found"}
 
-        exchange_rate = data['conversion_rates'][to_currency]
-        converted_amount = amount * exchange_rate
+def _run_in_trace(trace_id: Optional[str], tool: Callable[..., Dict[str, Any]], *args, **kwargs) -> Dict[str, Any]:
+    """
+    Run a blocking tool on a worker thread attached to a turn's trace, so its HTTP spans are linked to the turn.
+    """
+    set_current_trace(trace_id)
+    try:
+        return tool(*args, **kwargs)
+    finally:
+        set_current_trace(None)
 
-        return {
-            'from_currency': from_currency,
-            'to_currency': to_currency,
-            'exchange_rate': exchange_rate,
-            'original_amount': amount,
-            'converted_amount': round(converted_amount, 2),
-            'time_last_update_utc': data['time_last_update_utc']
-        }
 
-    except Exception as e:
-        return {"error": f"Currency exchange error: {str(e)}. {NOT_FOUND_ERROR_INSTRUCTION}."}
+def _shared_call(loop: asyncio.AbstractEventLoop, method: Callable[..., Any], *args) -> Awaitable[Any]:
+    """
+    Call a shared cache method without blocking the event loop on an out-of-process backend.
+
+    Returns:
+        Awaitable: The method's result.
+    """
+    if shared_cache.cross_process:
+        return loop.run_in_executor(tool_executor, method, *args)
+    future = loop.create_future()
+    future.set_result(method(*args))
+    return future
+
+
+def make_async_tool(tool: Callable[..., Dict[str, Any]], tool_calls: Optional[List[Dict[str, Any]]] = None,
+                    trace_id: Optional[str] = None,
+                    tool_cache: Optional[LRUCache] = None) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """
+    Wrap a blocking tool in a coroutine that runs it on the bounded tool executor, keeping the tool's name,
+    docstring and signature so Gemini sees the same function declaration.
+    With a result cache, a call made while the same call is already running waits for its result, and a call
+    another session or worker already made is answered from the shared cache tier.
+
+    Args:
+        tool (Callable): A blocking travel tool.
+        tool_calls (list, optional): If given, every call is appended to it as
+            {'name', 'args', 'result', 'duration', 'cached'}.
+        trace_id (Optional[str]): The trace of the turn the tool is called in.
+        tool_cache (LRUCache, optional): Successful results by tool and arguments, reused instead of calling again.
+
+    Returns:
+        Callable: The async version of the tool.
+    """
+
+    @functools.wraps(tool)
+    async def async_tool(*args, **kwargs) -> Dict[str, Any]:
+        started = timer.perf_counter()
+        cache_key = (tool.__name__, json.dumps(kwargs, sort_keys=True, default=str))
+        shared = tool_cache is not None and not args
+        result = tool_cache.get(cache_key) if shared else None
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), id(tool_cache), cache_key)
+        if result is None and shared and flight_key in _in_flight:
+            result = await asyncio.shield(_in_flight[flight_key])
+        cached = result is not None
+        if not cached:
+            flight = loop.create_future() if shared else None
+            if flight is not None:
+                _in_flight[flight_key] = flight
+            try:
+                if shared:
+                    result = await _shared_call(loop, shared_cache.get, "tool", ":".join(cache_key))
+                    cached = result is not None
+                if cached:
+                    tool_cache.set(cache_key, result)
+                else:
+                    with tracer.span(f"tool.{tool.__name__}", trace_id) as span:
+                        result = await loop.run_in_executor(
+                            tool_executor, functools.partial(_run_in_trace, trace_id, tool, *args, **kwargs))
+                        span['tool_error'] = isinstance(result, dict) and 'error' in result
+                    if shared and not span['tool_error']:
+                        tool_cache.set(cache_key, result)
+                        _shared_call(loop, shared_cache.set, "tool", ":".join(cache_key), result,
+                                     SESSION_TOOL_CACHE_TTL_SECONDS)
+            finally:
+                if flight is not None:
+                    if _in_flight.get(flight_key) is flight:
+                        del _in_flight[flight_key]
+                    flight.set_result(result)  # None if the call failed, its waiters then run it themselves
+        if tool_calls is not None:
+            tool_calls.append({'name': tool.__name__, 'args': kwargs, 'result': result,
+                               'duration': round(timer.perf_counter() - started, 4), 'cached': cached})
+        return result
+
+    return async_tool
+
+
+def get_async_travel_tools(tool_calls: Optional[List[Dict[str, Any]]] = None, trace_id: Optional[str] = None,
+                           tool_cache: Optional[LRUCache] = None) -> List[Callable[..., Awaitable[Dict[str, Any]]]]:
+    """
+    Args:
+        tool_calls (list, optional): If given, records every tool call made during a turn.
+        trace_id (Optional[str]): The trace of the turn the tools are called in.
+        tool_cache (LRUCache, optional): The session's tool results, reused between its turns.
+
+    Returns:
+        list: The async travel tools, bound to the given call log, trace and result cache.
+    """
+    return [make_async_tool(tool, tool_calls, trace_id, tool_cache) for tool in TRAVEL_TOOLS]
+
+
+TRAVEL_TOOLS = [get_local_attractions_opentripmap, get_destination_weather_forecast, get_currency_exchange]
@@ -0,0 +1,183 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.constants import ATTRACTIONS_INDEX_PATH, ATTRACTIONS_INDEX_CELL_DEGREES, ATTRACTIONS_MIN_RATE, \
+    ATTRACTION_DESCRIPTION_TOKENS
+from src.utils.geocoding import normalize_destination
+from src.utils.utils import truncate_to_tokens
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE = 111320
+RELOAD_CHECK_SECONDS = 60
+
+
+def distance_meters(lat: float, lon: float, other_lat: float, other_lon: float) -> float:
+    """
+    Great-circle (haversine) distance between two coordinates, in meters.
+    """
+    phi, other_phi = math.radians(lat), math.radians(other_lat)
+    a = (math.sin((other_phi - phi) / 2) ** 2
+         + math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_lon - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+class AttractionsIndex:
+    """
+    A local index of prefetched OpenTripMap attractions, so radius searches around popular destinations are
+    answered from memory instead of a radius search plus one detail request per place.
+    Places are bucketed by kind on a lat/lon grid. An area records the prefetched circle around a destination
+    and, per kind, whether its places were all prefetched or capped. Only kinds whose places were all prefetched
+    are answered, since a capped kind holds an arbitrary subset that can differ from what a live search returns;
+    queries for capped kinds or outside every area miss, and the tool falls back to the live API.
+    The index is built by `python -m src.prefetch_attractions` and reloaded when its file changes.
+    """
+
+    def __init__(self, path: Optional[str] = ATTRACTIONS_INDEX_PATH, cell_degrees: float = ATTRACTIONS_INDEX_CELL_DEGREES):
+        self.path = path
+        self.cell_degrees = cell_degrees
+        self.areas: List[Dict[str, Any]] = []
+        self.places: Dict[str, Dict[str, Any]] = {}  # xid -> place
+        self.grid: Dict[Tuple[str, int, int], List[Dict[str, Any]]] = {}  # (kind, cell) -> places of that kind
+        self.lookups = Counter()  # hits, misses
+        self._loaded_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def _build_grid(self) -> None:
+        grid = defaultdict(list)
+        for place in self.places.values():
+            cell = self._cell(place['lat'], place['lon'])
+            for kind in place['kinds'].split(","):
+                grid[(kind, *cell)].append(place)
+        self.grid = dict(grid)
+
+    def _maybe_reload(self) -> None:
+        """
+        Load the index file on first use and whenever the prefetch job has rewritten it.
+        """
+        now = time.time()
+        if not self.path or now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime == self._loaded_mtime:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return  # Keep serving the current index
+            self.areas = data['areas']
+            self.places = {place['xid']: place for place in data['places']}
+            self._build_grid()
+            self._loaded_mtime = mtime
+
+    def _covering_area(self, lat: float, lon: float, radius: float, kind: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            Optional[dict]: An area holding every place of the kind within the radius, if there is one.
+        """
+        for area in self.areas:
+            if area['kinds'].get(kind) and distance_meters(lat, lon, area['lat'], area['lon']) + radius <= area['radius']:
+                return area
+        return None
+
+    def query(self, lat: float, lon: float, kind: str, radius: float, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Find the top-rated places of a kind within a radius, if the index covers the search.
+
+        Args:
+            lat (float): Latitude of the search center.
+            lon (float): Longitude of the search center.
+            kind (str): OpenTripMap kind to filter by.
+            radius (float): Search radius in meters.
+            limit (int): Maximum number of places to return.
+
+        Returns:
+            Optional[list]: Up to `limit` attractions ('name', 'kind', 'description', 'url'), highest rated and then
+                closest first, or None if no prefetched area holds all of the kind's places within the radius,
+                and the search must go to the API.
+        """
+        self._maybe_reload()
+        area = self._covering_area(lat, lon, radius, kind)
+        if area is None:
+            self.lookups["misses"] += 1
+            return None
+
+        lat_span = radius / METERS_PER_DEGREE
+        lon_span = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        min_row, min_col = self._cell(lat - lat_span, lon - lon_span)
+        max_row, max_col = self._cell(lat + lat_span, lon + lon_span)
+        found = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for place in self.grid.get((kind, row, col), ()):
+                    distance = distance_meters(lat, lon, place['lat'], place['lon'])
+                    if distance <= radius and place['rate'] >= ATTRACTIONS_MIN_RATE:
+                        found.append((-place['rate'], distance, place))
+
+        self.lookups["hits"] += 1
+        found.sort(key=lambda item: item[:2])
+        return [{'name': place['name'], 'kind': place['kinds'],
+                 'description': truncate_to_tokens(place['description'], ATTRACTION_DESCRIPTION_TOKENS), 'url': place['url']}
+                for _, _, place in found[:limit]]
+
+    def add_area(self, destination: str, lat: float, lon: float, radius: float, kinds: Dict[str, bool],
+                 places: List[Dict[str, Any]]) -> None:
+        """
+        Add the prefetched places around a destination, replacing an earlier prefetch of it.
+
+        Args:
+            destination (str): The destination the area was prefetched around.
+            lat (float): Latitude of the area's center.
+            lon (float): Longitude of the area's center.
+            radius (float): Radius of the area in meters.
+            kinds (dict): The prefetched kinds, each mapped to True if all its places in the area were prefetched.
+            places (list): The places, with 'xid', 'name', 'lat', 'lon', 'rate', 'kinds', 'description' and 'url'.
+        """
+        key = normalize_destination(destination)
+        with self._lock:
+            self.areas = [area for area in self.areas if area['destination'] != key] + [{
+                'destination': key, 'lat': lat, 'lon': lon, 'radius': radius, 'kinds': kinds, 'built_at': time.time(),
+            }]
+            self.places.update((place['xid'], place) for place in places)
+            self._build_grid()
+
+    def save(self) -> None:
+        """
+        Write the index file, atomically so a serving process never reads it half written.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {'areas': self.areas, 'places': list(self.places.values())}
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def load(self) -> None:
+        """
+        Load the index file now, e.g. before adding areas to it.
+        """
+        self._checked_at = 0.0
+        self._maybe_reload()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.lookups, 'areas': len(self.areas), 'places': len(self.places)}
+
+
+attractions_index = AttractionsIndex()
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded in-memory LRU cache with an optional per-entry TTL and hit/miss counters.
+    With a `sizeof` function, entries are also evicted to keep their total estimated size under `maxbytes`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, maxbytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl  # Seconds an entry stays valid, None means entries never expire
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0  # Total estimated size of the entries, tracked only with a sizeof function
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the cached value for a key and mark it as recently used.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): Value returned when the key is missing or expired.
+
+        Returns:
+            Any: The cached value or the default.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.bytes -= size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entries when the cache is full.
+        Storing a key again refreshes its TTL and its size estimate.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            ttl (Optional[float]): Overrides the cache-wide TTL for this entry.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._data[key] = (value, expires_at, size)
+            self._data.move_to_end(key)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (
+                    self.maxbytes is not None and self.bytes > self.maxbytes and len(self._data) > 1):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove a key from the cache and return its value.
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+        return default if entry is None else entry[0]
+
+    def purge_expired(self) -> int:
+        """
+        Remove every expired entry, instead of waiting for it to be looked up or evicted.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._data.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                self.bytes -= self._data.pop(key)[2]
+        return len(expired)
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.time())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: The current size, capacity and hit/miss counters of the cache.
+        """
+        total = self.hits + self.misses
+        stats = {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'evictions': self.evictions,
+        }
+        if self.sizeof is not None:
+            stats.update(bytes=self.bytes, maxbytes=self.maxbytes)
+        return stats
+
+
+class SingleFlight:
+    """
+    Runs concurrent calls for the same key once: callers arriving while a call is running wait for it
+    and share its result (or exception), e.g. a tool call arriving while a prefetch is downloading the same data.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[threading.Event, list]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Args:
+            key (Hashable): Identifies the call.
+            fn (Callable): The call, run only if no call with the same key is running.
+
+        Returns:
+            Any: The result of the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = (threading.Event(), [])
+        done, outcome = call
+        if not leader:
+            done.wait()
+            error, result = outcome
+            if error is not None:
+                raise error
+            return result
+
+        try:
+            result = fn()
+            outcome.extend((None, result))
+            return result
+        except BaseException as e:
+            outcome.extend((e, None))
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            done.set()
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.genai import Client, types
+
+from src.constants import CONTEXT_CACHE_TTL_SECONDS, CONTEXT_CACHE_REFRESH_MARGIN_SECONDS, \
+    CONTEXT_CACHE_DELETE_DELAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LocalContextCache:
+    """
+    Stand-in for the Gemini context cache that sends the static prompt prefix inline with every request.
+    Used in tests and offline runs, and as the fallback whenever a cached context can't be created.
+    """
+
+    async def get_config(self, model: str, system_instruction: str, tools: Optional[List[Callable]] = None,
+                         prompt_name: Optional[str] = None, **config_kwargs: Any) -> types.GenerateContentConfig:
+        """
+        Build the generation config of a request whose static prefix is the system instruction and tools.
+
+        Args:
+            model (str): The model the request is sent to.
+            system_instruction (str): The static system prompt.
+            tools (list, optional): The tools, called explicitly by the streaming loop rather than by the SDK.
+            prompt_name (Optional[str]): The prompt's name (e.g. "travel", "verifier"); a cached context only
+                replaces an earlier context of the same prompt, tools and model.
+            **config_kwargs: Any other GenerateContentConfig fields.
+
+        Returns:
+            GenerateContentConfig: The request config.
+        """
+        if tools:
+            config_kwargs['tools'] = tools
+            config_kwargs['automatic_function_calling'] = types.AutomaticFunctionCallingConfig(disable=True)
+        return types.GenerateContentConfig(system_instruction=system_instruction, **config_kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': "local"}
+
+
+class GeminiContextCache(LocalContextCache):
+    """
+    Registers the static prompt prefix (system instruction and tool declarations) as a Gemini cached context,
+    so each request only uploads the conversation. A cached context is keyed by a hash of its model and content,
+    so a new one is created whenever the prompt version or the currency code list changes, and it is renewed
+    shortly before its TTL runs out. Each named prompt of a model has its own context (the flash model serves the
+    travel, verifier and corrector prompts), and an outdated one is deleted only after the turns that may still
+    be using it had time to finish.
+    """
+
+    def __init__(self, client: Client, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.entries: Dict[str, Tuple[str, float]] = {}  # key -> (cached content name, expires at)
+        self.latest_by_prompt: Dict[Tuple[str, str, str], str] = {}  # (model, prompt, tools) -> latest key
+        self.failed: set = set()  # Keys that couldn't be cached, e.g. below the model's minimum token count
+        self.hits = 0
+        self.creations = 0
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._deletions: set = set()  # Keep references so the tasks aren't garbage collected
+
+    @staticmethod
+    def cache_key(model: str, system_instruction: str, tools: Optional[List[Callable]]) -> str:
+        tool_names = ",".join(tool.__name__ for tool in tools or [])
+        return hashlib.sha256(f"{model}\n{tool_names}\n{system_instruction}".encode()).hexdigest()
+
+    async def _create(self, key: str, model: str, system_instruction: str, tools: Optional[List[Callable]],
+                      prompt_name: Optional[str] = None) -> Optional[str]:
+        try:
+            cache_tools = None
+            if tools:
+                cache_tools = [types.Tool(function_declarations=[
+                    types.FunctionDeclaration.from_callable_with_api_option(callable=tool) for tool in tools
+                ])]
+            cached = await self.client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"travel-assistant-{key[:12]}",
+                    system_instruction=system_instruction,
+                    tools=cache_tools,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+        except Exception as e:
+            logger.warning("Could not create a cached context for %s, sending the prompt inline: %s", model, e)
+            self.failed.add(key)
+            return None
+
+        self.creations += 1
+        self.entries[key] = (cached.name, time.time() + self.ttl_seconds)
+        if prompt_name is not None:
+            slot = (model, prompt_name, ",".join(tool.__name__ for tool in tools or []))
+            previous = self.latest_by_prompt.get(slot)
+            self.latest_by_prompt[slot] = key
+            if previous and previous != key and previous in self.entries:
+                # The prompt changed, stop paying for the outdated context
+                old_name, _ = self.entries.pop(previous)
+                task = asyncio.create_task(self._delete(old_name, CONTEXT_CACHE_DELETE_DELAY_SECONDS))
+                self._deletions.add(task)
+                task.add_done_callback(self._deletions.discard)
+        return cached.name
+
+    async def _delete(self, name: str, delay: float = 0) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self.client.aio.caches.delete(name=name)
+        except Exception as e:
+            logger.debug("Could not delete cached context %s: %s", name, e)
+
+    async def get_config(self, model: str, system_instruction: str, tools: Optional[List[Callable]] = None,
+                         prompt_name: Optional[str] = None, **config_kwargs: Any) -> types.GenerateContentConfig:
+        key = self.cache_key(model, system_instruction, tools)
+        if key in self.failed:
+            return await super().get_config(model, system_instruction, tools, **config_kwargs)
+
+        name, expires_at = self.entries.get(key, (None, 0.0))
+        if name is not None and expires_at - time.time() > CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+            self.hits += 1
+        else:
+            # Concurrent requests share a single creation
+            task = self._pending.get(key)
+            if task is None:
+                task = asyncio.create_task(self._create(key, model, system_instruction, tools, prompt_name))
+                self._pending[key] = task
+                task.add_done_callback(lambda _: self._pending.pop(key, None))
+            name = await task
+
+        if name is None:
+            return await super().get_config(model, system_instruction, tools, **config_kwargs)
+        return types.GenerateContentConfig(cached_content=name, **config_kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': "gemini",
+            'hits': self.hits,
+            'creations': self.creations,
+            'active': len(self.entries),
+            'failed': len(self.failed),
+        }
+
+
+def create_context_cache(client: Client, backend: str) -> LocalContextCache:
+    """
+    Args:
+        client (Client): The GenAI client.
+        backend (str): "gemini" for Gemini context caching, "local" for the inline stand-in.
+
+    Returns:
+        LocalContextCache: The context cache.
+    """
+    if backend == "local":
+        return LocalContextCache()
+    if backend == "gemini":
+        return GeminiContextCache(client)
+    raise ValueError(f"Unknown context cache backend '{backend}'. Must be 'gemini' or 'local'.")
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.constants import CURRENCY_CODES_CACHE_PATH, CURRENCY_CODES_REFRESH_SECONDS
+from src.utils.utils import get_all_currency_codes
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), "currency_codes.json")
+
+
+class CurrencyCodeList:
+    """
+    The ExchangeRate-API currency code list, served from a bundled snapshot (or the last refreshed copy)
+    and refreshed in a background thread, so reading it never waits on the network.
+    """
+
+    def __init__(self, cache_path: Optional[str] = CURRENCY_CODES_CACHE_PATH,
+                 refresh_seconds: float = CURRENCY_CODES_REFRESH_SECONDS):
+        self.cache_path = cache_path
+        self.refresh_seconds = refresh_seconds
+        self.codes: Optional[List[List[str]]] = None
+        self.loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _load_local(self) -> None:
+        """
+        Load the last refreshed copy if there is one, otherwise the bundled snapshot.
+        """
+        for path in (self.cache_path, SNAPSHOT_PATH):
+            if path and os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.codes = json.load(f)["supported_codes"]
+                # The bundled snapshot is always considered stale, so a refresh starts on first use
+                self.loaded_at = os.path.getmtime(path) if path == self.cache_path else 0.0
+                return
+        self.codes = []
+
+    def _refresh(self) -> None:
+        try:
+            result = get_all_currency_codes()
+            if "supported_codes" in result:
+                self.codes = result["supported_codes"]
+                self.loaded_at = time.time()
+                if self.cache_path:
+                    os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+                    with open(self.cache_path, "w", encoding="utf-8") as f:
+                        json.dump(result, f, ensure_ascii=False)
+        except Exception:
+            pass  # Keep serving the current list, the next read schedules another attempt
+        finally:
+            self._refreshing = False
+
+    def get(self) -> Dict[str, Any]:
+        """
+        Return the currency codes immediately, scheduling a background refresh when the list is stale.
+
+        Returns:
+            dict: {"supported_codes": [[code, name], ...]}, the same shape as get_all_currency_codes.
+        """
+        with self._lock:
+            if self.codes is None:
+                self._load_local()
+            if not self._refreshing and time.time() - self.loaded_at > self.refresh_seconds:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name="currency-codes-refresh", daemon=True).start()
+        return {"supported_codes": self.codes}
+
+    def codes_set(self) -> set:
+        """
+        Returns:
+            set: The supported currency codes, e.g. {"USD", "EUR", ...}.
+        """
+        return {code for code, _ in self.get()["supported_codes"]}
+
+    @property
+    def version(self) -> str:
+        """
+        Returns:
+            str: A short hash of the current list, which changes whenever the list does.
+        """
+        return hashlib.sha256(json.dumps(self.get()["supported_codes"]).encode()).hexdigest()[:12]
+
+
+currency_codes = CurrencyCodeList()
@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.constants import EXCHANGE_RATE_BASE, EXCHANGE_RATE_STALE_RETRY_SECONDS
+from src.utils.http import http_get, parse_json
+from src.utils.shared_cache import shared_cache
+from src.utils.utils import get_env_variable
+
+
+class ExchangeRateCache:
+    """
+    Caches a single ExchangeRate-API rate table for one base currency, keyed on the upstream's update
+    timestamp, and derives any A→B pair from it by triangulating through the base.
+    The table is only downloaded again once the upstream's next scheduled update has passed, and with
+    an out-of-process shared cache, only by the first worker that needs the new table.
+    """
+
+    def __init__(self, base: str = EXCHANGE_RATE_BASE):
+        self.base = base
+        self.table: Optional[Dict[str, Any]] = None
+        self.hits = 0
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self.table is not None and time.time() < self.table['expires_at']
+
+    def _download(self) -> Dict[str, Any]:
+        """
+        Download the rate table of the base currency.
+
+        Returns:
+            dict: The conversion rates together with the upstream update timestamps.
+        """
+        self.downloads += 1
+        url = f"https://v6.exchangerate-api.com/v6/{get_env_variable('EXCHANGERATE_API_KEY')}/latest/{self.base}"
+        data = parse_json(http_get("exchangerate", url))
+        if data.get("result") != "success":
+            raise ValueError(data.get("error-type", "Unknown error."))
+
+        now = time.time()
+        last_update = data.get('time_last_update_unix', now)
+        next_update = data.get('time_next_update_unix', now + EXCHANGE_RATE_STALE_RETRY_SECONDS)
+        if self.table is not None and last_update == self.table['time_last_update_unix']:
+            # The upstream hasn't published the new table yet, check again shortly
+            next_update = now + EXCHANGE_RATE_STALE_RETRY_SECONDS
+
+        return {
+            'rates': data['conversion_rates'],
+            'time_last_update_unix': last_update,
+            'time_last_update_utc': data.get('time_last_update_utc', ''),
+            'fetched_at': now,
+            'expires_at': max(next_update, now + 1),
+        }
+
+    def get_table(self) -> Dict[str, Any]:
+        """
+        Return the cached rate table, downloading it only if the upstream has published a newer one.
+
+        Returns:
+            dict: The current rate table.
+        """
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self.table
+            table = shared_cache.get("rates", self.base) if shared_cache.cross_process else None
+            if table is not None and time.time() < table['expires_at']:
+                self.hits += 1
+                self.table = table
+                return self.table
+            self.table = self._download()
+            if shared_cache.cross_process:
+                shared_cache.set("rates", self.base, self.table, ttl=self.table['expires_at'] - time.time())
+            return self.table
+
+    def convert(self, from_currency: str, to_currency: str, amount: float) -> Dict[str, Any]:
+        """
+        Convert an amount between any two currencies using the cached base table.
+
+        Args:
+            from_currency (str): Source currency code (e.g., "USD").
+            to_currency (str): Target currency code (e.g., "EUR").
+            amount (float): Amount to convert.
+
+        Returns:
+            dict: The exchange rate, converted amount, upstream update time and cache age.
+        """
+        table = self.get_table()
+        rates = table['rates']
+        for currency in (from_currency, to_currency):
+            if currency not in rates:
+                return {"error": f"Currency '{currency}' not found"}
+
+        # A→B = (base→B) / (base→A)
+        exchange_rate = rates[to_currency] / rates[from_currency]
+        return {
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+            'exchange_rate': round(exchange_rate, 6),
+            'original_amount': amount,
+            'converted_amount': round(amount * exchange_rate, 2),
+            'time_last_update_utc': table['time_last_update_utc'],
+            'cache_age_seconds': int(time.time() - table['fetched_at']),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: Cache hits, downloads and the age of the cached table.
+        """
+        return {
+            'hits': self.hits,
+            'downloads': self.downloads,
+            'cache_age_seconds': int(time.time() - self.table['fetched_at']) if self.table else None,
+        }
+
+
+exchange_rates = ExchangeRateCache()
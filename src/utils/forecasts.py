@@ -0,0 +1,135 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from src.constants import FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL_SECONDS
+from src.utils.cache import LRUCache, SingleFlight
+from src.utils.http import http_get, parse_json
+from src.utils.shared_cache import shared_cache
+from src.utils.utils import get_env_variable
+
+
+class ForecastSlot(NamedTuple):
+    temp: float
+    feels_like: float
+    temp_min: float
+    temp_max: float
+    weather: str
+    humidity: int
+    wind_speed: float
+
+
+class CompactForecast:
+    """
+    A pre-parsed 5-day/3-hour forecast, stored as parallel lists sorted by timestamp
+    so any date window can be answered with two binary searches.
+    """
+    __slots__ = ('timestamps', 'slots')
+
+    def __init__(self, forecast_list: List[Dict[str, Any]]):
+        entries = sorted(forecast_list, key=lambda forecast: forecast['dt'])
+        self.timestamps = [forecast['dt'] for forecast in entries]
+        self.slots = [
+            ForecastSlot(
+                temp=forecast['main']['temp'],
+                feels_like=forecast['main']['feels_like'],
+                temp_min=forecast['main']['temp_min'],
+                temp_max=forecast['main']['temp_max'],
+                weather=forecast['weather'][0]['description'],
+                humidity=forecast['main']['humidity'],
+                wind_speed=forecast['wind']['speed'],
+            )
+            for forecast in entries
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: The forecast as JSON-serializable parallel lists, for the shared cache.
+        """
+        return {'timestamps': self.timestamps, 'slots': [list(slot) for slot in self.slots]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactForecast":
+        """
+        Rebuild a forecast from to_dict()'s output.
+        """
+        forecast = cls.__new__(cls)
+        forecast.timestamps = data['timestamps']
+        forecast.slots = [ForecastSlot(*slot) for slot in data['slots']]
+        return forecast
+
+    def window(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Return the forecast slots between two datetimes (inclusive) in the tool's output format,
+        as flat records so the tool result sent back to Gemini stays small.
+
+        Args:
+            start (datetime): The start of the window.
+            end (datetime): The end of the window.
+
+        Returns:
+            list: The forecast entries within the window.
+        """
+        first = bisect_left(self.timestamps, start.timestamp())
+        last = bisect_right(self.timestamps, end.timestamp())
+        return [
+            {'date': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M'), **slot._asdict()}
+            for timestamp, slot in zip(self.timestamps[first:last], self.slots[first:last])
+        ]
+
+
+class ForecastCache:
+    """
+    Caches OpenWeather forecasts per coordinate for as long as OpenWeather keeps the forecast unchanged.
+    With an out-of-process shared cache, forecasts downloaded by other workers are reused.
+    """
+
+    def __init__(self, maxsize: int = FORECAST_CACHE_SIZE, ttl: float = FORECAST_CACHE_TTL_SECONDS):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._flights = SingleFlight()  # Concurrent downloads of the same forecast go out once
+
+    def get(self, lat: float, lon: float) -> CompactForecast:
+        """
+        Return the forecast of a coordinate, downloading it only when it isn't cached.
+
+        Args:
+            lat (float): Latitude.
+            lon (float): Longitude.
+
+        Returns:
+            CompactForecast: The pre-parsed forecast.
+        """
+        key = (round(lat, 2), round(lon, 2))  # ~1 km, finer than the forecast grid
+        forecast = self.cache.get(key)
+        if forecast is None:
+            forecast = self._flights.do(key, lambda: self._download(key, lat, lon))
+        return forecast
+
+    def _download(self, key: Tuple[float, float], lat: float, lon: float) -> CompactForecast:
+        forecast = self.cache.get(key)  # Another caller may have just downloaded it
+        if forecast is None and shared_cache.cross_process:
+            data = shared_cache.get("forecast", f"{key[0]},{key[1]}")
+            if data is not None:
+                forecast = CompactForecast.from_dict(data)
+                self.cache.set(key, forecast)
+        if forecast is None:
+            weather_url = "http://api.openweathermap.org/data/2.5/forecast"
+            weather_params = {
+                'lat': lat,
+                'lon': lon,
+                'appid': get_env_variable('OPENWEATHER_API_KEY'),
+                'units': 'metric'
+            }
+            weather_data = parse_json(http_get("openweather", weather_url, params=weather_params))
+            forecast = CompactForecast(weather_data['list'])
+            self.cache.set(key, forecast)
+            if shared_cache.cross_process:
+                shared_cache.set("forecast", f"{key[0]},{key[1]}", forecast.to_dict(), ttl=self.cache.ttl)
+        return forecast
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+forecasts = ForecastCache()
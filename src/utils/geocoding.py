@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from src.constants import GEOCODE_CACHE_SIZE, GEOCODE_DB_PATH
+from src.utils.cache import LRUCache, SingleFlight
+from src.utils.http import http_get, parse_json
+from src.utils.shared_cache import shared_cache
+from src.utils.utils import get_env_variable
+
+
+def normalize_destination(destination: str) -> str:
+    """
+    Normalize a destination string so that "Paris, France", " paris ,france" and "PARIS,  FRANCE." share one key.
+
+    Args:
+        destination (str): The destination as written by the user or the model.
+
+    Returns:
+        str: The normalized destination key.
+    """
+    normalized = unicodedata.normalize("NFKC", destination).casefold()
+    normalized = re.sub(r"\s*,\s*", ", ", normalized)
+    normalized = re.sub(r"\s+", " ", normalized)
+    return normalized.strip(" .;:!?,")
+
+
+class Geocoder:
+    """
+    Resolves destination names to coordinates through the OpenWeather geocoding API.
+    Results are kept in a bounded in-memory LRU backed by an SQLite store, so a destination
+    is only looked up over the network once, even across restarts. With an out-of-process shared cache,
+    destinations resolved by other workers are found there before the store.
+    """
+
+    def __init__(self, db_path: Optional[str] = GEOCODE_DB_PATH, maxsize: int = GEOCODE_CACHE_SIZE):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.db_path = db_path
+        self.disk_hits = 0
+        self.network_lookups = 0
+        self._flights = SingleFlight()  # Concurrent lookups of the same destination go out once
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """
+        Lazily open the SQLite store, so importing this module never touches the disk.
+
+        Returns:
+            Optional[sqlite3.Connection]: The connection, or None if persistence is disabled or unavailable.
+        """
+        if self._connection is None and self.db_path:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS geocodes (key TEXT PRIMARY KEY, data TEXT NOT NULL, created_at REAL)"
+                )
+                self._connection.commit()
+            except sqlite3.Error:
+                self.db_path = None  # Fall back to the in-memory cache only
+                self._connection = None
+        return self._connection
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute("SELECT data FROM geocodes WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, key: str, location: Dict[str, Any]) -> None:
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return
+            db.execute("INSERT OR REPLACE INTO geocodes (key, data, created_at) VALUES (?, ?, ?)",
+                       (key, json.dumps(location), time.time()))
+            db.commit()
+
+    def _fetch(self, destination: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a destination through the OpenWeather direct geocoding API.
+
+        Returns:
+            Optional[dict]: The location with 'name', 'country', 'lat' and 'lon', or None if it was not found.
+        """
+        self.network_lookups += 1
+        geocoding_url = "http://api.openweathermap.org/geo/1.0/direct"
+        geocoding_params = {
+            'q': destination,
+            'limit': 1,
+            'appid': get_env_variable('OPENWEATHER_API_KEY')
+        }
+        geo_data = parse_json(http_get("openweather", geocoding_url, params=geocoding_params))
+        if not geo_data:
+            return None
+
+        return {
+            'name': geo_data[0].get('name', destination),
+            'country': geo_data[0].get('country', ''),
+            'lat': geo_data[0]['lat'],
+            'lon': geo_data[0]['lon'],
+        }
+
+    def geocode(self, destination: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a destination to coordinates, checking memory, then disk, then the network.
+
+        Args:
+            destination (str): The destination city/country (e.g., "Paris, France").
+
+        Returns:
+            Optional[dict]: The location with 'name', 'country', 'lat' and 'lon', or None if it was not found.
+        """
+        key = normalize_destination(destination)
+        location = self.memory.get(key)
+        if location is not None:
+            return location
+        return self._flights.do(key, lambda: self._resolve(key, destination))
+
+    def _resolve(self, key: str, destination: str) -> Optional[Dict[str, Any]]:
+        location = shared_cache.get("geocode", key) if shared_cache.cross_process else None
+        if location is None:
+            location = self._load(key)
+            if location is not None:
+                self.disk_hits += 1
+            else:
+                location = self._fetch(destination)
+                if location is None:
+                    return None
+                self._store(key, location)
+            if shared_cache.cross_process:
+                shared_cache.set("geocode", key, location)
+
+        self.memory.set(key, location)
+        return location
+
+    def alias(self, destination: str, location: Dict[str, Any]) -> None:
+        """
+        Remember a location under another spelling of its destination (e.g. "Paris" for "Paris, France")
+        in memory, unless that spelling is already resolved.
+        """
+        key = normalize_destination(destination)
+        if key not in self.memory:
+            self.memory.set(key, location)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: Memory cache counters plus disk hits and network lookups.
+        """
+        return {**self.memory.stats(), 'disk_hits': self.disk_hits, 'network_lookups': self.network_lookups}
+
+
+geocoder = Geocoder()
@@ -0,0 +1,184 @@
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # Optional, the standard json module is used without it
+    orjson = None
+
+from src.constants import HTTP_TIMEOUTS, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_POOL_SIZE, \
+    CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS
+from src.utils.scheduler import upstream_slot
+from src.utils.tracing import tracer
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised without touching the network while an upstream's circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after a number of consecutive failed requests to an upstream and fails fast until a cool-down
+    has passed, after which a single trial request is let through.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_BREAKER_THRESHOLD, reset_seconds: float = CIRCUIT_BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        """
+        Returns:
+            bool: True if a request may be sent to the upstream.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Half-open: let one trial request through and re-arm the timer for everyone else
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+_sessions: Dict[str, requests.Session] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Return the shared keep-alive session for the host of a URL, creating its connection pool on first use.
+
+    Args:
+        url (str): Any URL on the host.
+
+    Returns:
+        requests.Session: The pooled session for that host.
+    """
+    host = urlsplit(url).netloc
+    with _registry_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def get_breaker(api: str) -> CircuitBreaker:
+    """
+    Return the circuit breaker of an upstream API, creating it on first use.
+    """
+    with _registry_lock:
+        return _breakers.setdefault(api, CircuitBreaker())
+
+
+def http_get(api: str, url: str, params: Optional[Dict[str, Any]] = None,
+             timeout: Optional[Union[float, Tuple[float, float]]] = None) -> requests.Response:
+    """
+    Send a GET request through the pooled session of the URL's host, with the API's timeout,
+    bounded retries with jittered exponential backoff, a per-API circuit breaker, and every attempt
+    held to the API's concurrency and rate limits.
+
+    Args:
+        api (str): The upstream name, a key of HTTP_TIMEOUTS (e.g., "openweather").
+        url (str): The URL to request.
+        params (dict, optional): Query parameters.
+        timeout (optional): Overrides the API's default (connect, read) timeout.
+
+    Returns:
+        requests.Response: The response of the last attempt.
+
+    Raises:
+        CircuitOpenError: If the upstream's circuit breaker is open.
+        requests.exceptions.RequestException: If every attempt failed.
+    """
+    breaker = get_breaker(api)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{api} is temporarily unavailable")
+
+    session = get_session(url)
+    timeout = timeout if timeout is not None else HTTP_TIMEOUTS.get(api, HTTP_TIMEOUTS['default'])
+
+    with tracer.span(f"http.{api}") as span:
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            span['attempts'] = attempt + 1
+            try:
+                with upstream_slot(api):  # The API's concurrency and rate limits
+                    response = session.get(url, params=params, timeout=timeout)
+                span['status'] = response.status_code
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                error: requests.exceptions.RequestException = requests.exceptions.HTTPError(
+                    f"{api} returned HTTP {response.status_code}", response=response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+
+            if attempt < HTTP_MAX_RETRIES:
+                # Full jitter, so concurrent callers don't retry in lockstep
+                time.sleep(random.uniform(0, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+        breaker.record_failure()
+        raise error
+
+
+def parse_json(response: requests.Response) -> Any:
+    """
+    Decode a response's JSON body straight from its raw bytes, with orjson when it is installed.
+    This skips requests' charset detection and text decoding, and orjson parses several times faster.
+
+    Args:
+        response (requests.Response): The response to decode.
+
+    Returns:
+        Any: The decoded body.
+    """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return json.loads(response.content)
+
+
+def get_http_stats() -> Dict[str, Any]:
+    """
+    Returns:
+        dict: The pooled hosts and the circuit breaker state of every upstream API.
+    """
+    return {
+        'hosts': sorted(_sessions),
+        'breakers': {api: {'state': breaker.state, 'failures': breaker.failures} for api, breaker in _breakers.items()},
+    }
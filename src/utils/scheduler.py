@@ -0,0 +1,346 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, Iterator, Optional
+
+from src.constants import UPSTREAM_LIMITS, UPSTREAM_MAX_WAIT_SECONDS, MAX_CONCURRENT_TURNS, MAX_QUEUED_TURNS, \
+    LOAD_SHED_QUEUE_DEPTH
+from src.utils.tracing import tracer
+
+
+class SchedulerBusyError(Exception):
+    """
+    Raised when a turn can't even be queued because the admission queue is full.
+    """
+
+
+class UpstreamBusyError(SchedulerBusyError):
+    """
+    Raised when an upstream's rate limit would hold a request longer than its maximum wait.
+    """
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Callers reserve a token and wait until it is due, so bursts are smoothed
+    to the configured rate while up to `burst` requests go through immediately. Tokens are lent at most
+    `max_wait` seconds ahead, so a burst can't queue up waits longer than the requests' own timeouts.
+    """
+
+    def __init__(self, rate: float, burst: float, max_wait: float = UPSTREAM_MAX_WAIT_SECONDS):
+        self.rate = rate  # Tokens per second
+        self.burst = burst
+        self.max_wait = max_wait
+        self.rejected = 0
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, possibly one that is only refilled in the future.
+
+        Returns:
+            float: Seconds to wait before the token may be used, at most `max_wait`.
+
+        Raises:
+            UpstreamBusyError: If the token is due later than `max_wait` from now; no token is taken.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > self.max_wait:
+                self.rejected += 1
+                raise UpstreamBusyError(f"Rate limited for the next {wait:.1f}s")
+            self.tokens -= 1
+            return wait
+
+
+class _Waiter:
+    """
+    A queued acquirer of a HybridSemaphore, either a thread (event) or a coroutine (future on its loop).
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class HybridSemaphore:
+    """
+    A FIFO counting semaphore shared by threads (the tools' blocking HTTP calls) and coroutines on any event
+    loop (the Gemini streams), so one limit covers every caller of an upstream.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, waiter: _Waiter) -> bool:
+        with self._lock:
+            if self.value > 0 and not self._waiters:
+                self.value -= 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def acquire(self) -> None:
+        waiter = _Waiter()
+        if not self._try_acquire(waiter):
+            waiter.event.wait()
+
+    async def acquire_async(self) -> None:
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._try_acquire(waiter):
+            return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    granted = True
+                else:
+                    granted = False
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release()  # Pass on the slot granted while the caller was being cancelled
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().grant()  # Hand the slot over directly, keeping FIFO order
+            else:
+                self.value += 1
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class UpstreamLimiter:
+    """
+    Concurrency limit and token-bucket rate limit of one upstream (an API or a Gemini model),
+    matched to its quota.
+    """
+
+    def __init__(self, name: str, concurrency: int, rate_per_second: float, burst: float):
+        self.name = name
+        self.slots = HybridSemaphore(concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.in_flight = 0
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Hold a request slot from a thread, waiting for a rate token and a free slot first.
+        """
+        started = time.perf_counter()
+        time.sleep(self.bucket.reserve())
+        self.slots.acquire()
+        self._record_wait(started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[None]:
+        """
+        Hold a request slot from a coroutine, waiting for a rate token and a free slot first.
+        """
+        started = time.perf_counter()
+        await asyncio.sleep(self.bucket.reserve())
+        await self.slots.acquire_async()
+        self._record_wait(started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+
+    def _record_wait(self, started: float) -> None:
+        waited = time.perf_counter() - started
+        if waited >= 0.001:
+            tracer.record(f"limiter.{self.name}", waited)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'in_flight': self.in_flight, 'waiting': self.slots.waiting, 'rate_limited': self.bucket.rejected}
+
+
+_limiters: Dict[str, Optional[UpstreamLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    """
+    Returns:
+        int: The number of app workers sharing the upstream quotas, set by `python -m src.serve`.
+    """
+    return max(1, int(os.environ.get("TRAVEL_WORKERS", "1")))
+
+
+def get_limiter(upstream: str) -> Optional[UpstreamLimiter]:
+    """
+    Return the limiter of an upstream configured in UPSTREAM_LIMITS, or None if it is unlimited.
+    The quotas are per API key, so each of several workers gets an equal share of them. Every worker keeps at
+    least one concurrent slot and one burst token, so with more workers than an upstream's concurrency
+    (e.g. 12 workers and the verifier's 8) the workers together may exceed that concurrency quota;
+    `python -m src.serve` warns about it. The rate is always split exactly.
+    """
+    with _limiters_lock:
+        if upstream not in _limiters:
+            limits = UPSTREAM_LIMITS.get(upstream)
+            if limits:
+                workers = worker_count()
+                _limiters[upstream] = UpstreamLimiter(
+                    upstream, concurrency=max(1, limits['concurrency'] // workers),
+                    rate_per_second=limits['rate_per_second'] / workers, burst=max(1, limits['burst'] / workers))
+            else:
+                _limiters[upstream] = None
+        return _limiters[upstream]
+
+
+@contextmanager
+def upstream_slot(upstream: str) -> Iterator[None]:
+    """
+    Hold a request slot of an upstream from a thread; a no-op for unlimited upstreams.
+    """
+    limiter = get_limiter(upstream)
+    if limiter is None:
+        yield
+        return
+    with limiter.slot():
+        yield
+
+
+@asynccontextmanager
+async def async_upstream_slot(upstream: str) -> AsyncIterator[None]:
+    """
+    Hold a request slot of an upstream from a coroutine; a no-op for unlimited upstreams.
+    """
+    limiter = get_limiter(upstream)
+    if limiter is None:
+        yield
+        return
+    async with limiter.async_slot():
+        yield
+
+
+class TurnScheduler:
+    """
+    Admits chat turns up to a global concurrency limit. Waiting turns are queued per session and admitted
+    round-robin across sessions, so one user sending many messages can't starve the others, and the queue
+    depth tells the agent when to shed optional work such as verification.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_TURNS, max_queued: int = MAX_QUEUED_TURNS,
+                 shed_queue_depth: int = LOAD_SHED_QUEUE_DEPTH):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.shed_queue_depth = shed_queue_depth
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self._queues: "OrderedDict[Hashable, Deque[_Waiter]]" = OrderedDict()  # Session -> its waiting turns
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def turn(self, session_id: Optional[str]) -> AsyncIterator[None]:
+        """
+        Hold one of the concurrent turn slots, waiting for the session's round-robin turn if they're all taken.
+
+        Args:
+            session_id (Optional[str]): The session the turn belongs to.
+
+        Raises:
+            SchedulerBusyError: If the queue is full.
+        """
+        started = time.perf_counter()
+        waiter = None
+        with self._lock:
+            if self.in_flight < self.max_concurrent and not self.queued:
+                self.in_flight += 1
+            elif self.queued >= self.max_queued:
+                self.rejected += 1
+                raise SchedulerBusyError("Too many chats are waiting")
+            else:
+                waiter = _Waiter(asyncio.get_running_loop())
+                self._queues.setdefault(session_id, deque()).append(waiter)
+                self.queued += 1
+
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = waiter.granted
+                    if not granted:
+                        self._remove(session_id, waiter)
+                if granted:
+                    self._release()
+                raise
+            tracer.record("turn.queue_wait", time.perf_counter() - started, session_id=session_id)
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _remove(self, session_id: Optional[str], waiter: _Waiter) -> None:
+        queue = self._queues[session_id]
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            del self._queues[session_id]
+
+    def _release(self) -> None:
+        with self._lock:
+            if not self._queues:
+                self.in_flight -= 1
+                return
+            # Admit the first turn of the next session in rotation, then move that session to the back
+            session_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            waiter.grant()
+
+    def overloaded(self) -> bool:
+        """
+        Returns:
+            bool: True if enough turns are waiting that optional work should be shed.
+        """
+        return self.queued >= self.shed_queue_depth
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'rejected': self.rejected,
+            'upstreams': {name: limiter.stats() for name, limiter in _limiters.items() if limiter is not None},
+        }
+
+
+turn_scheduler = TurnScheduler()
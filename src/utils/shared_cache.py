@@ -0,0 +1,206 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+try:
+    import redis
+except ImportError:  # Optional, only needed for the redis backend
+    redis = None
+
+from src.constants import SHARED_CACHE_BACKEND, SHARED_CACHE_PATH, SHARED_CACHE_URL, SHARED_CACHE_SIZE, \
+    SHARED_CACHE_KEY_PREFIX, CIRCUIT_BREAKER_RESET_SECONDS
+from src.utils.cache import LRUCache
+from src.utils.utils import get_env_variable
+
+SHARED_CACHE_BACKENDS = ("memory", "sqlite", "redis")
+PURGE_EVERY_SETS = 1000
+
+
+class MemoryBackend:
+    """
+    Process-local backend: values are shared by the sessions of one worker only.
+    """
+    cross_process = False
+
+    def __init__(self, maxsize: int = SHARED_CACHE_SIZE):
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Any:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self.cache.set(key, value, ttl=ttl)
+
+
+class SQLiteBackend:
+    """
+    A SQLite file shared by the workers of one host, in WAL mode so readers don't block the writer.
+    It also stands in for Redis in local multi-worker runs. Values are stored as JSON.
+    """
+    cross_process = True
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self.sets = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        """
+        Lazily open the database, so importing this module (or forking a worker) never touches the disk.
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=1, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._db().execute("SELECT data, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        data = json.dumps(value, default=str)
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO entries (key, data, expires_at) VALUES (?, ?, ?)",
+                       (key, data, expires_at))
+            self.sets += 1
+            if self.sets % PURGE_EVERY_SETS == 0:
+                db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+
+
+class RedisBackend:
+    """
+    A Redis (or Redis-compatible, e.g. Valkey, KeyDB) server shared by workers on any number of hosts,
+    with TTLs enforced by the server. Values are stored as JSON.
+    """
+    cross_process = True
+
+    def __init__(self, url: str = SHARED_CACHE_URL):
+        if redis is None:
+            raise ImportError("The redis shared cache backend needs the 'redis' package: pip install redis")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def get(self, key: str) -> Any:
+        data = self.client.get(key)
+        return json.loads(data) if data is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self.client.set(key, json.dumps(value, default=str), px=int(ttl * 1000) if ttl is not None else None)
+
+
+class SharedCache:
+    """
+    The cache tier shared by the app workers, in front of the upstream APIs and behind each worker's own
+    caches: tool results, geocodes, exchange rate tables, forecasts and verdicts. Keys are namespaced per kind
+    of value, and values must be JSON-serializable for the out-of-process backends.
+    The cache is best effort: a backend error counts as a miss and the backend is skipped for a cool-down,
+    so an unreachable cache server slows no turn down.
+    """
+
+    def __init__(self, backend: Any, prefix: str = SHARED_CACHE_KEY_PREFIX,
+                 reset_seconds: float = CIRCUIT_BREAKER_RESET_SECONDS):
+        self.backend = backend
+        self.prefix = prefix
+        self.reset_seconds = reset_seconds
+        self.counts = Counter()  # (namespace, hit|miss|set|error)
+        self._failed_at: Optional[float] = None
+
+    @property
+    def cross_process(self) -> bool:
+        """
+        True if the values are shared with other worker processes, not only within this one.
+        """
+        return self.backend.cross_process
+
+    def _available(self) -> bool:
+        return self._failed_at is None or time.monotonic() - self._failed_at >= self.reset_seconds
+
+    def get(self, namespace: str, key: str) -> Any:
+        """
+        Args:
+            namespace (str): The kind of value (e.g. "tool", "geocode").
+            key (str): The value's key within the namespace.
+
+        Returns:
+            Any: The cached value, or None if it is missing, expired or the backend is unavailable.
+        """
+        if not self._available():
+            self.counts[(namespace, "error")] += 1
+            return None
+        try:
+            value = self.backend.get(f"{self.prefix}{namespace}:{key}")
+        except Exception:
+            self._failed_at = time.monotonic()
+            self.counts[(namespace, "error")] += 1
+            return None
+        self._failed_at = None
+        self.counts[(namespace, "hit" if value is not None else "miss")] += 1
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            namespace (str): The kind of value (e.g. "tool", "geocode").
+            key (str): The value's key within the namespace.
+            value (Any): The value, JSON-serializable.
+            ttl (Optional[float]): Seconds the value stays valid, None means it never expires.
+        """
+        if not self._available():
+            return
+        try:
+            self.backend.set(f"{self.prefix}{namespace}:{key}", value, ttl)
+        except Exception:
+            self._failed_at = time.monotonic()
+            self.counts[(namespace, "error")] += 1
+            return
+        self.counts[(namespace, "set")] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: The backend's name and the hit/miss/set/error counters by namespace.
+        """
+        stats: Dict[str, Any] = {'backend': type(self.backend).__name__}
+        for (namespace, result), count in self.counts.items():
+            stats.setdefault(namespace, {})[result] = count
+        return stats
+
+
+def create_shared_cache(backend: str, url: Optional[str] = None) -> SharedCache:
+    """
+    Args:
+        backend (str): One of SHARED_CACHE_BACKENDS.
+        url (Optional[str]): The SQLite file path or Redis URL, the configured default if omitted.
+
+    Returns:
+        SharedCache: The shared cache on that backend.
+    """
+    if backend == "memory":
+        return SharedCache(MemoryBackend())
+    if backend == "sqlite":
+        return SharedCache(SQLiteBackend(url or SHARED_CACHE_PATH))
+    if backend == "redis":
+        return SharedCache(RedisBackend(url or SHARED_CACHE_URL))
+    raise ValueError(f"Unknown shared cache backend '{backend}'. Must be one of: {', '.join(SHARED_CACHE_BACKENDS)}")
+
+
+shared_cache = create_shared_cache(get_env_variable("SHARED_CACHE_BACKEND", default=SHARED_CACHE_BACKEND),
+                                   get_env_variable("SHARED_CACHE_URL", default=None))
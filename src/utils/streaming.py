@@ -0,0 +1,78 @@
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, List, Optional
+
+from src.constants import STREAM_FRAME_INTERVAL_SECONDS, STREAM_FRAME_MIN_CHARS
+
+
+def _last_response(chatbot: List[List[str]]) -> str:
+    return (chatbot[-1][1] or "") if chatbot else ""
+
+
+async def coalesce_frames(stream: AsyncIterator[List[List[str]]], interval: float = STREAM_FRAME_INTERVAL_SECONDS,
+                          min_chars: int = STREAM_FRAME_MIN_CHARS) -> AsyncGenerator[List[List[str]], None]:
+    """
+    Merge the chatbot updates of a streamed turn into fewer frames.
+    Every frame Gradio receives is post-processed and diffed against the previous one over the whole history,
+    so instead of one frame per model chunk, a frame is sent when at least `min_chars` of new text are
+    waiting or `interval` seconds have passed since the previous frame. The first text of a response,
+    a replaced response (e.g. a correction) and the final state are always sent right away.
+
+    Args:
+        stream (AsyncIterator): The chatbot updates, e.g. from achat_with_agent.
+        interval (float): Longest time, in seconds, new text waits before it is sent. 0 disables coalescing.
+        min_chars (int): Amount of new text that is sent without waiting for the interval.
+
+    Yields:
+        List[List[str]]: The chatbot history, at most once per interval unless enough text is waiting.
+    """
+    if interval <= 0:
+        async for chatbot in stream:
+            yield chatbot
+        return
+
+    loop = asyncio.get_running_loop()
+    iterator = stream.__aiter__()
+    next_update: Optional[asyncio.Future] = None
+    pending: Optional[List[List[str]]] = None  # The newest update not sent yet
+    sent_response: Optional[str] = None
+    sent_at = loop.time()
+    try:
+        while True:
+            if next_update is None:
+                next_update = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if pending is None else max(0.0, sent_at + interval - loop.time())
+            done, _ = await asyncio.wait({next_update}, timeout=timeout)
+            if not done:
+                # The interval ran out while text was waiting
+                sent_response, sent_at = _last_response(pending), loop.time()
+                yield pending
+                pending = None
+                continue
+
+            update, next_update = next_update, None
+            try:
+                chatbot = update.result()
+            except StopAsyncIteration:
+                break
+
+            response = _last_response(chatbot)
+            if response == sent_response:
+                continue
+            if (not sent_response or not response.startswith(sent_response)
+                    or len(response) - len(sent_response) >= min_chars or loop.time() - sent_at >= interval):
+                sent_response, sent_at = response, loop.time()
+                pending = None
+                yield chatbot
+            else:
+                pending = chatbot
+
+        if pending is not None:
+            yield pending
+    finally:
+        if next_update is not None:
+            # The stream can't be closed while its pending step still runs, so let the cancellation land first
+            next_update.cancel()
+            await asyncio.gather(next_update, return_exceptions=True)
+        if hasattr(iterator, 'aclose'):
+            await iterator.aclose()
+
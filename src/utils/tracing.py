@@ -0,0 +1,296 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from bisect import bisect_left
+from collections import deque, Counter
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from src.constants import TRACE_BUCKETS, TRACE_RESERVOIR_SIZE, TRACE_QUANTILES, TRACE_EXPORT_QUEUE_SIZE, \
+    MODEL_PRICES_PER_MILLION_TOKENS
+
+_current = threading.local()  # The trace id of the turn a worker thread is serving
+
+
+def token_cost(tokens: Dict[str, Dict[str, int]]) -> float:
+    """
+    Args:
+        tokens (dict): Token counts by model and kind.
+
+    Returns:
+        float: Their cost in USD at MODEL_PRICES_PER_MILLION_TOKENS, models without a price counting as free.
+    """
+    cost = 0.0
+    for model, counts in tokens.items():
+        prices = MODEL_PRICES_PER_MILLION_TOKENS.get(model)
+        if prices is None:
+            continue
+        uncached_prompt = counts.get('prompt', 0) - counts.get('cached', 0)
+        cost += (uncached_prompt * prices['prompt'] + counts.get('cached', 0) * prices['cached']
+                 + counts.get('candidates', 0) * prices['candidates']
+                 + counts.get('thoughts', 0) * prices['thoughts']) / 1_000_000
+    return cost
+
+
+def tokens_by_model(counts: Dict[Tuple[str, str], int]) -> Dict[str, Dict[str, int]]:
+    """
+    Args:
+        counts (dict): Token counts by (model, kind), e.g. of a watched trace.
+
+    Returns:
+        dict: The same counts by model and kind.
+    """
+    tokens: Dict[str, Dict[str, int]] = {}
+    for (model, kind), count in counts.items():
+        tokens.setdefault(model, {})[kind] = count
+    return tokens
+
+
+def set_current_trace(trace_id: Optional[str]) -> None:
+    """
+    Attach a worker thread to a turn's trace, so spans recorded in it (e.g. HTTP calls) are linked to the turn.
+    """
+    _current.trace_id = trace_id
+
+
+def get_current_trace() -> Optional[str]:
+    return getattr(_current, 'trace_id', None)
+
+
+class Histogram:
+    """
+    A Prometheus-style cumulative histogram, plus a reservoir of the most recent samples for p50/p95/p99.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = TRACE_BUCKETS, reservoir_size: int = TRACE_RESERVOIR_SIZE):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns:
+            float: The q-quantile of the recent samples, 0 if there are none.
+        """
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> Dict[str, float]:
+        return {'count': self.count, **{f"p{int(q * 100)}": round(self.quantile(q), 4) for q in TRACE_QUANTILES}}
+
+
+class Tracer:
+    """
+    Collects span durations and token counts into in-memory histograms and counters, exposes them in the
+    Prometheus text format, and optionally appends every span to a JSONL trace file.
+    Spans are written to the file by a background thread, so recording one never waits for the disk.
+    """
+
+    def __init__(self, export_path: Optional[str] = None, export_queue_size: int = TRACE_EXPORT_QUEUE_SIZE):
+        self.export_path = export_path
+        self.export_dropped = 0  # Spans not written because the writer fell behind
+        self._export_queue: queue.Queue = queue.Queue(maxsize=export_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self.histograms: Dict[str, Histogram] = {}
+        self.token_counts: Dict[Tuple[str, str], int] = {}  # (model, kind) -> tokens
+        self.trace_tokens: Dict[str, Dict[Tuple[str, str], int]] = {}  # Token counts of the watched traces
+        self._watchers = Counter()  # Watchers of each watched trace, e.g. a turn and the batch that runs it
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float, trace_id: Optional[str] = None, **attributes: Any) -> None:
+        """
+        Record a finished span.
+
+        Args:
+            name (str): The span name, e.g. "tool.get_currency_exchange".
+            duration (float): The span duration in seconds.
+            trace_id (Optional[str]): The turn the span belongs to, defaults to the current thread's trace.
+            **attributes: Extra attributes written to the JSONL trace.
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(duration)
+
+        if self.export_path:
+            self._export({
+                'trace_id': trace_id or get_current_trace(),
+                'span': name,
+                'end': round(time.time(), 6),
+                'duration': round(duration, 6),
+                **attributes,
+            })
+
+    def _export(self, record: Dict[str, Any]) -> None:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_exports, name="trace-export", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+        try:
+            self._export_queue.put_nowait(record)
+        except queue.Full:
+            self.export_dropped += 1
+
+    def _write_exports(self) -> None:
+        """
+        Append the queued spans to the trace file, in batches of whatever queued up during the previous write,
+        keeping the file open between batches.
+        """
+        path, file = None, None
+        while True:
+            batch = [self._export_queue.get()]
+            while True:
+                try:
+                    batch.append(self._export_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if path != self.export_path:
+                    if file is not None:
+                        file.close()
+                    path = self.export_path
+                    file = open(path, "a", encoding="utf-8") if path else None
+                if file is not None:
+                    file.write("".join(json.dumps(record, default=str) + "\n" for record in batch))
+                    file.flush()
+            except OSError:
+                path, file = None, None  # Retry opening the file with the next batch
+                self.export_dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._export_queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Wait until the spans recorded so far are written to the trace file.
+        """
+        if self._writer is not None:
+            self._export_queue.join()
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block of code. The yielded dict can be filled with attributes known only at the end of the block.
+        """
+        started = time.perf_counter()
+        extra: Dict[str, Any] = {}
+        try:
+            yield extra
+        except BaseException as e:
+            extra['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, trace_id, **attributes, **extra)
+
+    def add_tokens(self, model: str, usage_metadata: Any, trace_id: Optional[str] = None) -> None:
+        """
+        Add the token counts of a Gemini response's usage metadata.
+
+        Args:
+            model (str): The model that produced the response.
+            usage_metadata (GenerateContentResponseUsageMetadata): The response's usage metadata.
+            trace_id (Optional[str]): The turn the response belongs to, counted separately if it is watched.
+        """
+        if usage_metadata is None:
+            return
+        counts = {
+            'prompt': getattr(usage_metadata, 'prompt_token_count', None),
+            'cached': getattr(usage_metadata, 'cached_content_token_count', None),
+            'candidates': getattr(usage_metadata, 'candidates_token_count', None),
+            'thoughts': getattr(usage_metadata, 'thoughts_token_count', None),
+        }
+        with self._lock:
+            for kind, count in counts.items():
+                if count:
+                    self.token_counts[(model, kind)] = self.token_counts.get((model, kind), 0) + count
+                    if trace_id in self.trace_tokens:
+                        watched = self.trace_tokens[trace_id]
+                        watched[(model, kind)] = watched.get((model, kind), 0) + count
+
+    def watch_tokens(self, trace_id: str) -> Dict[Tuple[str, str], int]:
+        """
+        Start counting the tokens of one trace, e.g. to report the cost of a single turn.
+        Every watch_tokens call must be paired with an unwatch_tokens call.
+
+        Returns:
+            dict: The trace's token counts by (model, kind), filled as its responses arrive.
+        """
+        with self._lock:
+            self._watchers[trace_id] += 1
+            return self.trace_tokens.setdefault(trace_id, {})
+
+    def unwatch_tokens(self, trace_id: str) -> None:
+        """
+        Stop counting the tokens of a trace once its last watcher is done with it.
+        """
+        with self._lock:
+            self._watchers[trace_id] -= 1
+            if self._watchers[trace_id] <= 0:
+                del self._watchers[trace_id]
+                self.trace_tokens.pop(trace_id, None)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns:
+            dict: The count and p50/p95/p99 of every span.
+        """
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def render_prometheus(self) -> str:
+        """
+        Returns:
+            str: Every histogram, quantile and token counter in the Prometheus text exposition format.
+        """
+        lines: List[str] = [
+            "# HELP travel_span_duration_seconds Duration of traced operations.",
+            "# TYPE travel_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            for name, histogram in histograms:
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'travel_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'travel_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'travel_span_duration_seconds_sum{{span="{name}"}} {histogram.sum:.6f}')
+                lines.append(f'travel_span_duration_seconds_count{{span="{name}"}} {histogram.count}')
+
+            lines.append("# HELP travel_span_duration_quantile_seconds Quantiles of recent span durations.")
+            lines.append("# TYPE travel_span_duration_quantile_seconds gauge")
+            for name, histogram in histograms:
+                for q in TRACE_QUANTILES:
+                    lines.append(f'travel_span_duration_quantile_seconds{{span="{name}",quantile="{q}"}} '
+                                 f'{histogram.quantile(q):.6f}')
+
+            lines.append("# HELP travel_tokens_total Gemini tokens by model and kind.")
+            lines.append("# TYPE travel_tokens_total counter")
+            for (model, kind), count in sorted(self.token_counts.items()):
+                lines.append(f'travel_tokens_total{{model="{model}",kind="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.token_counts.clear()
+
+
+tracer = Tracer()
@@ -1,19 +1,32 @@
+import asyncio
+import inspect
 import os
-from typing import Any, List, Dict, Generator
+import threading
+import time
+from typing import Any, List, Dict, Generator, AsyncGenerator, Optional, Callable, Awaitable
 
 import requests
 from dotenv import load_dotenv
 from google import genai
-from google.genai import Client
+from google.genai import Client, types
 from google.genai.types import GenerateContentConfig
 
+from src.constants import MAX_TOOL_ROUNDS, CHARS_PER_TOKEN
+from src.utils.http import http_get, parse_json
+from src.utils.scheduler import async_upstream_slot
+from src.utils.tracing import tracer
 
-def get_env_variable(var_name: str) -> Any:
+
+_MISSING = object()
+
+
+def get_env_variable(var_name: str, default: Any = _MISSING) -> Any:
     """
     Retrieves an environment variable and returns its value.
 
     Args:
         var_name (str): The name of the environment variable to retrieve.
+        default (Any, optional): Returned when the variable is not set. If omitted, a missing variable is an error.
 
     Returns:
         Any: The value of the environment variable.
@@ -21,10 +34,49 @@ def get_env_variable(var_name: str) -> Any:
     load_dotenv()
     value = os.getenv(var_name)
     if value is None:
+        if default is not _MISSING:
+            return default
         raise ValueError(f"Environment variable '{var_name}' not found.")
     return value
 
 
+def get_env_flag(var_name: str, default: bool) -> bool:
+    """
+    Retrieves an on/off environment variable.
+
+    Args:
+        var_name (str): The name of the environment variable to retrieve.
+        default (bool): Returned when the variable is not set.
+
+    Returns:
+        bool: True if the variable is set to "1", "true", "yes" or "on".
+    """
+    return str(get_env_variable(var_name, default=default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shorten a text to about a token budget, cutting after the last complete sentence that fits
+    (or the last word, if that would drop more than half of the budget).
+
+    Args:
+        text (str): The text to shorten.
+        max_tokens (int): The budget, in tokens of the local estimate.
+
+    Returns:
+        str: The text, ending with " …" if it was shortened.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end >= max_chars // 2:
+        return cut[:sentence_end + 1] + " …"
+    word_end = cut.rfind(" ")
+    return (cut[:word_end].rstrip(" ,;:") if word_end > 0 else cut) + " …"
+
+
 def get_all_currency_codes() -> Dict[str, Any]:
     """
     Get all supported currency codes from ExchangeRate-API.com.
@@ -35,8 +87,8 @@ def get_all_currency_codes() -> Dict[str, Any]:
     url = f"https://v6.exchangerate-api.com/v6/{get_env_variable('EXCHANGERATE_API_KEY')}/codes"
 
     try:
-        response = requests.get(url)
-        data = response.json()
+        response = http_get("exchangerate", url)
+        data = parse_json(response)
 
         if data.get("result") == "success":
             supported_codes_with_names = data["supported_codes"]
@@ -45,7 +97,7 @@ def get_all_currency_codes() -> Dict[str, Any]:
         else:
             return {"error": data.get("error-type", "Unknown error.")}
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:  # ValueError: a malformed JSON body
         return {"error": f"An error occurred during the API request: {str(e)}."}
 
 
@@ -81,21 +133,7 @@ def generate_streaming_response(client: Client, chatbot: List[List[str]], model_
 
     full_response = ""
     for chunk in response:
-        chunk_text = ""
-
-        # Handle the response structure properly
-        if hasattr(chunk, 'candidates') and chunk.candidates:
-            candidate = chunk.candidates[0]
-            if hasattr(candidate, 'content') and candidate.content:
-                if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            # Regular text content
-                            chunk_text += part.text
-
-        # Fallback for simple text responses
-        elif hasattr(chunk, 'text'):
-            chunk_text = chunk.text
+        chunk_text = extract_chunk_text(chunk)
 
         # Update response if we got new text
         if chunk_text:
@@ -103,3 +141,204 @@ def generate_streaming_response(client: Client, chatbot: List[List[str]], model_
             if chatbot:
                 chatbot[-1] = [chatbot[-1][0], full_response]
                 yield chatbot
+
+
+async def agenerate_streaming_response(client: Client, chatbot: List[List[str]], model_name: str,
+                                       config: GenerateContentConfig, contents: List[str],
+                                       tools: Optional[List[Callable[..., Awaitable[Any]]]] = None,
+                                       trace_id: Optional[str] = None) -> AsyncGenerator[List[List[str]], None]:
+    """
+    Async version of generate_streaming_response, streaming through the client's aio interface.
+    Function calls are handled explicitly rather than by the SDK, so the tool declarations can live
+    in a cached context: whenever the model asks for tools, all the calls of that model turn run
+    concurrently and their responses are sent back together, until the model answers with text only.
+    Every model request is traced with its time to first chunk and token usage.
+
+    Args:
+        client (Client): The client to use.
+        model_name (str): The name of the model to use (e.g., "gemini-2.5-flash").
+        config (dict): Configuration for the model.
+        contents (str): The contents of the conversation to pass to the model.
+        tools (list, optional): The async tools the model may call, matched by function name.
+        trace_id (Optional[str]): The trace of the turn the response belongs to.
+
+    Yields:
+        chatbot: Updated chatbot responses incrementally.
+    """
+    contents = list(contents)
+    function_map = {tool.__name__: tool for tool in tools or []}
+
+    full_response = ""
+    for round_index in range(MAX_TOOL_ROUNDS):
+        # Hold one of the model's request slots while its response streams
+        async with async_upstream_slot(model_name):
+            with tracer.span("gemini.generate", trace_id, model=model_name, round=round_index) as span:
+                started = time.perf_counter()
+                response = await client.aio.models.generate_content_stream(
+                    model=model_name,
+                    config=config,
+                    contents=contents,
+                )
+
+                model_parts = []
+                function_calls = []
+                usage_metadata = None
+                async for chunk in response:
+                    if 'ttft' not in span:
+                        span['ttft'] = round(time.perf_counter() - started, 6)
+                        tracer.record("gemini.ttft", span['ttft'], trace_id, model=model_name, round=round_index)
+                    # The last chunk carries the response's token totals
+                    usage_metadata = getattr(chunk, 'usage_metadata', None) or usage_metadata
+                    parts = get_chunk_parts(chunk)
+                    model_parts.extend(parts)
+                    function_calls.extend(part.function_call for part in parts if part.function_call)
+
+                    chunk_text = extract_chunk_text(chunk)
+                    if chunk_text:
+                        full_response += chunk_text
+                        if chatbot:
+                            chatbot[-1] = [chatbot[-1][0], full_response]
+                            yield chatbot
+
+                tracer.add_tokens(model_name, usage_metadata, trace_id)
+                span['function_calls'] = len(function_calls)
+                if usage_metadata is not None:
+                    span['prompt_tokens'] = usage_metadata.prompt_token_count
+                    span['output_tokens'] = usage_metadata.candidates_token_count
+
+        if not function_calls:
+            break
+
+        # Run independent function calls concurrently and send their responses back together, in call order
+        contents.append(types.Content(role="model", parts=model_parts))
+        response_parts = await asyncio.gather(*(call_tool(function_map, function_call)
+                                                for function_call in function_calls))
+        contents.append(types.Content(role="user", parts=list(response_parts)))
+
+
+async def call_tool(function_map: Dict[str, Callable[..., Awaitable[Any]]],
+                    function_call: types.FunctionCall) -> types.Part:
+    """
+    Run the tool a function call asks for.
+
+    Args:
+        function_map (dict): The available async tools by name.
+        function_call (FunctionCall): The model's function call.
+
+    Returns:
+        Part: The function response part, with the tool's result or the error it raised.
+    """
+    tool = function_map.get(function_call.name)
+    try:
+        if tool is None:
+            raise ValueError(f"Unknown function '{function_call.name}'.")
+        function_response = {'result': await tool(**coerce_arguments(tool, function_call.args or {}))}
+    except Exception as e:
+        function_response = {'error': str(e)}
+    return types.Part.from_function_response(name=function_call.name, response=function_response)
+
+
+def coerce_arguments(tool: Callable[..., Any], args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert the model's JSON numbers to the types the tool's signature asks for, e.g. 5.0 to 5 for an int.
+
+    Args:
+        tool (Callable): The tool being called.
+        args (dict): The function call arguments.
+
+    Returns:
+        dict: The converted arguments.
+    """
+    parameters = inspect.signature(tool).parameters
+    coerced = {}
+    for name, value in args.items():
+        annotation = parameters[name].annotation if name in parameters else None
+        if annotation is int and isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif annotation is float and isinstance(value, int):
+            value = float(value)
+        coerced[name] = value
+    return coerced
+
+
+def get_chunk_parts(chunk: Any) -> List[types.Part]:
+    """
+    Args:
+        chunk (GenerateContentResponse): A chunk of a streamed response.
+
+    Returns:
+        List[Part]: The chunk's content parts, or an empty list if it has none.
+    """
+    if getattr(chunk, 'candidates', None) and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+        return list(chunk.candidates[0].content.parts)
+    return []
+
+
+def extract_chunk_text(chunk: Any) -> str:
+    """
+    Extract the text of a streamed response chunk.
+
+    Args:
+        chunk (GenerateContentResponse): A chunk of a streamed response.
+
+    Returns:
+        str: The chunk's text, or an empty string if it has none.
+    """
+    chunk_text = ""
+
+    # Handle the response structure properly
+    if hasattr(chunk, 'candidates') and chunk.candidates:
+        candidate = chunk.candidates[0]
+        if hasattr(candidate, 'content') and candidate.content:
+            if hasattr(candidate.content, 'parts') and candidate.content.parts:
+                for part in candidate.content.parts:
+                    if hasattr(part, 'text') and part.text:
+                        # Regular text content
+                        chunk_text += part.text
+
+    # Fallback for simple text responses
+    elif hasattr(chunk, 'text'):
+        chunk_text = chunk.text or ""
+
+    return chunk_text
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return a process-wide event loop running in a daemon thread, starting it on first use.
+    It lets synchronous callers drive the async pipeline without creating a loop per call.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running background loop.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="async-bridge", daemon=True).start()
+        return _background_loop
+
+
+def iterate_async_generator(async_generator: AsyncGenerator) -> Generator:
+    """
+    Iterate an async generator from synchronous code, on the background event loop.
+
+    Args:
+        async_generator (AsyncGenerator): The async generator to drive.
+
+    Yields:
+        The items produced by the async generator.
+    """
+    loop = get_background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(async_generator.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(async_generator.aclose(), loop).result()
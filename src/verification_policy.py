@@ -0,0 +1,121 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.constants import VERIFIER_MODEL, DOWNGRADED_VERIFIER_MODEL, VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL_SECONDS, \
+    VERDICT_CONTEXT_EXCHANGES, LOW_RISK_MAX_CHARS
+from src.utils.cache import LRUCache
+from src.utils.shared_cache import shared_cache
+
+NUMBER_PATTERN = re.compile(r"\d")
+PRICE_PATTERN = re.compile(r"[$€£¥₪₹]|\b[A-Z]{3}\b|\b(?i:dollars?|euros?|pounds?|yen|shekels?|prices?|costs?|fees?)\b")
+DATE_PATTERN = re.compile(
+    r"\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?"
+    r"|nov(?:ember)?|dec(?:ember)?|monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+    r"|today|tomorrow|tonight|weekend|season)\b",
+    re.IGNORECASE,
+)
+
+
+class VerificationPolicy:
+    """
+    Decides how much verification a response needs.
+    Verdicts are cached by a hash of the last exchange and its relevant context (and shared with the other
+    workers through an out-of-process shared cache), responses with no factual signals (numbers, prices,
+    dates, tool data) are skipped or checked by a cheaper model, and every other response gets the full
+    verifier, unless the turn's route asks for a lighter verifier tier.
+    """
+
+    def __init__(self, cache_size: int = VERDICT_CACHE_SIZE, cache_ttl: float = VERDICT_CACHE_TTL_SECONDS):
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.stats = Counter()  # How often each path fired
+
+    @staticmethod
+    def cache_key(conversation: List[Tuple[str, str]]) -> str:
+        """
+        Hash the last exchange together with the exchanges right before it.
+
+        Args:
+            conversation (List[Tuple[str, str]]): The completed exchanges, the last one is verified.
+
+        Returns:
+            str: The verdict cache key.
+        """
+        relevant = conversation[-(VERDICT_CONTEXT_EXCHANGES + 1):]
+        return hashlib.sha256(json.dumps(relevant).encode()).hexdigest()
+
+    @staticmethod
+    def risk_signals(response: str, tool_calls: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """
+        Find cheap local signals that a response states facts worth verifying.
+
+        Args:
+            response (str): The assistant response.
+            tool_calls (list, optional): The tool calls made while answering.
+
+        Returns:
+            List[str]: The names of the signals found, empty for a low-risk response.
+        """
+        signals = []
+        if tool_calls:
+            signals.append("tool_grounded")
+        if NUMBER_PATTERN.search(response):
+            signals.append("numbers")
+        if PRICE_PATTERN.search(response):
+            signals.append("prices")
+        if DATE_PATTERN.search(response):
+            signals.append("dates")
+        return signals
+
+    def decide(self, conversation: List[Tuple[str, str]], tool_calls: Optional[List[Dict[str, Any]]] = None,
+               tier: str = "full") -> Dict[str, Any]:
+        """
+        Decide how to verify the last response of a conversation.
+
+        Args:
+            conversation (List[Tuple[str, str]]): The completed exchanges, the last one is verified.
+            tool_calls (list, optional): The tool calls made while answering.
+            tier (str): The verifier tier of the turn's route: "skip" never verifies, "cascade" checks risky
+                responses with the downgraded verifier first, "full" uses the full verifier for them.
+
+        Returns:
+            dict: 'action' is one of "cached", "skip" or "verify". A cached decision carries the 'verification',
+                a skip decision its 'reason', a verify decision the verifier 'model' and, when cascading, the model
+                to 'escalate_to' to confirm a flag. Every decision carries the cache 'key'.
+        """
+        key = self.cache_key(conversation)
+        if tier == "skip":
+            self.stats["skipped_route"] += 1
+            return {'action': "skip", 'key': key, 'reason': "route"}
+        cached = self.cache.get(key)
+        if cached is None and shared_cache.cross_process:
+            cached = shared_cache.get("verdict", key)
+            if cached is not None:
+                self.cache.set(key, cached)
+        if cached is not None:
+            self.stats["cache_hit"] += 1
+            return {'action': "cached", 'key': key, 'verification': cached}
+
+        response = conversation[-1][1] if conversation else ""
+        if self.risk_signals(response, tool_calls):
+            if tier == "cascade":
+                self.stats["cascaded"] += 1
+                return {'action': "verify", 'key': key, 'model': DOWNGRADED_VERIFIER_MODEL, 'escalate_to': VERIFIER_MODEL}
+            self.stats["full"] += 1
+            return {'action': "verify", 'key': key, 'model': VERIFIER_MODEL}
+        if len(response) <= LOW_RISK_MAX_CHARS:
+            self.stats["skipped_low_risk"] += 1
+            return {'action': "skip", 'key': key, 'reason': "low_risk"}
+        self.stats["downgraded"] += 1
+        return {'action': "verify", 'key': key, 'model': DOWNGRADED_VERIFIER_MODEL}
+
+    def store(self, key: str, verification: Dict[str, Any]) -> None:
+        """
+        Cache a verdict, unless the verification itself failed.
+        """
+        if not verification.get("verification_failed"):
+            self.cache.set(key, verification)
+            if shared_cache.cross_process:
+                shared_cache.set("verdict", key, verification, ttl=self.cache.ttl)
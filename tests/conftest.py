@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules read their API keys at import time, the tests never call the APIs
+for name in ("GOOGLE_API_KEY", "OPEN_TRIP_MAP_API_KEY", "OPENWEATHER_API_KEY", "EXCHANGERATE_API_KEY"):
+    os.environ.setdefault(name, "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,45 @@
+from src.utils.attractions_index import AttractionsIndex, distance_meters
+
+PARIS = (48.8566, 2.3522)
+
+
+def place(xid, kinds, rate, lat_offset=0.0, description="A place."):
+    return {'xid': xid, 'name': xid, 'lat': PARIS[0] + lat_offset, 'lon': PARIS[1], 'rate': rate, 'kinds': kinds,
+            'description': description, 'url': f"https://example.org/{xid}"}
+
+
+def make_index(tmp_path):
+    index = AttractionsIndex(path=str(tmp_path / "index.json"))
+    index.add_area("Paris", *PARIS, radius=20000, kinds={'museums': True, 'parks': False}, places=[
+        place("louvre", "museums", 7), place("orsay", "museums", 7, lat_offset=0.02),
+        place("small", "museums", 3, lat_offset=0.01), place("far", "museums", 7, lat_offset=0.15),
+        place("low", "museums", 1), place("luxembourg", "parks", 7), place("tuileries", "parks", 5),
+    ])
+    return index
+
+
+def test_distance_meters():
+    assert distance_meters(*PARIS, *PARIS) == 0
+    assert round(distance_meters(0, 0, 1, 0)) == 111195
+
+
+def test_complete_kind_is_answered_by_rating_then_distance(tmp_path):
+    index = make_index(tmp_path)
+    names = [attraction['name'] for attraction in index.query(*PARIS, "museums", radius=5000, limit=10)]
+    assert names == ["louvre", "orsay", "small"]  # "far" is outside the radius, "low" below the minimum rate
+    assert [attraction['name'] for attraction in index.query(*PARIS, "museums", radius=5000, limit=1)] == ["louvre"]
+
+
+def test_capped_kind_goes_to_the_api_even_with_enough_places(tmp_path):
+    index = make_index(tmp_path)
+    assert index.query(*PARIS, "parks", radius=5000, limit=1) is None
+    assert index.query(*PARIS, "churches", radius=5000, limit=1) is None  # Not prefetched
+    assert index.query(PARIS[0] + 0.15, PARIS[1], "museums", radius=5000, limit=1) is None  # Outside the area
+    assert index.lookups == {'misses': 3}
+
+
+def test_saved_index_is_reloaded(tmp_path):
+    make_index(tmp_path).save()
+    index = AttractionsIndex(path=str(tmp_path / "index.json"))
+    assert index.query(*PARIS, "museums", radius=1000, limit=5)[0]['name'] == "louvre"
+    assert index.stats()['places'] == 7
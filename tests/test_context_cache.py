@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.utils import context_cache
+from src.utils.context_cache import GeminiContextCache
+
+MODEL = "gemini-2.5-flash"
+
+
+def get_weather(city: str) -> dict:
+    """Get the weather of a city."""
+    return {}
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    async def create(self, model, config):
+        self.created.append(config.display_name)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def make_cache():
+    caches = FakeCaches()
+    return GeminiContextCache(SimpleNamespace(aio=SimpleNamespace(caches=caches))), caches
+
+
+def test_prompts_of_one_model_keep_their_own_contexts():
+    cache, caches = make_cache()
+
+    async def turn():
+        return [(await cache.get_config(MODEL, "travel prompt", [get_weather], prompt_name="travel")).cached_content,
+                (await cache.get_config(MODEL, "verifier prompt", prompt_name="verifier")).cached_content,
+                (await cache.get_config(MODEL, "corrector prompt", prompt_name="corrector")).cached_content]
+
+    async def main():
+        return [await turn() for _ in range(3)]
+
+    names = asyncio.run(main())
+    assert names == [["cachedContents/1", "cachedContents/2", "cachedContents/3"]] * 3
+    assert len(caches.created) == 3 and caches.deleted == []
+    assert cache.stats()['active'] == 3 and cache.hits == 6
+
+
+def test_changed_prompt_replaces_only_its_own_context_after_a_delay(monkeypatch):
+    monkeypatch.setattr(context_cache, "CONTEXT_CACHE_DELETE_DELAY_SECONDS", 0.01)
+    cache, caches = make_cache()
+
+    async def main():
+        await cache.get_config(MODEL, "travel prompt v1", [get_weather], prompt_name="travel")
+        await cache.get_config(MODEL, "verifier prompt", prompt_name="verifier")
+        new = await cache.get_config(MODEL, "travel prompt v2", [get_weather], prompt_name="travel")
+        assert caches.deleted == []  # Turns may still stream against the old context
+        assert len(cache._deletions) == 1
+        await asyncio.sleep(0.05)
+        return new.cached_content
+
+    assert asyncio.run(main()) == "cachedContents/3"
+    assert caches.deleted == ["cachedContents/1"]
+    assert cache.stats()['active'] == 2 and not cache._deletions
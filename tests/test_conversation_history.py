@@ -0,0 +1,33 @@
+from src.conversation_history import ConversationHistory
+
+
+def exchanges(history):
+    return [(message.exchange, message.role) for message in history.messages]
+
+
+def test_trims_whole_exchanges():
+    history = ConversationHistory(token_budget=100)
+    history.append_exchange("q1 " * 20, "a1 " * 20)
+    history.append_exchange("q2 " * 20, "a2 " * 100)
+    assert exchanges(history) == [(2, "user"), (2, "model")]
+    assert history.window_tokens <= 100
+    assert history.to_contents("q3")[0]['role'] == "user"
+
+
+def test_truncates_an_exchange_over_the_whole_budget():
+    history = ConversationHistory(token_budget=100)
+    history.append_exchange("q1", "a1")
+    history.append_exchange("Question. " * 100, "Answer. " * 200)
+    assert exchanges(history) == [(2, "user"), (2, "model")]
+    assert history.window_tokens <= 100
+    user, model = history.messages
+    assert user.tokens <= 50 and user.text.endswith("…")
+    assert model.text.startswith("Answer.") and model.text.endswith("…")
+
+
+def test_keeps_short_question_whole_and_gives_the_answer_the_rest():
+    history = ConversationHistory(token_budget=100)
+    history.append_exchange("Weather in Paris?", "Sunny. " * 200)
+    user, model = history.messages
+    assert user.text == "Weather in Paris?"
+    assert history.window_tokens <= 100 and model.tokens > 80
@@ -0,0 +1,76 @@
+import pytest
+
+from src.constants import EXCHANGE_RATE_STALE_RETRY_SECONDS
+from src.utils import exchange_rates as exchange_rates_module
+from src.utils.exchange_rates import ExchangeRateCache
+
+NOW = 1_700_000_000
+
+
+def table(last_update, next_update, rates=None):
+    return {
+        'result': "success",
+        'time_last_update_unix': last_update,
+        'time_last_update_utc': "Tue, 14 Nov 2023 00:00:01 +0000",
+        'time_next_update_unix': next_update,
+        'conversion_rates': rates or {"USD": 1, "EUR": 0.5, "JPY": 150},
+    }
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    A scripted ExchangeRate-API and a controllable clock.
+    """
+    state = {'now': NOW, 'responses': []}
+    monkeypatch.setattr(exchange_rates_module.time, "time", lambda: state['now'])
+    monkeypatch.setattr(exchange_rates_module, "http_get", lambda api, url: None)
+    monkeypatch.setattr(exchange_rates_module, "parse_json", lambda response: state['responses'].pop(0))
+    return state
+
+
+def test_convert_triangulates_cross_pairs_through_the_base(upstream):
+    upstream['responses'] = [table(NOW - 60, NOW + 3600)]
+    cache = ExchangeRateCache()
+    result = cache.convert("EUR", "JPY", 10)
+    assert result['exchange_rate'] == 300
+    assert result['converted_amount'] == 3000
+    assert cache.convert("JPY", "EUR", 300)['converted_amount'] == 1
+    assert cache.convert("EUR", "XXX", 1) == {"error": "Currency 'XXX' not found"}
+    assert cache.stats()['downloads'] == 1
+
+
+def test_table_is_downloaded_again_only_after_the_next_update(upstream):
+    upstream['responses'] = [table(NOW - 60, NOW + 3600), table(NOW + 3600, NOW + 90000, {"USD": 1, "EUR": 0.6})]
+    cache = ExchangeRateCache()
+    cache.get_table()
+    upstream['now'] = NOW + 3599
+    cache.get_table()
+    assert cache.downloads == 1 and cache.hits == 1
+
+    upstream['now'] = NOW + 3601
+    assert cache.get_table()['rates']['EUR'] == 0.6
+    assert cache.downloads == 2
+
+
+def test_stale_table_is_checked_again_shortly(upstream):
+    # The upstream is late: the second download still carries the old table and its past next-update time
+    upstream['responses'] = [table(NOW - 60, NOW + 3600), table(NOW - 60, NOW + 3600), table(NOW + 3700, NOW + 90000)]
+    cache = ExchangeRateCache()
+    cache.get_table()
+    upstream['now'] = NOW + 3700
+    stale = cache.get_table()
+    assert stale['expires_at'] == NOW + 3700 + EXCHANGE_RATE_STALE_RETRY_SECONDS
+
+    upstream['now'] += EXCHANGE_RATE_STALE_RETRY_SECONDS - 1
+    cache.get_table()
+    assert cache.downloads == 2
+    upstream['now'] += 1
+    assert cache.get_table()['time_last_update_unix'] == NOW + 3700
+    assert cache.downloads == 3
+
+
+def test_failed_download_raises_the_upstream_error(upstream):
+    upstream['responses'] = [{'result': "error", 'error-type': "invalid-key"}]
+    with pytest.raises(ValueError, match="invalid-key"):
+        ExchangeRateCache().get_table()
@@ -0,0 +1,104 @@
+import pytest
+import requests
+
+from src.constants import HTTP_MAX_RETRIES
+from src.utils import http
+from src.utils.http import CircuitBreaker, CircuitOpenError, http_get
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession:
+    """
+    A session that replays a script of status codes and exceptions, one per request.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    An unlimited test upstream with a fresh circuit breaker, a scripted session and no backoff sleeps.
+    """
+    sleeps = []
+    breaker = CircuitBreaker(threshold=2, reset_seconds=30)
+    session = FakeSession([])
+    monkeypatch.setattr(http, "get_session", lambda url: session)
+    monkeypatch.setattr(http, "get_breaker", lambda api: breaker)
+    monkeypatch.setattr(http.time, "sleep", sleeps.append)
+    return session, breaker, sleeps
+
+
+def test_http_get_retries_retryable_statuses_and_connection_errors(upstream):
+    session, breaker, sleeps = upstream
+    session.script = [503, requests.exceptions.ConnectionError("reset"), 200]
+    assert http_get("testapi", "https://example.com/a").status_code == 200
+    assert session.calls == 3
+    assert len(sleeps) == 2
+    assert breaker.failures == 0
+
+
+def test_http_get_returns_non_retryable_status_without_retrying(upstream):
+    session, breaker, sleeps = upstream
+    session.script = [404]
+    assert http_get("testapi", "https://example.com/a").status_code == 404
+    assert session.calls == 1 and sleeps == []
+
+
+def test_http_get_raises_last_error_after_all_attempts(upstream):
+    session, breaker, sleeps = upstream
+    session.script = [500] * (HTTP_MAX_RETRIES + 1)
+    with pytest.raises(requests.exceptions.HTTPError, match="HTTP 500"):
+        http_get("testapi", "https://example.com/a")
+    assert session.calls == HTTP_MAX_RETRIES + 1
+    assert len(sleeps) == HTTP_MAX_RETRIES  # No sleep after the last attempt
+    assert breaker.failures == 1
+
+
+def test_http_get_fails_fast_while_the_breaker_is_open(upstream):
+    session, breaker, sleeps = upstream
+    session.script = [requests.exceptions.Timeout()] * (2 * (HTTP_MAX_RETRIES + 1))
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.Timeout):
+            http_get("testapi", "https://example.com/a")
+    assert breaker.state == "open"
+    calls = session.calls
+    with pytest.raises(CircuitOpenError):
+        http_get("testapi", "https://example.com/a")
+    assert session.calls == calls
+
+
+def test_circuit_breaker_lets_one_trial_through_when_half_open(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()  # The trial request
+    assert not breaker.allow()  # Everyone else waits for another cool-down
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow()
@@ -0,0 +1,105 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from src import travel_assistant
+from src.constants import TRAVELER_MODEL, VERIFIER_MODEL, DOWNGRADED_VERIFIER_MODEL, MODEL_ROUTES
+from src.conversation_history import ConversationHistory
+from src.model_router import ModelRouter, classify
+
+FLAGGED = {"needs_correction": True, "feedback": "The forecast says 18°C."}
+PASSED = {"needs_correction": False, "feedback": ""}
+
+
+@pytest.mark.parametrize("message, route", [
+    ("Hi there!", "small_talk"),
+    ("Thanks so much", "small_talk"),
+    ("What should I pack for Oslo?", "packing_list"),
+    ("Plan a 3-day trip to Rome", "itinerary"),
+    ("Weather in Paris tomorrow?", "lookup"),
+    ("How much is 100 USD in EUR?", "lookup"),
+    ("Museums in Berlin?", "lookup"),
+    ("Compare the weather in Paris and Rome", "general"),
+    ("Tell me about the history of Japan and its culture", "general"),
+])
+def test_classify(message, route):
+    assert classify(message) == route
+
+
+def test_route_falls_back_to_general_when_disabled_or_empty():
+    assert ModelRouter().route("Hi there!").name == "small_talk"
+    assert ModelRouter().route(None).name == "general"
+    assert ModelRouter(enabled=False).route("Hi there!").name == "general"
+
+
+def test_route_config_kwargs():
+    router = ModelRouter()
+    small_talk = router.routes["small_talk"].config_kwargs()
+    assert small_talk['thinking_config'].thinking_budget == 0
+    assert small_talk['max_output_tokens'] == MODEL_ROUTES["small_talk"]["max_output_tokens"]
+    assert router.routes["general"].config_kwargs() == {}
+
+
+def test_unknown_verifier_tier_is_rejected():
+    routes = dict(MODEL_ROUTES, general=dict(MODEL_ROUTES["general"], verifier="sometimes"))
+    with pytest.raises(ValueError, match="sometimes"):
+        ModelRouter(routes=routes)
+
+
+def test_record_accounts_turns_per_route():
+    router = ModelRouter()
+    route = router.routes["lookup"]
+    router.record(route, 2.0, 0.5, {(TRAVELER_MODEL, "prompt"): 1000, (TRAVELER_MODEL, "candidates"): 100})
+    router.record(route, 4.0, None, {(TRAVELER_MODEL, "prompt"): 1000})
+    stats = router.stats()["lookup"]
+    assert stats['turns'] == 2
+    assert stats['mean_seconds'] == 3.0
+    assert stats['mean_first_chunk_seconds'] == 0.5  # Only the turn that showed a chunk
+    assert stats['tokens'] == {TRAVELER_MODEL: {"prompt": 2000, "candidates": 100}}
+    assert stats['cost_usd'] > 0
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    """
+    The conversation manager with the verifier replaced by a stub that answers per model.
+    """
+    manager = travel_assistant.conv_manager
+    verdicts, calls = {}, []
+
+    async def verify_response(history, user_msg, response, model=None, trace_id=None):
+        calls.append(model)
+        return verdicts[model]
+
+    monkeypatch.setattr(manager, "verify_response", verify_response)
+    monkeypatch.setattr(manager, "verification_stats", Counter())
+    return manager, verdicts, calls
+
+
+def run_verifier(manager, decision):
+    return asyncio.run(manager.run_verifier(ConversationHistory(), "Weather in Paris?", "30°C on Monday.", decision))
+
+
+def test_cascade_escalates_a_flag_to_the_full_verifier(verifier):
+    manager, verdicts, calls = verifier
+    verdicts.update({DOWNGRADED_VERIFIER_MODEL: FLAGGED, VERIFIER_MODEL: PASSED})
+    decision = {'model': DOWNGRADED_VERIFIER_MODEL, 'escalate_to': VERIFIER_MODEL}
+    assert run_verifier(manager, decision) == PASSED  # The flag wasn't confirmed
+    assert calls == [DOWNGRADED_VERIFIER_MODEL, VERIFIER_MODEL]
+    assert manager.verification_stats["escalated"] == 1
+
+
+def test_cascade_keeps_a_pass_of_the_cheaper_verifier(verifier):
+    manager, verdicts, calls = verifier
+    verdicts.update({DOWNGRADED_VERIFIER_MODEL: PASSED})
+    assert run_verifier(manager, {'model': DOWNGRADED_VERIFIER_MODEL, 'escalate_to': VERIFIER_MODEL}) == PASSED
+    assert calls == [DOWNGRADED_VERIFIER_MODEL]
+
+
+def test_downgraded_verifier_flag_stands_without_cascade(verifier):
+    manager, verdicts, calls = verifier
+    verdicts.update({DOWNGRADED_VERIFIER_MODEL: FLAGGED})
+    assert run_verifier(manager, {'model': DOWNGRADED_VERIFIER_MODEL}) == FLAGGED
+    assert calls == [DOWNGRADED_VERIFIER_MODEL]
+    assert manager.verification_stats["escalated"] == 0
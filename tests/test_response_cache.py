@@ -0,0 +1,55 @@
+import asyncio
+
+from src import travel_assistant
+from src.conversation_history import ConversationHistory
+from src.response_cache import ResponseCache
+from src.travel_assistant import ConversationManager
+
+QUERY = "Famous water parks near Tel Aviv?"
+
+
+def test_answer_verified_requires_a_passing_verdict_or_safe_skip():
+    assert ConversationManager.answer_verified({'verification': {"needs_correction": False, "feedback": ""}})
+    assert not ConversationManager.answer_verified({'verification': {"needs_correction": True, "feedback": "x"}})
+    assert not ConversationManager.answer_verified(
+        {'verification': {"needs_correction": False, "feedback": "", "verification_failed": True}})
+    assert ConversationManager.answer_verified({'verification_skipped': "low_risk"})
+    assert ConversationManager.answer_verified({'verification_skipped': "route"})
+    for reason in ("overloaded", "off", "sampled", "background", "empty"):
+        assert not ConversationManager.answer_verified({'verification_skipped': reason})
+
+
+def record_in_background(monkeypatch, verdict):
+    manager = travel_assistant.conv_manager
+    monkeypatch.setattr(manager, "response_cache", ResponseCache())
+
+    async def run_verifier(*args):
+        return verdict
+
+    monkeypatch.setattr(manager, "run_verifier", run_verifier)
+    decision = {'action': "verify", 'key': "k", 'model': "m"}
+    asyncio.run(manager.record_verification(ConversationHistory(), QUERY, "Answer", decision, None, QUERY, []))
+    return manager.response_cache.get(QUERY)
+
+
+def test_background_verdict_caches_only_a_passed_answer(monkeypatch):
+    assert record_in_background(monkeypatch, {"needs_correction": False, "feedback": ""}) == "Answer"
+    assert record_in_background(monkeypatch, {"needs_correction": True, "feedback": "Wrong"}) is None
+    assert record_in_background(
+        monkeypatch, {"needs_correction": False, "feedback": "", "verification_failed": True}) is None
+
+
+def test_pipelined_verdict_fills_the_verdict_cache():
+    manager = travel_assistant.conv_manager
+    history = ConversationHistory()
+    verdict = {"needs_correction": False, "feedback": ""}
+
+    async def verify(chatbot, verification):
+        async for _ in manager.verify(chatbot, history, verification=verification):
+            pass
+
+    asyncio.run(verify([[QUERY, "Answer"]], dict(verdict)))
+    asyncio.run(verify([[QUERY, "Cut short"]], dict(verdict, partial=True)))
+    policy = manager.verification_policy
+    assert policy.cache.get(policy.cache_key(history.conversation_for_policy(QUERY, "Answer"))) == verdict
+    assert policy.cache.get(policy.cache_key(history.conversation_for_policy(QUERY, "Cut short"))) is None
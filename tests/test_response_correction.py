@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from src import travel_assistant
+from src.conversation_history import ConversationHistory
+from src.response_correction import apply_edits, _locate
+
+USER_MSG = "Weather in Paris on Monday?"
+RESPONSE = "Paris will be 30°C on Monday, bring shorts."
+FLAGGED = {"needs_correction": True, "feedback": "The forecast says 18°C."}
+PASSED = {"needs_correction": False, "feedback": ""}
+
+
+def test_locate_prefers_verbatim_match_from_start():
+    text = "rain, then rain again"
+    assert _locate(text, "rain", 5) == (11, 15)
+    assert _locate(text, "rain", 18) == (0, 4)  # Falls back to the first occurrence
+
+
+def test_locate_ignores_whitespace_differences():
+    text = "Pack:\n- a light   jacket\n- sandals"
+    start, end = _locate(text, "a light jacket - sandals", 0)
+    assert text[start:end] == "a light   jacket\n- sandals"
+    assert _locate(text, "umbrella", 0) is None
+
+
+def test_apply_edits_skips_missing_empty_and_noop_edits():
+    edits = [{"find": "30°C", "replace": "18°C"}, {"find": "missing", "replace": "x"},
+             {"find": "  ", "replace": "x"}, {"find": "shorts", "replace": "shorts"}, {"replace": "x"}]
+    assert apply_edits(RESPONSE, edits) == ("Paris will be 18°C on Monday, bring shorts.", 1)
+
+
+def test_apply_edits_deletes_and_caps_edits():
+    edits = [{"find": " on Monday", "replace": ""}, {"find": "shorts", "replace": "a jacket"}]
+    assert apply_edits(RESPONSE, edits, max_edits=1) == ("Paris will be 30°C, bring shorts.", 1)
+    assert apply_edits(RESPONSE, edits) == ("Paris will be 30°C, bring a jacket.", 2)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """
+    The conversation manager with the corrector, verifier and regeneration replaced by scripted stubs.
+    """
+    manager = travel_assistant.conv_manager
+    script = {'edits': [], 'verdicts': [], 'calls': []}
+
+    async def request_edits(history, user_msg, response, feedback, *args):
+        script['calls'].append("edits")
+        return script['edits'].pop(0)
+
+    async def reverify(history, user_msg, response, *args):
+        script['calls'].append("reverify")
+        return script['verdicts'].pop(0)
+
+    async def regenerate(chatbot, *args):
+        script['calls'].append("regenerate")
+        chatbot[-1] = [chatbot[-1][0], "Paris will be 18°C on Monday."]
+        yield chatbot
+
+    monkeypatch.setattr(manager, "request_edits", request_edits)
+    monkeypatch.setattr(manager, "reverify", reverify)
+    monkeypatch.setattr(manager, "regenerate", regenerate)
+    monkeypatch.setattr(manager, "correction_max_rounds", 2)
+    return manager, script
+
+
+def run_correction(manager, verification):
+    chatbot = [[USER_MSG, RESPONSE]]
+    report = {}
+
+    async def consume():
+        async for _ in manager.correct(chatbot, ConversationHistory(), verification, [], report=report):
+            pass
+
+    asyncio.run(consume())
+    return chatbot[-1][1], report
+
+
+def test_correct_verifies_edited_response(manager):
+    manager, script = manager
+    script['edits'] = [[{"find": "30°C", "replace": "18°C"}]]
+    script['verdicts'] = [PASSED]
+    response, report = run_correction(manager, dict(FLAGGED))
+    assert response == "Paris will be 18°C on Monday, bring shorts."
+    assert report['correction'] == {'outcome': "verified", 'rounds': 1, 'edits': 1}
+    assert report['verification'] == PASSED
+    assert script['calls'] == ["edits", "reverify"]
+
+
+def test_correct_verifies_last_round_and_regenerates_if_still_flagged(manager):
+    manager, script = manager
+    script['edits'] = [[{"find": "30°C", "replace": "25°C"}], [{"find": "25°C", "replace": "20°C"}]]
+    script['verdicts'] = [FLAGGED, FLAGGED, PASSED]
+    response, report = run_correction(manager, dict(FLAGGED))
+    assert response == "Paris will be 18°C on Monday."
+    assert report['correction'] == {'outcome': "regenerated", 'rounds': 2, 'edits': 2}
+    assert script['calls'] == ["edits", "reverify", "edits", "reverify", "regenerate", "reverify"]
+
+
+def test_correct_regenerates_when_later_edits_do_not_apply(manager):
+    manager, script = manager
+    script['edits'] = [[{"find": "30°C", "replace": "25°C"}], [{"find": "missing", "replace": "x"}]]
+    script['verdicts'] = [FLAGGED, FLAGGED]
+    response, report = run_correction(manager, dict(FLAGGED))
+    assert response == "Paris will be 18°C on Monday."
+    assert report['correction'] == {'outcome': "unresolved", 'rounds': 1, 'edits': 1}
+    assert report['verification'] == FLAGGED
+    assert script['calls'] == ["edits", "reverify", "edits", "regenerate", "reverify"]
+
+
+def test_correct_regenerates_partial_response_without_edits(manager):
+    manager, script = manager
+    script['verdicts'] = [PASSED]
+    response, report = run_correction(manager, dict(FLAGGED, partial=True))
+    assert response == "Paris will be 18°C on Monday."
+    assert report['correction'] == {'outcome': "regenerated", 'rounds': 0, 'edits': 0}
+    assert script['calls'] == ["regenerate", "reverify"]
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.scheduler import HybridSemaphore, SchedulerBusyError, TokenBucket, TurnScheduler, UpstreamBusyError
+
+
+def test_token_bucket_lets_the_burst_through_then_spaces_requests():
+    bucket = TokenBucket(rate=10, burst=2, max_wait=1)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_token_bucket_caps_the_wait_instead_of_lending_tokens_forever():
+    bucket = TokenBucket(rate=1, burst=1, max_wait=2)
+    waits = [bucket.reserve() for _ in range(3)]
+    assert waits == [0, pytest.approx(1, abs=0.01), pytest.approx(2, abs=0.01)]
+    with pytest.raises(UpstreamBusyError):
+        bucket.reserve()
+    assert bucket.rejected == 1
+    assert bucket.tokens == pytest.approx(-2, abs=0.01)  # The rejected request took no token
+    assert isinstance(UpstreamBusyError(), SchedulerBusyError)
+
+
+def test_hybrid_semaphore_is_fifo_across_threads_and_coroutines():
+    semaphore = HybridSemaphore(1)
+    order = []
+
+    async def main():
+        semaphore.acquire()
+        thread = threading.Thread(target=lambda: (semaphore.acquire(), order.append("thread"), semaphore.release()))
+        thread.start()
+        while not semaphore.waiting:
+            time.sleep(0.001)
+
+        async def coroutine():
+            await semaphore.acquire_async()
+            order.append("coroutine")
+            semaphore.release()
+
+        task = asyncio.create_task(coroutine())
+        await asyncio.sleep(0.01)
+        semaphore.release()
+        await task
+        thread.join()
+
+    asyncio.run(main())
+    assert order == ["thread", "coroutine"]
+    assert semaphore.value == 1
+
+
+def test_hybrid_semaphore_cancelled_waiter_gives_up_its_place():
+    semaphore = HybridSemaphore(1)
+
+    async def main():
+        await semaphore.acquire_async()
+        task = asyncio.create_task(semaphore.acquire_async())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        semaphore.release()
+
+    asyncio.run(main())
+    assert semaphore.value == 1 and semaphore.waiting == 0
+
+
+def test_turn_scheduler_admits_sessions_round_robin():
+    scheduler = TurnScheduler(max_concurrent=1, max_queued=10, shed_queue_depth=3)
+    order = []
+
+    async def turn(session, name):
+        async with scheduler.turn(session):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        tasks = [asyncio.create_task(turn("first", "first-1"))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(turn("busy", f"busy-{n}")) for n in range(3)]
+        tasks.append(asyncio.create_task(turn("other", "other-1")))
+        await asyncio.sleep(0)
+        assert scheduler.overloaded()  # 4 turns waiting
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["first-1", "busy-0", "other-1", "busy-1", "busy-2"]
+    assert scheduler.in_flight == 0 and scheduler.queued == 0
+
+
+def test_turn_scheduler_rejects_turns_when_the_queue_is_full():
+    scheduler = TurnScheduler(max_concurrent=1, max_queued=1)
+
+    async def main():
+        hold = asyncio.Event()
+
+        async def turn():
+            async with scheduler.turn("s"):
+                await hold.wait()
+
+        tasks = [asyncio.create_task(turn()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerBusyError):
+            async with scheduler.turn("s"):
+                pass
+        hold.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert scheduler.rejected == 1
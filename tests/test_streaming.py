@@ -0,0 +1,67 @@
+import asyncio
+
+from src.utils.streaming import coalesce_frames
+
+
+class SlowStream:
+    """
+    A chatbot stream that sends a chunk and then hangs until it is cancelled, recording how it was stopped.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self.closed = False
+
+    async def __aiter__(self):
+        try:
+            yield [["Hi", "Hello"]]
+            yield [["Hi", "Hello there"]]
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.closed = True
+
+
+def test_coalesce_frames_merges_small_updates():
+    async def stream():
+        for text in ("Hel", "Hello", "Hello there", "Hello there!"):
+            yield [["Hi", text]]
+
+    async def collect():
+        return [chatbot[-1][1] async for chatbot in coalesce_frames(stream(), interval=10, min_chars=100)]
+
+    assert asyncio.run(collect()) == ["Hel", "Hello there!"]
+
+
+def test_coalesce_frames_cancelled_consumer_cancels_stream():
+    source = SlowStream()
+
+    async def consume():
+        async for _ in coalesce_frames(source.__aiter__(), interval=0.01, min_chars=100):
+            pass
+
+    async def main():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)  # Past the timer flush, waiting on the hanging chunk
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    task = asyncio.run(main())
+    assert task.cancelled()
+    assert source.cancelled and source.closed
+
+
+def test_coalesce_frames_closed_after_timer_flush_closes_stream():
+    source = SlowStream()
+
+    async def main():
+        frames = coalesce_frames(source.__aiter__(), interval=0.01, min_chars=100)
+        assert (await frames.__anext__())[-1][1] == "Hello"
+        assert (await frames.__anext__())[-1][1] == "Hello there"  # Sent by the timer
+        await frames.aclose()
+
+    asyncio.run(main())
+    assert source.cancelled and source.closed
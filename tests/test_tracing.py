@@ -0,0 +1,32 @@
+import json
+import threading
+
+from src.utils.tracing import Tracer
+
+
+def test_spans_are_exported_in_the_background(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(export_path=str(path))
+    threads = [threading.Thread(target=lambda: [tracer.record("tool.x", 0.01, "t1", n=n) for n in range(100)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with tracer.span("chat.turn", "t2") as span:
+        span['route'] = "lookup"
+    tracer.flush()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 401 and tracer.export_dropped == 0
+    assert records[-1]['span'] == "chat.turn" and records[-1]['route'] == "lookup"
+    assert tracer.histograms["tool.x"].count == 400
+
+
+def test_full_export_queue_drops_spans_without_blocking(tmp_path):
+    tracer = Tracer(export_path=str(tmp_path / "trace.jsonl"), export_queue_size=1)
+    tracer._writer = threading.current_thread()  # Nothing drains the queue
+    tracer.record("a", 0.1)
+    tracer.record("b", 0.1)
+    assert tracer.export_dropped == 1
+    assert tracer.histograms["b"].count == 1
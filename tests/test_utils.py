@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import requests
+
+from src.utils import utils
+from src.utils.utils import get_all_currency_codes, truncate_to_tokens
+
+
+def test_truncate_to_tokens_marks_both_cuts_alike():
+    assert truncate_to_tokens("Short.", 10) == "Short."
+    sentences = "First sentence here. Second sentence that runs on and on."
+    assert truncate_to_tokens(sentences, 8) == "First sentence here. …"
+    words = "one two three four five six seven eight nine ten eleven twelve"
+    assert truncate_to_tokens(words, 5) == "one two three four …"
+
+
+def test_currency_codes_report_malformed_json_as_an_error(monkeypatch):
+    monkeypatch.setattr(utils, "http_get", lambda api, url: SimpleNamespace(content=b"<html>busy</html>"))
+    assert "error" in get_all_currency_codes()
+
+
+def test_currency_codes_report_request_errors(monkeypatch):
+    def fail(api, url):
+        raise requests.exceptions.ConnectionError("down")
+
+    monkeypatch.setattr(utils, "http_get", fail)
+    assert "down" in get_all_currency_codes()["error"]
+
+
+def test_currency_codes(monkeypatch):
+    body = b'{"result": "success", "supported_codes": [["USD", "US Dollar"]]}'
+    monkeypatch.setattr(utils, "http_get", lambda api, url: SimpleNamespace(content=body))
+    assert get_all_currency_codes() == {"supported_codes": [["USD", "US Dollar"]]}
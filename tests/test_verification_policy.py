@@ -0,0 +1,54 @@
+from src.constants import VERIFIER_MODEL, DOWNGRADED_VERIFIER_MODEL, VERDICT_CONTEXT_EXCHANGES, LOW_RISK_MAX_CHARS
+from src.verification_policy import VerificationPolicy
+
+TOOL_CALL = {'name': "get_weather_forecast", 'args': {'city': "Paris"}, 'result': {}}
+
+
+def test_risk_signals():
+    signals = VerificationPolicy.risk_signals
+    assert signals("Paris is lovely, enjoy the museums!") == []
+    assert signals("Paris is lovely.", [TOOL_CALL]) == ["tool_grounded"]
+    assert signals("Expect 18 degrees.") == ["numbers"]
+    assert signals("Tickets cost €20.") == ["numbers", "prices"]
+    assert signals("Prices are in USD.") == ["prices"]
+    assert signals("It rains on Monday, pack an umbrella.") == ["dates"]
+    assert signals("Come back in the summer season.") == ["dates"]
+
+
+def test_cache_key_covers_the_last_exchange_and_its_context():
+    key = VerificationPolicy.cache_key
+    conversation = [(f"q{i}", f"a{i}") for i in range(VERDICT_CONTEXT_EXCHANGES + 2)]
+    assert key(conversation) == key(conversation[1:])  # The oldest exchange is out of the context
+    assert key(conversation) != key(conversation[:-1])
+    assert key(conversation) != key(conversation[:1] + [("other", "a1")] + conversation[2:])
+    assert key(conversation) != key(conversation[:-1] + [("q3", "different answer")])
+
+
+def test_decide_tiers():
+    policy = VerificationPolicy()
+    risky = [("Weather in Paris?", "18°C on Monday.")]
+    assert policy.decide(risky, tier="skip")['reason'] == "route"
+    assert policy.decide(risky)['model'] == VERIFIER_MODEL
+    cascade = policy.decide(risky, tier="cascade")
+    assert (cascade['model'], cascade['escalate_to']) == (DOWNGRADED_VERIFIER_MODEL, VERIFIER_MODEL)
+
+    short = [("Thanks!", "You're welcome, enjoy Paris!")]
+    assert policy.decide(short) == {'action': "skip", 'key': policy.cache_key(short), 'reason': "low_risk"}
+    long = [("Tips?", "Walk a lot. " * (LOW_RISK_MAX_CHARS // 10))]
+    decision = policy.decide(long)
+    assert decision['action'] == "verify" and decision['model'] == DOWNGRADED_VERIFIER_MODEL
+    assert 'escalate_to' not in decision
+    assert policy.stats == {"skipped_route": 1, "full": 1, "cascaded": 1, "skipped_low_risk": 1, "downgraded": 1}
+
+
+def test_stored_verdicts_are_reused_unless_the_verification_failed():
+    policy = VerificationPolicy()
+    conversation = [("Weather in Paris?", "18°C on Monday.")]
+    failed = [("Weather in Rome?", "25°C on Monday.")]
+    verdict = {'needs_correction': False, 'feedback': ""}
+    policy.store(policy.cache_key(conversation), verdict)
+    policy.store(policy.cache_key(failed), {'verification_failed': True})
+
+    assert policy.decide(conversation) == {'action': "cached", 'key': policy.cache_key(conversation), 'verification': verdict}
+    assert policy.decide(conversation, tier="skip")['action'] == "skip"  # The route's tier comes first
+    assert policy.decide(failed)['action'] == "verify"